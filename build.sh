@@ -6,4 +6,4 @@ poetry install
 
 export DJANGO_SETTINGS_MODULE=murasaki.settings.prod
 python manage.py collectstatic --no-input
-python manage.py migrate --settings=murasaki.settings.prod
\ No newline at end of file
+python manage.py migrate --settings=murasaki.settings.prod
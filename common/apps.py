@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'common'
+
+    def ready(self):
+        from .cache import check_atomic_caches
+        from .storage import connect_signals
+        from .translations import count_translation_lookups
+        check_atomic_caches()
+        connect_signals()
+        count_translation_lookups()
@@ -0,0 +1,541 @@
+"""
+Full-page caching for the public views.
+
+Rendered responses are stored per (view, language, page number, pk).
+Instead of tracking every stored key, each view has a generation counter
+in the cache (and each object shown by a detail view has its own counter).
+Each entry records the generation it
+was rendered for, so bumping a counter makes every response depending on
+it stale: it is rendered again, and served stale in the meantime
+(see `cache_public_page`).
+
+The cache can evict the counters (when it culls its entries). A missing
+counter starts over from the current time in microseconds rather than from
+0, so it can't come back to a generation recorded by an older entry that is
+still cached (see `_seed_generation`).
+
+The counters also make the validators of the public views: the ETag is
+derived from the counters, and Last-Modified is the latest of the content's
+`updated` times and of the view's invalidations (see `conditional_page`).
+
+The render locks and the counters rely on the atomic `add()` and `incr()`
+of the cache backend, across the worker processes: the app refuses to start
+with a backend that doesn't have them (see `check_atomic_caches`).
+
+Both decorators also wrap async views, reading the cache with its async
+methods and running the blocking steps (the session, the database and
+the saved copies on disk) in threads.
+"""
+import asyncio
+import datetime
+import hashlib
+import logging
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .export import EXPORT_ENVIRON_KEY, remove_exported
+from .fallback import database_breaker, load_fallback, save_fallback, unavailable_response
+from .frontcache import set_private_cache_headers, set_public_cache_headers
+from .metrics import aincr_metric, incr_metric
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_PREFIX = "pagecache"
+
+
+# Backends whose add() and incr() are atomic (LocMemCache is only shared by the threads of a process)
+ATOMIC_CACHE_BACKENDS = {
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+def check_atomic_caches():
+    """
+    Raises ImproperlyConfigured if a cache holding locks or counters (of the
+    page cache, the page singletons or the metrics) can't update them
+    atomically, e.g. FileBasedCache, whose add() and incr() read then write.
+    """
+    for alias in sorted({settings.PAGE_CACHE_ALIAS, settings.METRICS_CACHE_ALIAS, DEFAULT_CACHE_ALIAS}):
+        backend = settings.CACHES[alias]["BACKEND"]
+        if backend not in ATOMIC_CACHE_BACKENDS:
+            raise ImproperlyConfigured(
+                f"The {alias!r} cache ({backend}) must have an atomic add() and incr(), "
+                f"like {', '.join(sorted(ATOMIC_CACHE_BACKENDS))}"
+            )
+
+
+def get_page_cache():
+    """
+    Returns the cache backend used for rendered pages.
+    """
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def get_master_pk(instance):
+    """
+    Returns the pk of the translatable object, given either the object
+    itself or one of its parler translations.
+    """
+    return getattr(instance, "master_id", instance.pk)
+
+
+def _generation_keys(view_name, pk=None):
+    keys = [f"{PAGE_CACHE_PREFIX}:gen:{view_name}"]
+    if pk is not None:
+        keys.append(f"{PAGE_CACHE_PREFIX}:gen:{view_name}:{pk}")
+    return keys
+
+
+def _changed_key(generation_key):
+    """
+    Returns the key of the time the generation counter was last bumped.
+    """
+    return generation_key.replace(":gen:", ":changed:", 1)
+
+
+def _seed_generation():
+    """
+    Returns the starting value of a generation counter. A counter is bumped
+    far less often than once a microsecond, so a counter started over after
+    an eviction is above any value the evicted one reached.
+    """
+    return time.time_ns() // 1000
+
+
+def _bump_generation(key):
+    cache = get_page_cache()
+    # A missing counter starts over from a new seed, which is bumped enough
+    if not cache.add(key, _seed_generation(), timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted since add()
+            cache.add(key, _seed_generation(), timeout=None)
+    cache.set(_changed_key(key), time.time(), timeout=None)
+
+
+def _view_state_keys(view_name, pk=None):
+    keys = _generation_keys(view_name, pk)
+    return keys, [_changed_key(key) for key in keys]
+
+
+def _seed_missing(cache, keys, values):
+    """
+    Starts the counters missing from the values read from the cache,
+    returning the keys to read again.
+    """
+    missing = [key for key in keys if key not in values]
+    for key in missing:
+        cache.add(key, _seed_generation(), timeout=None)
+    return missing
+
+
+async def _aseed_missing(cache, keys, values):
+    """
+    Async version of `_seed_missing`.
+    """
+    missing = [key for key in keys if key not in values]
+    for key in missing:
+        await cache.aadd(key, _seed_generation(), timeout=None)
+    return missing
+
+
+def _parse_view_state(keys, changed_keys, values):
+    generation = ".".join(str(values.get(key, 0)) for key in keys)
+    changed = max((values[key] for key in changed_keys if key in values), default=None)
+    return generation, changed
+
+
+def _view_state(view_name, pk=None):
+    """
+    Returns the generation of the view (the dotted counters it depends on),
+    and the time of its last invalidation (or None if unknown).
+    """
+    keys, changed_keys = _view_state_keys(view_name, pk)
+    cache = get_page_cache()
+    values = cache.get_many(keys + changed_keys)
+    missing = _seed_missing(cache, keys, values)
+    if missing:
+        values.update(cache.get_many(missing))
+    return _parse_view_state(keys, changed_keys, values)
+
+
+async def _aview_state(view_name, pk=None):
+    """
+    Async version of `_view_state`.
+    """
+    keys, changed_keys = _view_state_keys(view_name, pk)
+    cache = get_page_cache()
+    values = await cache.aget_many(keys + changed_keys)
+    missing = await _aseed_missing(cache, keys, values)
+    if missing:
+        values.update(await cache.aget_many(missing))
+    return _parse_view_state(keys, changed_keys, values)
+
+
+def view_cache_key(view_name, *parts, pk=None):
+    """
+    Returns a cache key for data derived from the content of a view,
+    which expires together with the view's cached pages.
+    """
+    generation = _view_state(view_name, pk)[0]
+    return ":".join([PAGE_CACHE_PREFIX, view_name, *map(str, parts), generation])
+
+
+def page_cache_key(view_name, language_code, params=(), pk=None):
+    """
+    Returns the cache key for a rendered page. The entry records the
+    generation it was rendered for, so it can still be served while stale.
+    """
+    query = "&".join(f"{name}={value}" for name, value in params)
+    return ":".join([PAGE_CACHE_PREFIX, view_name, language_code, query, str(pk)])
+
+
+def invalidate_pages(*view_names):
+    """
+    Invalidates every cached page of the given views,
+    in all languages and for all page numbers and objects.
+    """
+    for view_name in view_names:
+        _bump_generation(_generation_keys(view_name)[0])
+    remove_exported(view_names)
+
+
+def invalidate_object_pages(view_name, pk):
+    """
+    Invalidates the cached pages of a single object shown by a detail view.
+    """
+    _bump_generation(_generation_keys(view_name, pk)[-1])
+    remove_exported((view_name,), pk)
+
+
+def invalidate_on_commit(view_names, object_view=None, pk=None):
+    """
+    Invalidates the pages of the views (and of the object shown by a detail
+    view) once the current transaction is committed: a request rendering them
+    before the commit would cache the old content under the new generation.
+    """
+    def invalidate():
+        invalidate_pages(*view_names)
+        if object_view is not None:
+            invalidate_object_pages(object_view, pk)
+
+    transaction.on_commit(invalidate)
+
+
+def _is_cacheable_request(request, query_params):
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if EXPORT_ENVIRON_KEY in request.META:
+        # The export renders the current content, not a stale copy
+        return False
+    if any(name not in query_params for name in request.GET):
+        # Don't let arbitrary query strings fill up the cache
+        return False
+    try:
+        return not request.user.is_authenticated
+    except DatabaseError:
+        # The session can't be loaded: the public page is the same for everyone
+        return True
+
+
+def _is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def _stale_response(response):
+    """
+    Marks a stale response so no other cache keeps it: the front cache has
+    already been purged, and the validators belong to the new content.
+    """
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def _release_lock(cache, lock_key, token):
+    """
+    Deletes the render lock, unless it expired and another request holds it now.
+    """
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+async def _arelease_lock(cache, lock_key, token):
+    """
+    Async version of `_release_lock`.
+    """
+    if await cache.aget(lock_key) == token:
+        await cache.adelete(lock_key)
+
+
+def _wait_for_render(cache, key, generation):
+    """
+    Waits for another request to render the page, returning its response,
+    or None if it doesn't show up in time.
+    """
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry["generation"] == generation:
+            return entry["response"]
+    return None
+
+
+async def _await_render(cache, key, generation):
+    """
+    Async version of `_wait_for_render`.
+    """
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(key)
+        if entry is not None and entry["generation"] == generation:
+            return entry["response"]
+    return None
+
+
+def cache_public_page(view_name, query_params=("page", "after", "before")):
+    """
+    Caches the rendered response of a public view for anonymous GET requests.
+
+    The key is built from the view name, the active language, the values of
+    `query_params` and the `pk` URL argument (if any).
+    Use `invalidate_pages()` and `invalidate_object_pages()` to expire it.
+    A view can shorten the timeout by setting `request.page_cache_timeout`;
+    the timeout is kept on the response as well (see `is_placeholder_response`).
+    The responses get the headers of a front cache (see `common.frontcache`).
+
+    Expired and invalidated pages are kept for `PAGE_CACHE_STALE_TIMEOUT`
+    more seconds. A single request (holding a lock in the cache, so across
+    the worker processes) renders the page again, while the concurrent
+    requests are served the stale page, or wait for the render if there is none.
+
+    When the database fails (or its circuit breaker is open), the stale page
+    or the last good copy saved on disk is served (see `common.fallback`).
+    """
+    def decorator(view):
+        def fallback(key, entry):
+            """
+            Returns the stale entry or the last good copy on disk, for when the database fails.
+            """
+            response = entry["response"] if entry is not None else load_fallback(key)
+            if response is None:
+                return unavailable_response()
+            incr_metric("page_fallback_serves")
+            return _stale_response(response)
+
+        def cache_entry(request, response, generation):
+            """
+            Sets the front cache headers of a rendered response, and returns its
+            cache entry with its timeout, or None if it can't be cached.
+            """
+            if not _is_cacheable_response(response):
+                return None
+            timeout = getattr(request, "page_cache_timeout", settings.PAGE_CACHE_TIMEOUT)
+            if timeout != settings.PAGE_CACHE_TIMEOUT:
+                response.page_cache_timeout = timeout
+                set_public_cache_headers(request, response, view_name, timeout)
+            else:
+                set_public_cache_headers(request, response, view_name, settings.FRONT_CACHE_TIMEOUT)
+            entry = {"generation": generation, "fresh_until": time.time() + timeout, "response": response}
+            return entry, timeout + settings.PAGE_CACHE_STALE_TIMEOUT
+
+        def render(request, args, kwargs, cache, key, generation, entry=None):
+            if not database_breaker.allow():
+                return fallback(key, entry)
+            incr_metric("page_renders")
+            try:
+                response = view(request, *args, **kwargs)
+            except DatabaseError:
+                database_breaker.record_failure()
+                logger.warning("Database error rendering %s, serving a fallback", request.path, exc_info=True)
+                return fallback(key, entry)
+            database_breaker.record_success()
+            stored = cache_entry(request, response, generation)
+            if stored is not None:
+                cache.set(key, *stored)
+                save_fallback(key, response)
+            return response
+
+        async def arender(request, args, kwargs, cache, key, generation, entry=None):
+            if not database_breaker.allow():
+                return await sync_to_async(fallback)(key, entry)
+            await aincr_metric("page_renders")
+            try:
+                response = await view(request, *args, **kwargs)
+            except DatabaseError:
+                database_breaker.record_failure()
+                logger.warning("Database error rendering %s, serving a fallback", request.path, exc_info=True)
+                return await sync_to_async(fallback)(key, entry)
+            database_breaker.record_success()
+            stored = cache_entry(request, response, generation)
+            if stored is not None:
+                await cache.aset(key, *stored)
+                await sync_to_async(save_fallback)(key, response)
+            return response
+
+        def lookup_key(request, kwargs):
+            params = [(name, request.GET[name]) for name in query_params if name in request.GET]
+            return page_cache_key(view_name, request.LANGUAGE_CODE, params, kwargs.get("pk"))
+
+        def is_fresh(entry, generation):
+            return entry is not None and entry["generation"] == generation and entry["fresh_until"] > time.time()
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request, query_params):
+                response = view(request, *args, **kwargs)
+                set_private_cache_headers(response)
+                return response
+
+            key = lookup_key(request, kwargs)
+            generation = _view_state(view_name, kwargs.get("pk"))[0]
+            cache = get_page_cache()
+            entry = cache.get(key)
+            if is_fresh(entry, generation):
+                return entry["response"]
+
+            lock_key, token = f"{key}:lock", uuid.uuid4().hex
+            if cache.add(lock_key, token, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                try:
+                    return render(request, args, kwargs, cache, key, generation, entry)
+                finally:
+                    _release_lock(cache, lock_key, token)
+
+            if entry is not None:
+                incr_metric("page_stale_serves")
+                return _stale_response(entry["response"])
+            response = _wait_for_render(cache, key, generation)
+            if response is not None:
+                incr_metric("page_coalesced_waits")
+                return response
+            # The render is taking too long (or failed): render it here too
+            return render(request, args, kwargs, cache, key, generation)
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # Checking the user loads the session
+            if not await sync_to_async(_is_cacheable_request)(request, query_params):
+                response = await view(request, *args, **kwargs)
+                set_private_cache_headers(response)
+                return response
+
+            key = lookup_key(request, kwargs)
+            generation = (await _aview_state(view_name, kwargs.get("pk")))[0]
+            cache = get_page_cache()
+            entry = await cache.aget(key)
+            if is_fresh(entry, generation):
+                return entry["response"]
+
+            lock_key, token = f"{key}:lock", uuid.uuid4().hex
+            if await cache.aadd(lock_key, token, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                try:
+                    return await arender(request, args, kwargs, cache, key, generation, entry)
+                finally:
+                    await _arelease_lock(cache, lock_key, token)
+
+            if entry is not None:
+                await aincr_metric("page_stale_serves")
+                return _stale_response(entry["response"])
+            response = await _await_render(cache, key, generation)
+            if response is not None:
+                await aincr_metric("page_coalesced_waits")
+                return response
+            return await arender(request, args, kwargs, cache, key, generation)
+
+        return async_wrapper if iscoroutinefunction(view) else wrapper
+    return decorator
+
+
+def is_placeholder_response(request, response):
+    """
+    Returns whether the response is only good for a short time
+    (e.g. it shows placeholders for missing image renditions).
+    """
+    return hasattr(request, "page_cache_timeout") or hasattr(response, "page_cache_timeout")
+
+
+def conditional_page(view_name, modified_times, query_params=("page", "after", "before")):
+    """
+    Adds ETag and Last-Modified validators to a public view, answering
+    conditional requests with 304 Not Modified before the view runs.
+
+    `modified_times(request, **kwargs)` returns the `updated` times of the
+    content the view shows (None values are ignored). Their latest value is
+    cached until the view is invalidated, so validating a request only reads
+    the cache. Deletions don't leave an `updated` time behind, so the time
+    of the view's last invalidation is taken into account as well.
+
+    Use above `cache_public_page`, with the same view name.
+    """
+    def etag(request, *args, **kwargs):
+        generation = _view_state(view_name, kwargs.get("pk"))[0]
+        query = "&".join(f"{name}={request.GET[name]}" for name in query_params if name in request.GET)
+        value = f"{view_name}|{request.LANGUAGE_CODE}|{query}|{kwargs.get('pk')}|{generation}"
+        return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        pk = kwargs.get("pk")
+        generation, changed = _view_state(view_name, pk)
+        key = ":".join([PAGE_CACHE_PREFIX, view_name, request.LANGUAGE_CODE, "modified", str(pk), generation])
+        cache = get_page_cache()
+        timestamp = cache.get(key)
+        if timestamp is None:
+            if not database_breaker.allow():
+                return None
+            try:
+                times = [t.timestamp() for t in modified_times(request, *args, **kwargs) if t is not None]
+            except DatabaseError:
+                database_breaker.record_failure()
+                return None
+            timestamp = max(times, default=0)
+            cache.set(key, timestamp, settings.PAGE_CACHE_TIMEOUT)
+        timestamp = max(timestamp, changed or 0)
+        if not timestamp:
+            return None
+        return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+    def validators(request, *args, **kwargs):
+        """
+        Returns the quoted ETag and the Last-Modified timestamp, like `condition`.
+        """
+        modified = last_modified(request, *args, **kwargs)
+        return quote_etag(etag(request, *args, **kwargs)), int(modified.timestamp()) if modified else None
+
+    def decorator(view):
+        if not iscoroutinefunction(view):
+            return condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        # `condition` only wraps sync views in Django 4.2
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            res_etag, res_last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=res_etag, last_modified=res_last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                if res_last_modified and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(res_last_modified)
+                response.headers.setdefault("ETag", res_etag)
+            return response
+        return wrapper
+
+    return decorator
@@ -0,0 +1,188 @@
+"""
+Static export of the public pages.
+
+The `export_site` command renders every public URL to an HTML file under
+EXPORT_ROOT (with pre-compressed variants), and `ExportedSiteMiddleware`
+serves those files to anonymous visitors without running the views.
+
+A URL's file is named after its path and its pagination query, e.g.
+`/en/news/?after=abc` is stored as `en/news/index.after=abc.html`.
+`manifest.json` lists the exported files with the view and object they show;
+invalidating a view's cached pages deletes its exported files, so they are
+served by the views again until the next export. The manifest is indexed by
+view and object in each process, and only read again when it changes.
+
+The export's requests bypass the page cache, so they never export a stale
+copy served while another request renders the page.
+"""
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.test import Client
+from django.utils._os import safe_join
+from whitenoise.compress import Compressor
+
+MANIFEST_NAME = "manifest.json"
+
+# WSGI environ key of the export's own requests, which must reach the views
+# (unlike headers, environ keys with a dot can't be sent by clients)
+EXPORT_ENVIRON_KEY = "murasaki.export"
+
+# Query parameters of the exported URLs (pagination)
+EXPORT_QUERY_PARAMS = ("after", "before")
+
+# Allowed values of the query parameters (the cursors are URL-safe base64)
+QUERY_VALUE_RE = re.compile(r"^[\w-]+$")
+
+# Extensions of the pre-compressed variants written next to the files
+COMPRESSED_EXTENSIONS = (".gz", ".br")
+
+
+def export_file_name(path, params=()):
+    """
+    Returns the name of the exported file of the URL path and query params,
+    or None if the URL can't be exported.
+    """
+    if not path.endswith("/"):
+        return None
+    params = sorted(params)
+    if any(name not in EXPORT_QUERY_PARAMS or not QUERY_VALUE_RE.match(value) for name, value in params):
+        return None
+    query = "".join(f".{name}={value}" for name, value in params)
+    return f"{path.strip('/')}/index{query}.html".lstrip("/")
+
+
+def export_file_path(name):
+    """
+    Returns the absolute path of the exported file with the name, or None
+    if it's outside EXPORT_ROOT.
+    """
+    try:
+        return safe_join(settings.EXPORT_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+
+
+def read_manifest():
+    """
+    Returns the manifest of the export, or an empty one.
+    """
+    try:
+        with open(os.path.join(settings.EXPORT_ROOT, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"built": None, "files": {}}
+
+
+# (modification time and size of the manifest, {view: {pk: [file names]}})
+_manifest_index = (None, {})
+
+
+def _exported_files():
+    """
+    Returns the names of the exported files by view and object pk, indexing
+    the manifest again if it changed since it was last read by this process.
+    """
+    global _manifest_index
+    try:
+        stat = os.stat(os.path.join(settings.EXPORT_ROOT, MANIFEST_NAME))
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = None
+    cached_version, index = _manifest_index
+    if version is None or version != cached_version:
+        index = defaultdict(lambda: defaultdict(list))
+        for name, entry in read_manifest()["files"].items():
+            index[entry["view"]][entry["pk"]].append(name)
+        _manifest_index = (version, index)
+    return index
+
+
+def write_manifest(manifest):
+    """
+    Replaces the manifest atomically.
+    """
+    path = os.path.join(settings.EXPORT_ROOT, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def remove_file(name):
+    """
+    Deletes an exported file and its compressed variants.
+    """
+    path = export_file_path(name)
+    if path is None:
+        return
+    for variant in (path, *(path + extension for extension in COMPRESSED_EXTENSIONS)):
+        try:
+            os.remove(variant)
+        except FileNotFoundError:
+            pass
+
+
+def remove_exported(view_names, pk=None):
+    """
+    Deletes the exported files of the views (only those of the object, if `pk` is given).
+    """
+    if not settings.EXPORT_ROOT:
+        return
+    files = _exported_files()
+    for view_name in view_names:
+        by_pk = files.get(view_name, {})
+        for names in (by_pk.values() if pk is None else [by_pk.get(pk, ())]):
+            for name in names:
+                remove_file(name)
+
+
+def export_host():
+    """
+    Returns the host name of the export's requests.
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def write_file(name, content):
+    """
+    Writes an exported file, replacing its compressed variants.
+    """
+    path = export_file_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    remove_file(name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    Compressor(quiet=True).compress(path)
+
+
+def export_page(url, name, sha256=None):
+    """
+    Renders the URL and writes it to the file with the name, unless its
+    content still has the `sha256` digest (and the file exists).
+    Returns the digest of the page, or None if it can't be exported
+    (an error, a redirect, or placeholders for missing renditions).
+    """
+    from .cache import is_placeholder_response
+
+    # The errors are answered with 500, like in production
+    client = Client(raise_request_exception=False)
+    response = client.get(url, HTTP_HOST=export_host(), **{EXPORT_ENVIRON_KEY: True})
+    if response.status_code != 200 or response.streaming:
+        return None
+    if is_placeholder_response(response.wsgi_request, response):
+        return None
+    digest = hashlib.sha256(response.content).hexdigest()
+    if digest != sha256 or not os.path.isfile(export_file_path(name)):
+        write_file(name, response.content)
+    return digest
@@ -0,0 +1,177 @@
+"""
+Degraded mode of the public views, for when the database is unavailable.
+
+Every page rendered for the page cache is also written to disk under
+`FALLBACK_PAGE_ROOT`, where it survives restarts and cache evictions.
+When rendering a page fails with a database error (including a statement
+timeout), the last good copy is served instead. The oldest copies are
+removed beyond `FALLBACK_PAGE_MAX_FILES` (see `prune_fallbacks`).
+
+Database errors trip a circuit breaker: after `CIRCUIT_BREAKER_THRESHOLD`
+consecutive failures, the views aren't run for `CIRCUIT_BREAKER_RESET_TIMEOUT`
+seconds (the saved copies are served), then a single request tries again.
+
+The web processes have their queries cancelled after
+`DATABASE_STATEMENT_TIMEOUT` milliseconds (see `limit_statement_time`),
+so a saturated database fails fast instead of holding the workers.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+# Seconds between the prunings of the saved copies by a process
+PRUNE_INTERVAL = 60
+
+_last_prune = None
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for a while.
+
+    Closed: calls are allowed, and consecutive failures are counted.
+    Open: calls aren't allowed until `reset_timeout` seconds have passed.
+    Half-open: one call is allowed; its success closes the breaker,
+    its failure opens it again.
+
+    The state is kept in the process, since it has to work without the
+    services it protects (each gunicorn worker trips on its own).
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        """
+        Returns whether a call may be made now.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Half-open: let this call through
+            self.trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+    def reset(self):
+        self.record_success()
+
+
+# Breaker of the database, for the public views
+database_breaker = CircuitBreaker(
+    settings.CIRCUIT_BREAKER_THRESHOLD,
+    settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+)
+
+
+def _set_statement_timeout(sender, connection, **kwargs):
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET statement_timeout = {int(settings.DATABASE_STATEMENT_TIMEOUT)}")
+
+
+def limit_statement_time():
+    """
+    Sets `DATABASE_STATEMENT_TIMEOUT` on the database connections this process opens.
+    Only called by the web entry points: migrations and management commands aren't limited.
+    """
+    if settings.DATABASE_STATEMENT_TIMEOUT:
+        connection_created.connect(_set_statement_timeout, dispatch_uid="statement_timeout")
+
+
+def _fallback_path(key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(settings.FALLBACK_PAGE_ROOT, digest[:2], f"{digest}.pickle")
+
+
+def save_fallback(key, response):
+    """
+    Saves the response of the page with the cache key as its last good copy.
+    """
+    if not settings.FALLBACK_PAGE_ROOT or getattr(response, "page_cache_timeout", None):
+        # Pages with placeholders aren't worth keeping
+        return
+    global _last_prune
+    path = _fallback_path(key)
+    is_new = not os.path.exists(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(response, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    if is_new and (_last_prune is None or time.monotonic() - _last_prune >= PRUNE_INTERVAL):
+        _last_prune = time.monotonic()
+        prune_fallbacks()
+
+
+def prune_fallbacks():
+    """
+    Removes the least recently saved copies beyond `FALLBACK_PAGE_MAX_FILES`.
+    """
+    copies = []
+    for directory, _dirs, names in os.walk(settings.FALLBACK_PAGE_ROOT):
+        for name in names:
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                copies.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+    copies.sort()
+    for _mtime, path in copies[:len(copies) - settings.FALLBACK_PAGE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load_fallback(key):
+    """
+    Returns the last good copy of the page with the cache key, or None.
+    """
+    if not settings.FALLBACK_PAGE_ROOT:
+        return None
+    try:
+        with open(_fallback_path(key), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def unavailable_response():
+    """
+    Returns the response for a page without any copy to fall back on.
+    """
+    response = HttpResponse("Service temporarily unavailable", status=503, content_type="text/plain")
+    response["Retry-After"] = settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+    return response
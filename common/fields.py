@@ -0,0 +1,145 @@
+"""
+Model fields shared by the apps.
+"""
+import mimetypes
+
+from django.db import models
+from PIL import Image
+
+from .renditions import image_placeholder
+from .richtext import EXCERPT_LENGTH, excerpt, render_rich_text
+
+
+class ImageMetadataField(models.ImageField):
+    """
+    ImageField also storing the file size and MIME type of the image in other
+    fields of the model, the way `width_field` and `height_field` store its
+    dimensions, so they can be shown without opening the file.
+
+    `placeholder_field` and `color_field` store a tiny placeholder of the
+    image (as a data URI) and its dominant color, computed when it's uploaded.
+    """
+
+    def __init__(self, *args, size_field=None, mime_type_field=None,
+                 placeholder_field=None, color_field=None, **kwargs):
+        self.size_field = size_field
+        self.mime_type_field = mime_type_field
+        self.placeholder_field = placeholder_field
+        self.color_field = color_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        for attname in ("size_field", "mime_type_field", "placeholder_field", "color_field"):
+            if getattr(self, attname):
+                kwargs[attname] = getattr(self, attname)
+        return name, path, args, kwargs
+
+    def update_dimension_fields(self, instance, force=False, *args, **kwargs):
+        # Unlike ImageField, loading a row without dimensions doesn't open the file:
+        # they are set when a file is assigned or saved, or by `backfill_image_metadata`
+        if not force:
+            return
+        try:
+            super().update_dimension_fields(instance, force, *args, **kwargs)
+        except OSError:
+            # Missing or unreadable file
+            pass
+
+    def pre_save(self, model_instance, add):
+        uploaded = not getattr(model_instance, self.attname)._committed
+        file = super().pre_save(model_instance, add)
+        if file and self.width_field and not getattr(model_instance, self.width_field):
+            self.update_dimension_fields(model_instance, force=True)
+        self.update_metadata_fields(model_instance, file)
+        if self.placeholder_field and (uploaded or not getattr(model_instance, self.placeholder_field)):
+            self.update_placeholder_fields(model_instance, file)
+        return file
+
+    def update_metadata_fields(self, instance, file):
+        """
+        Sets the size and MIME type fields from the (saved) file.
+        """
+        size, mime_type = None, ""
+        if file:
+            try:
+                size = file.size
+            except OSError:
+                pass
+            mime_type = mimetypes.guess_type(file.name)[0] or ""
+        if self.size_field:
+            setattr(instance, self.size_field, size)
+        if self.mime_type_field:
+            setattr(instance, self.mime_type_field, mime_type)
+
+    def update_placeholder_fields(self, instance, file):
+        """
+        Sets the placeholder and color fields from the (saved) file.
+        """
+        placeholder, color = "", ""
+        if file:
+            try:
+                with file.storage.open(file.name) as f:
+                    placeholder, color = image_placeholder(f)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                # Missing or unreadable file
+                pass
+        setattr(instance, self.placeholder_field, placeholder)
+        if self.color_field:
+            setattr(instance, self.color_field, color)
+
+
+class DerivedTextField(models.TextField):
+    """
+    Non-editable TextField computed from another field of the model when it's saved.
+    """
+
+    def __init__(self, *args, source_field=None, **kwargs):
+        self.source_field = source_field
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("blank", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["source_field"] = self.source_field
+        del kwargs["editable"]
+        kwargs.pop("blank", None)
+        return name, path, args, kwargs
+
+    def derive(self, value):
+        raise NotImplementedError
+
+    def pre_save(self, model_instance, add):
+        value = self.derive(getattr(model_instance, self.source_field))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class RenderedHTMLField(DerivedTextField):
+    """
+    The sanitized HTML of a rich text field, with its uploaded images
+    rewritten to renditions (see `common.richtext`), output as is by templates.
+    """
+
+    def derive(self, value):
+        return render_rich_text(value)
+
+
+class ExcerptField(DerivedTextField):
+    """
+    The plain-text beginning of a rich text field, for the listings.
+    """
+
+    def __init__(self, *args, length=EXCERPT_LENGTH, **kwargs):
+        self.length = length
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.length != EXCERPT_LENGTH:
+            kwargs["length"] = self.length
+        return name, path, args, kwargs
+
+    def derive(self, value):
+        return excerpt(value, self.length)
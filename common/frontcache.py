@@ -0,0 +1,146 @@
+"""
+Headers and purging for a caching reverse proxy (CDN) in front of the site.
+
+Public pages are sent with a `Cache-Control` letting the proxy keep them
+(`s-maxage`) while browsers revalidate them, and a surrogate-key header
+listing what they show, e.g. `page:news lang:ja newsitem:42`. When content
+changes, the signal handlers purge its keys through `PURGE_BACKEND`, so the
+proxy can keep the pages until they actually change.
+"""
+import collections
+import logging
+import urllib.request
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the proxy's purge API
+PURGE_TIMEOUT = 5
+
+
+def view_key(view_name):
+    """
+    Returns the surrogate key of every page of a view.
+    """
+    return f"page:{view_name}"
+
+
+def language_key(language_code):
+    """
+    Returns the surrogate key of every page in a language.
+    """
+    return f"lang:{language_code}"
+
+
+def object_key(model, pk):
+    """
+    Returns the surrogate key of the pages showing an object.
+    """
+    return f"{model._meta.model_name}:{pk}"
+
+
+def add_surrogate_keys(request, objects):
+    """
+    Adds the keys of the objects shown by the view to the response's surrogate keys.
+    """
+    if not hasattr(request, "surrogate_keys"):
+        request.surrogate_keys = []
+    request.surrogate_keys.extend(object_key(type(obj), obj.pk) for obj in objects)
+
+
+def set_public_cache_headers(request, response, view_name, timeout):
+    """
+    Lets front caches keep the response of a public view for `timeout` seconds,
+    and tags it with its surrogate keys.
+    """
+    keys = [view_key(view_name), language_key(request.LANGUAGE_CODE)]
+    keys += getattr(request, "surrogate_keys", [])
+    response[settings.SURROGATE_KEY_HEADER] = " ".join(dict.fromkeys(keys))
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True, s_maxage=timeout)
+
+
+def set_private_cache_headers(response):
+    """
+    Keeps front caches from storing the response of a public view
+    (for logged-in users, or with an unknown query string).
+    """
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+def trim_vary(response):
+    """
+    Removes `Cookie` from the `Vary` header of a tagged public response:
+    the page is the same for every anonymous visitor, and the front cache
+    has to pass requests with a session cookie through anyway.
+    """
+    if settings.SURROGATE_KEY_HEADER not in response or not response.has_header("Vary"):
+        return
+    vary = [field.strip() for field in response["Vary"].split(",")]
+    vary = [field for field in vary if field and field.lower() != "cookie"]
+    if vary:
+        response["Vary"] = ", ".join(vary)
+    else:
+        del response["Vary"]
+
+
+class BasePurgeBackend:
+    """
+    Purges pages from the front cache by surrogate key.
+    """
+
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class LocalPurgeBackend(BasePurgeBackend):
+    """
+    Stand-in for a front cache, recording the purged keys
+    (for development and tests, see the `purge` view).
+    """
+    purged = collections.deque(maxlen=1000)
+
+    def purge(self, keys):
+        logger.info("Purged %s", " ".join(keys))
+        self.purged.extend(keys)
+
+
+class HttpPurgeBackend(BasePurgeBackend):
+    """
+    Sends the keys to purge to the front cache's API at `PURGE_URL`, in the
+    surrogate-key header of a POST request (with `PURGE_TOKEN` as bearer token).
+    """
+
+    def purge(self, keys):
+        request = urllib.request.Request(settings.PURGE_URL, method="POST")
+        request.add_header(settings.SURROGATE_KEY_HEADER, " ".join(keys))
+        if settings.PURGE_TOKEN:
+            request.add_header("Authorization", f"Bearer {settings.PURGE_TOKEN}")
+        try:
+            with urllib.request.urlopen(request, timeout=PURGE_TIMEOUT):
+                pass
+        except OSError:
+            # The pages expire after s-maxage anyway
+            logger.warning("Could not purge %s", " ".join(keys), exc_info=True)
+
+
+def get_purge_backend():
+    """
+    Returns the configured purge backend, or None.
+    """
+    if not settings.PURGE_BACKEND:
+        return None
+    return import_string(settings.PURGE_BACKEND)()
+
+
+def purge(*keys):
+    """
+    Purges the pages with the surrogate keys from the front cache,
+    once the current transaction is committed.
+    """
+    backend = get_purge_backend()
+    if backend is not None and keys:
+        transaction.on_commit(lambda: backend.purge(list(dict.fromkeys(keys))))
@@ -0,0 +1,15 @@
+"""
+Image generators of the common app, discovered by django-imagekit.
+"""
+from imagekit import register
+
+from .renditions import (
+    CKEDITOR_THUMBNAIL_ID,
+    CONTENT_RENDITION,
+    CKEditorThumbnailSpec,
+    register_rendition_generators,
+)
+
+register.generator(CKEDITOR_THUMBNAIL_ID, CKEditorThumbnailSpec)
+# the images uploaded through CKEditor aren't in an image field, so there's no source group
+register_rendition_generators((CONTENT_RENDITION,))
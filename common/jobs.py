@@ -0,0 +1,178 @@
+"""
+Background generation of the image renditions.
+
+Requests never resize images: saving an image (in the admin or through the
+CKEditor uploader) records a `RenditionJob` per file to generate, and pages
+show the original image until the renditions exist.
+The `rendition_worker` management command claims the pending jobs and
+generates the files in a process pool.
+
+The jobs are rows in the database, so no message broker is needed.
+"""
+import datetime
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db.models import Q
+from django.utils import timezone
+from imagekit.cachefiles.backends import BaseAsync, CacheFileState
+
+from .models import RenditionJob
+from .renditions import CONTENT_RENDITION, get_cachefile, rendition_name, send_renditions_generated
+from .richtext import refresh_rich_text
+
+logger = logging.getLogger(__name__)
+
+# Number of attempts before a job is marked as failed
+MAX_ATTEMPTS = 3
+
+# Delay before retrying a failed job, doubled after each attempt
+RETRY_DELAY = datetime.timedelta(minutes=1)
+
+# Running jobs not finished after this delay are assumed lost (e.g. the worker was killed)
+STALE_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+def enqueue(source_name, generator_id):
+    """
+    Records a job for the file of the generator. A finished (done or failed)
+    job is set back to pending: the file is scheduled again because it's
+    missing (e.g. `gc_media` deleted it), or to retry it.
+    Returns whether a job was created or set back to pending.
+    """
+    job, created = RenditionJob.objects.get_or_create(
+        source_name=source_name,
+        generator_id=generator_id,
+    )
+    if created:
+        return True
+    finished = (RenditionJob.Status.DONE, RenditionJob.Status.FAILED)
+    now = timezone.now()
+    return bool(RenditionJob.objects.filter(pk=job.pk, status__in=finished).update(
+        status=RenditionJob.Status.PENDING,
+        attempts=0,
+        last_error="",
+        available_at=now,
+        updated=now,
+    ))
+
+
+class RenditionJobBackend(BaseAsync):
+    """
+    imagekit cache file backend scheduling the generation with a `RenditionJob`.
+    """
+
+    def schedule_generation(self, file, force=False):
+        generator_id = getattr(file.generator, "generator_id", None)
+        if generator_id is None:
+            # Not a registered generator, so the worker couldn't rebuild it
+            self.generate_now(file, force=force)
+            return
+        enqueue(file.generator.source.name, generator_id)
+        self.set_state(file, CacheFileState.GENERATING)
+
+
+def claim_jobs(limit):
+    """
+    Marks up to `limit` jobs ready to run as running, and returns them.
+
+    Each job is claimed with a conditional update on its attempt counter,
+    so concurrent workers never claim the same job.
+    """
+    now = timezone.now()
+    claimable = (
+        Q(status=RenditionJob.Status.PENDING, available_at__lte=now)
+        | Q(status=RenditionJob.Status.RUNNING, updated__lt=now - STALE_TIMEOUT)
+    )
+    jobs = []
+    for job in RenditionJob.objects.filter(claimable).order_by("available_at", "pk")[:limit]:
+        claimed = RenditionJob.objects.filter(pk=job.pk, attempts=job.attempts).update(
+            status=RenditionJob.Status.RUNNING,
+            attempts=job.attempts + 1,
+            updated=now,
+        )
+        if claimed:
+            job.status = RenditionJob.Status.RUNNING
+            job.attempts += 1
+            jobs.append(job)
+    return jobs
+
+
+def generate(source_name, generator_id):
+    """
+    Generates the file of the generator for the source, if it doesn't exist yet.
+    Runs in the worker processes.
+    """
+    cachefile = get_cachefile(source_name, generator_id)
+    if not cachefile.storage.exists(cachefile.name):
+        cachefile.cachefile_backend.generate_now(cachefile, force=True)
+
+
+def _finish(job, error=None):
+    """
+    Records the result of the job, scheduling a retry after an error.
+    """
+    cachefile = get_cachefile(job.source_name, job.generator_id)
+    if error is None:
+        job.status = RenditionJob.Status.DONE
+        job.last_error = ""
+        cachefile.cachefile_backend.set_state(cachefile, CacheFileState.EXISTS)
+    else:
+        logger.warning("Rendition job %s failed (attempt %d): %s", job, job.attempts, error)
+        job.last_error = error
+        if job.attempts < MAX_ATTEMPTS:
+            job.status = RenditionJob.Status.PENDING
+            job.available_at = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = RenditionJob.Status.FAILED
+            cachefile.cachefile_backend.set_state(cachefile, CacheFileState.DOES_NOT_EXIST)
+    job.save(update_fields=["status", "last_error", "available_at", "updated"])
+
+
+def _error_message(exc):
+    return f"{type(exc).__name__}: {exc}"
+
+
+def process_jobs(limit=50, workers=None):
+    """
+    Claims up to `limit` jobs and generates their files in a pool of
+    `workers` processes (the number of CPUs by default, or in this process if 0).
+    Returns the number of jobs done and failed.
+    """
+    jobs = claim_jobs(limit)
+    if not jobs:
+        return 0, 0
+
+    errors = {}
+    if workers == 0:
+        for job in jobs:
+            try:
+                generate(job.source_name, job.generator_id)
+            except Exception as exc:
+                errors[job.pk] = _error_message(exc)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = {
+                job.pk: pool.submit(generate, job.source_name, job.generator_id)
+                for job in jobs
+            }
+            for pk, future in futures.items():
+                exc = future.exception()
+                if exc is not None:
+                    errors[pk] = _error_message(exc)
+
+    for job in jobs:
+        _finish(job, errors.get(job.pk))
+    failed = sum(1 for job in jobs if job.pk in errors)
+    generated = [(job.source_name, job.generator_id) for job in jobs if job.pk not in errors]
+    # The cached pages showing these images may show placeholders for the new renditions
+    send_renditions_generated(generated)
+    sources = {
+        source_name for source_name, generator_id in generated
+        if rendition_name(generator_id) == CONTENT_RENDITION
+    }
+    if sources:
+        # The rich text showing these images can use their renditions now
+        refresh_rich_text(sources)
+    return len(jobs) - failed, failed
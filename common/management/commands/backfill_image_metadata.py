@@ -0,0 +1,73 @@
+"""
+Stores the dimensions, file size, MIME type and placeholder of the images
+uploaded before they were recorded on upload, and schedules their admin
+thumbnails:
+
+    python manage.py backfill_image_metadata
+"""
+import mimetypes
+
+from django.apps import apps
+from django.core.files.images import get_image_dimensions
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from common.fields import ImageMetadataField
+from common.renditions import ADMIN_THUMBNAIL, get_rendition_file, image_placeholder
+
+
+def image_metadata_fields():
+    """
+    Returns the (model, field) of every ImageMetadataField.
+    """
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, ImageMetadataField)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Stores the dimensions, size, MIME type and placeholder of the images missing them"
+
+    def handle(self, *args, **options):
+        updated = missing = 0
+        for model, field in image_metadata_fields():
+            missing_metadata = Q(**{f"{field.width_field}__isnull": True})
+            if field.size_field:
+                missing_metadata |= Q(**{f"{field.size_field}__isnull": True})
+            if field.placeholder_field:
+                missing_metadata |= Q(**{field.placeholder_field: ""})
+            rows = model._default_manager.exclude(**{field.attname: ""}).filter(missing_metadata)
+            for instance in rows.iterator():
+                image = getattr(instance, field.attname)
+                try:
+                    with image.storage.open(image.name) as f:
+                        width, height = get_image_dimensions(f)
+                        placeholder = color = ""
+                        if field.placeholder_field and width:
+                            f.seek(0)
+                            placeholder, color = image_placeholder(f)
+                    size = image.storage.size(image.name)
+                except OSError:
+                    self.stderr.write(f"missing: {image.name}")
+                    missing += 1
+                    continue
+
+                values = {field.width_field: width, field.height_field: height}
+                if field.size_field:
+                    values[field.size_field] = size
+                if field.mime_type_field:
+                    values[field.mime_type_field] = mimetypes.guess_type(image.name)[0] or ""
+                if field.placeholder_field:
+                    values[field.placeholder_field] = placeholder
+                if field.color_field:
+                    values[field.color_field] = color
+                # update() doesn't send signals, so the cached pages are kept
+                model._default_manager.filter(pk=instance.pk).update(**values)
+                if width:
+                    get_rendition_file(image, *ADMIN_THUMBNAIL).generate()
+                updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} images updated, {missing} missing"))
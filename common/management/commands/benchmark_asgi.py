@@ -0,0 +1,153 @@
+"""
+Measures how many requests a single ASGI worker serves at once while the
+database is slow, by sending requests to the application in this process:
+
+    python manage.py benchmark_asgi [--path /en/news/] [--db-latency 0.05] [--concurrency 10]
+
+Every query is delayed by `--db-latency` seconds. The requests are sent one
+at a time first (like a sync worker, which serves one request at a time),
+then `--concurrency` at a time. They bypass the page cache (with an unknown
+query parameter), so each one runs the view.
+"""
+import asyncio
+import contextlib
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.utils import CursorWrapper
+
+
+class QueryLatency:
+    """
+    Delays every query, in every thread, counting the queries in flight.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def installed(self):
+        original = CursorWrapper._execute
+        benchmark = self
+
+        def _execute(self, *args, **kwargs):
+            with benchmark._lock:
+                benchmark.in_flight += 1
+                benchmark.max_in_flight = max(benchmark.max_in_flight, benchmark.in_flight)
+            try:
+                time.sleep(benchmark.latency)
+            finally:
+                with benchmark._lock:
+                    benchmark.in_flight -= 1
+            return original(self, *args, **kwargs)
+
+        CursorWrapper._execute = _execute
+        try:
+            yield self
+        finally:
+            CursorWrapper._execute = original
+
+
+async def asgi_get(application, host, path, query_string=""):
+    """
+    Sends a GET request to the ASGI application, returning its status code.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "root_path": "",
+        "headers": [(b"host", host.encode())],
+        "client": ("127.0.0.1", 0),
+        "server": (host, 80),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client never disconnects
+        return await asyncio.get_running_loop().create_future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = "Measures the requests served at once by an ASGI worker while the database is slow"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/en/news/", help="Path requested (default: /en/news/)")
+        parser.add_argument("--host", default="localhost", help="Host header, in ALLOWED_HOSTS (default: localhost)")
+        parser.add_argument("--requests", type=int, default=20, help="Number of requests per run (default: 20)")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Requests sent at once in the concurrent run (default: 10)",
+        )
+        parser.add_argument(
+            "--db-latency",
+            type=float,
+            default=0.05,
+            help="Seconds added to every query (default: 0.05)",
+        )
+
+    def handle(self, *args, **options):
+        application = ASGIHandler()
+        # Loads the caches, templates and translations before measuring
+        async_to_sync(self.get)(application, options, 0)
+
+        runs = (("one at a time", 1), (f"{options['concurrency']} at a time", options["concurrency"]))
+        results = {}
+        for label, concurrency in runs:
+            with QueryLatency(options["db_latency"]).installed() as latency:
+                elapsed, durations = async_to_sync(self.run)(application, options, concurrency)
+            requests = len(durations)
+            results[concurrency] = requests / elapsed
+            self.stdout.write(
+                f"{label}: {requests} requests in {elapsed:.2f} s ({requests / elapsed:.1f} requests/s), "
+                f"{sum(durations) / elapsed:.1f} requests in flight on average, "
+                f"{latency.max_in_flight} queries in flight at most"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{results[options['concurrency']] / results[1]:.1f}x the throughput of one request at a time"
+        ))
+
+    async def get(self, application, options, number):
+        status = await asgi_get(application, options["host"], options["path"], f"benchmark={number}")
+        if status != 200:
+            raise CommandError(f"{options['path']} answered {status}")
+
+    async def run(self, application, options, concurrency):
+        """
+        Sends the requests, `concurrency` at a time. Returns the elapsed
+        time, and the duration of each request.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        durations = []
+
+        async def request(number):
+            async with semaphore:
+                start = time.perf_counter()
+                await self.get(application, options, number)
+                durations.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(number) for number in range(options["requests"])))
+        return time.perf_counter() - start, durations
@@ -0,0 +1,62 @@
+"""
+Compares the bytes of the images uploaded through CKEditor with their
+optimized versions, without changing any file:
+
+    python manage.py benchmark_uploads [--format webp] [file ...]
+
+Without files, every image under `CKEDITOR_UPLOAD_PATH` in the media
+storage is measured (except the image browser thumbnails).
+"""
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from common.renditions import FORMATS
+from common.uploads import optimize_image, stored_images
+
+
+class Command(BaseCommand):
+    help = "Compares the bytes of the CKEditor uploads before and after optimization"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="*", help="Image files to measure (default: the CKEditor uploads)")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Format of the optimized images (default: CKEDITOR_IMAGE_FORMAT)",
+        )
+        parser.add_argument(
+            "--max-size",
+            type=int,
+            help="Maximum dimension of the optimized images (default: CKEDITOR_IMAGE_MAX_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        if options["files"]:
+            images = ((path, lambda path=path: open(path, "rb")) for path in options["files"])
+        else:
+            images = (
+                (name, lambda name=name: default_storage.open(name))
+                for name in stored_images(settings.CKEDITOR_UPLOAD_PATH.rstrip("/"))
+            )
+
+        count = before = after = 0
+        for name, open_file in images:
+            with open_file() as f:
+                file_object = File(f, name=name)
+                size = file_object.size
+                optimized = optimize_image(file_object, options["format"], options["max_size"])
+            optimized_size = size if optimized is None else optimized[0].size
+            count += 1
+            before += size
+            after += optimized_size
+            self.stdout.write(f"{name}: {size} -> {optimized_size} bytes")
+
+        if not count:
+            self.stdout.write("No images")
+            return
+        saved = before - after
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} images: {before} -> {after} bytes ({saved} saved, {saved * 100 / before:.1f}%)"
+        ))
@@ -0,0 +1,66 @@
+"""
+Compares the time taken to build the URLs of the content by `cached_reverse`
+and by `reverse` under `translation.override`, without querying the database:
+
+    python manage.py benchmark_urls [--number 10000]
+"""
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import translation
+
+from common.utils import cached_reverse
+
+# URL name: arguments
+VIEWS = {
+    "home": {},
+    "news-detail": {"pk": 42},
+    "tour-detail": {"pk": 42},
+    "photo-detail": {"pk": 42},
+    "video-detail": {"pk": 42},
+}
+
+
+def reverse_for(viewname, language_code, **kwargs):
+    """
+    Builds the URL like `get_absolute_url_for` did before the URLs were cached.
+    """
+    with translation.override(language_code):
+        return reverse(viewname, kwargs=kwargs)
+
+
+class Command(BaseCommand):
+    help = "Compares cached_reverse with reverse under translation.override"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--number",
+            type=int,
+            default=10000,
+            help="Number of URLs built per view and language (default: 10000)",
+        )
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        totals = {reverse_for: 0, cached_reverse: 0}
+        for viewname, kwargs in VIEWS.items():
+            for language_code, name in settings.LANGUAGES:
+                times = {}
+                for function in totals:
+                    if function(viewname, language_code, **kwargs) != reverse_for(viewname, language_code, **kwargs):
+                        raise AssertionError(f"{function.__name__} built another URL for {viewname}")
+                    times[function] = timeit.timeit(
+                        lambda: function(viewname, language_code, **kwargs),
+                        number=number,
+                    )
+                    totals[function] += times[function]
+                self.stdout.write(
+                    f"{viewname} ({language_code}): "
+                    f"reverse {times[reverse_for] / number * 1e6:.2f} µs, "
+                    f"cached_reverse {times[cached_reverse] / number * 1e6:.2f} µs"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"cached_reverse is {totals[reverse_for] / totals[cached_reverse]:.1f}x faster"
+        ))
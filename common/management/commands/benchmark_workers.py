@@ -0,0 +1,169 @@
+"""
+Compares gunicorn started without a configuration (the former start
+command) with `gunicorn.conf.py`, on the memory of each worker and the
+latency of the first requests:
+
+    python manage.py benchmark_workers [--workers 2] [--path /en/news/]
+
+Each server is started on a free local port with the current settings. The
+first requests are sent at once, one per worker, while the workers are cold;
+then the same requests again. They bypass the page cache (with an unknown
+query parameter), so each one runs the view. The memory of the workers is
+then read from /proc (Linux only): the private memory is what a worker
+doesn't share with the master or the other workers.
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_TIMEOUT = 60
+
+
+def free_port():
+    """
+    Returns a local port nothing listens on.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def child_pids(pid):
+    """
+    Returns the pids of the children of the process.
+    """
+    children = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name, in parentheses, may contain spaces
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry.name))
+    return children
+
+
+def memory_kb(pid):
+    """
+    Returns the resident, proportional and private memory of the process, in KB.
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            name, _sep, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                values[name] = int(value.split()[0])
+    private = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values["Rss"], values["Pss"], private
+
+
+class Command(BaseCommand):
+    help = "Compares the worker memory and cold-request latency with and without gunicorn.conf.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Number of workers (default: 2)")
+        parser.add_argument("--path", default="/en/news/", help="Path requested (default: /en/news/)")
+        parser.add_argument("--host", default="localhost", help="Host header, in ALLOWED_HOSTS (default: localhost)")
+
+    def handle(self, *args, **options):
+        if not Path("/proc/self/smaps_rollup").exists():
+            raise CommandError("The memory of the workers can only be read on Linux")
+        workers = str(options["workers"])
+        with tempfile.NamedTemporaryFile("w", suffix=".py") as empty_config:
+            runs = (
+                (
+                    "without configuration",
+                    ["-c", empty_config.name, "-k", "uvicorn.workers.UvicornWorker", "-w", workers,
+                     "murasaki.asgi:application"],
+                ),
+                ("gunicorn.conf.py", ["-c", str(settings.BASE_DIR / "gunicorn.conf.py"), "-w", workers]),
+            )
+            results = [(label, self.measure(arguments, options)) for label, arguments in runs]
+
+        for label, (cold, warm, memory) in results:
+            self.stdout.write(
+                f"{label}: first requests {cold * 1000:.0f} ms on average, then {warm * 1000:.0f} ms; "
+                f"per worker RSS {memory[0] / 1024:.1f} MB, PSS {memory[1] / 1024:.1f} MB, "
+                f"private {memory[2] / 1024:.1f} MB"
+            )
+        (_label, (before_cold, _warm, before)), (_label, (after_cold, _warm, after)) = results
+        self.stdout.write(self.style.SUCCESS(
+            f"{(before[2] - after[2]) / 1024:.1f} MB less private memory per worker, "
+            f"first requests {before_cold / after_cold:.1f}x faster"
+        ))
+
+    def measure(self, arguments, options):
+        """
+        Starts gunicorn, and returns the average latency of the first
+        requests, then of the same requests warm, and the average memory of
+        the workers after them.
+        """
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{port}", "--log-level", "warning", *arguments],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "WEB_CONCURRENCY": str(options["workers"])},
+        )
+        try:
+            pids = self.wait_for_workers(server, port, options["workers"])
+            cold = self.get_all(port, options, options["workers"])
+            warm = self.get_all(port, options, options["workers"])
+            memory = [memory_kb(pid) for pid in pids]
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=STARTUP_TIMEOUT)
+        averages = tuple(sum(values) / len(values) for values in zip(*memory))
+        return cold, warm, averages
+
+    def wait_for_workers(self, server, port, workers):
+        """
+        Waits until gunicorn listens and all its workers are booted.
+        Returns the pids of the workers.
+        """
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn exited with status {server.returncode}")
+            pids = child_pids(server.pid)
+            if len(pids) == workers:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                except OSError:
+                    pass
+                else:
+                    # Give the last worker the time to load the application
+                    time.sleep(1)
+                    return pids
+            time.sleep(0.1)
+        raise CommandError("gunicorn didn't start in time")
+
+    def get_all(self, port, options, count):
+        """
+        Sends `count` requests at once. Returns their average duration.
+        """
+        def get(number):
+            request = Request(
+                f"http://127.0.0.1:{port}{options['path']}?benchmark={number}",
+                headers={"Host": options["host"]},
+            )
+            start = time.perf_counter()
+            with urlopen(request, timeout=STARTUP_TIMEOUT) as response:
+                response.read()
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(count) as executor:
+            durations = list(executor.map(get, range(count)))
+        return sum(durations) / count
@@ -0,0 +1,29 @@
+"""
+Shows the counters of the caching layers:
+
+    python manage.py cache_metrics [--reset]
+"""
+from django.core.management.base import BaseCommand
+
+from common.metrics import METRICS, get_metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = "Shows the counters of the caching layers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Set the counters back to 0 after showing them",
+        )
+
+    def handle(self, *args, **options):
+        metrics = get_metrics()
+        for name, value in metrics.items():
+            self.stdout.write(f"{name}: {value} ({METRICS[name]})")
+        lookups = metrics["translation_cache_hits"] + metrics["translation_cache_misses"]
+        if lookups:
+            self.stdout.write(f"translation cache hit ratio: {metrics['translation_cache_hits'] / lookups:.1%}")
+        if options["reset"]:
+            reset_metrics()
@@ -0,0 +1,60 @@
+"""
+Moves the uploaded images saved before the content-addressed storage
+to their content-addressed names, so identical files are shared:
+
+    python manage.py dedupe_media
+
+The old files are left in place.
+"""
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from common.storage import (
+    blob_name,
+    content_hash,
+    content_storage,
+    is_blob_name,
+    tracked_fields,
+    update_refcounts,
+)
+
+
+class Command(BaseCommand):
+    help = "Moves the uploaded images to their content-addressed names"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the files that would be moved",
+        )
+
+    def handle(self, *args, **options):
+        moved = {}
+        for model, field_name in tracked_fields():
+            names = (
+                model._default_manager
+                .exclude(**{field_name: ""})
+                .values_list(field_name, flat=True)
+                .distinct()
+            )
+            for name in names:
+                if is_blob_name(name):
+                    continue
+                if not content_storage.exists(name):
+                    self.stderr.write(f"missing: {name}")
+                    continue
+                if name not in moved:
+                    with content_storage.open(name) as f:
+                        if options["dry_run"]:
+                            moved[name] = blob_name(name, content_hash(File(f))[0])
+                        else:
+                            moved[name] = content_storage.save(name, File(f, name=name))
+                if not options["dry_run"]:
+                    model._default_manager.filter(**{field_name: name}).update(**{field_name: moved[name]})
+                self.stdout.write(f"{name} -> {moved[name]}")
+
+        if not options["dry_run"]:
+            update_refcounts(*moved.values())
+        unique = len(set(moved.values()))
+        self.stdout.write(self.style.SUCCESS(f"{len(moved)} files, {unique} unique"))
@@ -0,0 +1,66 @@
+"""
+Shows the query plans of the live listings.
+
+Used to check that the listings use the partial indexes on the translation tables:
+
+    python manage.py explain_listings
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from gallery.models import Photo, Video
+from pages.models import NewsItem, TourDate
+
+# The listing models, with the index their live listing should use
+LISTINGS = (
+    (NewsItem, "newsitem_live_date_idx"),
+    (TourDate, "tourdate_live_date_idx"),
+    (Photo, "photo_live_date_idx"),
+    (Video, "video_live_date_idx"),
+)
+
+
+class Command(BaseCommand):
+    help = "Shows the query plans of the live listings, and whether they use the listing indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--language",
+            action="append",
+            dest="languages",
+            help="Language to explain (default: en and ja)",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries with EXPLAIN ANALYZE (PostgreSQL only)",
+        )
+        parser.add_argument(
+            "--no-seqscan",
+            action="store_true",
+            help="Disable sequential scans, so small PostgreSQL tables still show the index plan",
+        )
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if connection.vendor == "postgresql":
+            if options["analyze"]:
+                explain_options["analyze"] = True
+            if options["no_seqscan"]:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET enable_seqscan = off")
+
+        missing = 0
+        for language_code in options["languages"] or ["en", "ja"]:
+            for model, index_name in LISTINGS:
+                plan = model.objects.live(language_code)[:10].explain(**explain_options)
+                self.stdout.write(f"{model.__name__} ({language_code}):")
+                self.stdout.write(plan)
+                if index_name in plan:
+                    self.stdout.write(self.style.SUCCESS(f"uses {index_name}\n"))
+                else:
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(f"does not use {index_name}\n"))
+
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} listing(s) not using their index"))
@@ -0,0 +1,178 @@
+"""
+Exports the public pages (every listing page and every detail page, in every
+language) to EXPORT_ROOT as pre-compressed HTML, which `ExportedSiteMiddleware`
+serves without running the views:
+
+    python manage.py export_site
+
+Saving content removes the exported pages showing it, until the next export.
+With --incremental, only those pages (and the pages of new URLs) are rendered:
+
+    python manage.py export_site --incremental
+"""
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+from django.utils import translation
+
+from common.export import export_file_name, export_page, read_manifest, remove_file, write_manifest
+from common.pagination import KeysetPaginator
+from gallery.models import Photo, Video
+from gallery.views import PHOTOS_PER_PAGE, VIDEOS_PER_PAGE
+from pages.models import NewsItem, Page, TourDate
+from pages.signals import PAGE_TYPE_VIEWS
+from pages.views import NEWS_PER_PAGE, TOUR_PER_PAGE
+
+# The views without objects or pagination
+STATIC_VIEWS = ("home", "band", "music", "shop")
+
+# The paginated listings: (view name, model, items per page)
+LISTINGS = (
+    ("news", NewsItem, NEWS_PER_PAGE),
+    ("tour", TourDate, TOUR_PER_PAGE),
+    ("photos", Photo, PHOTOS_PER_PAGE),
+    ("videos", Video, VIDEOS_PER_PAGE),
+)
+
+# The models shown on the site: (model, the views listing it, its detail view)
+MODEL_VIEWS = (
+    (NewsItem, ("home", "news"), "news-detail"),
+    (TourDate, ("home", "tour"), "tour-detail"),
+    (Photo, ("photos",), "photo-detail"),
+    (Video, ("videos",), "video-detail"),
+)
+
+
+def listing_urls(view_name, model, per_page, language_code):
+    """
+    Yields the URL of every page of the listing, following the keyset cursors.
+    """
+    base_url = reverse(view_name)
+    paginator = KeysetPaginator(model, language_code, per_page)
+    cursor = None
+    while True:
+        page = paginator.get_page(after=cursor)
+        yield f"{base_url}?after={cursor}" if cursor else base_url
+        if page.has_previous():
+            # The "previous" links of the pages
+            yield f"{base_url}?before={page.previous_cursor}"
+        if not page.has_next():
+            return
+        cursor = page.next_cursor
+
+
+def site_urls():
+    """
+    Yields the (URL, view name, pk) of every public page, in every language.
+    """
+    for language_code, _ in settings.LANGUAGES:
+        with translation.override(language_code):
+            for view_name in STATIC_VIEWS:
+                yield reverse(view_name), view_name, None
+            for view_name, model, per_page in LISTINGS:
+                for url in listing_urls(view_name, model, per_page, language_code):
+                    yield url, view_name, None
+            for model, _, view_name in MODEL_VIEWS:
+                for pk in model.objects.live(language_code).values_list("pk", flat=True):
+                    yield reverse(view_name, kwargs={"pk": pk}), view_name, pk
+
+
+def changed_pages(since):
+    """
+    Returns the (view name, pk) of the pages showing content updated since
+    the time. A None pk stands for every page of the view.
+    """
+    changed = set()
+    for model, listing_views, detail_view in MODEL_VIEWS:
+        translations = model._parler_meta.root_model.objects.filter(updated__gt=since)
+        for pk in translations.values_list("master_id", flat=True).distinct():
+            changed.update((view_name, None) for view_name in listing_views)
+            changed.add((detail_view, pk))
+    translations = Page._parler_meta.root_model.objects.filter(updated__gt=since)
+    for page_type in translations.values_list("page_type", flat=True).distinct():
+        changed.update((view_name, None) for view_name in PAGE_TYPE_VIEWS.get(page_type, ()))
+    return changed
+
+
+class Command(BaseCommand):
+    help = "Exports the public pages to EXPORT_ROOT as pre-compressed HTML"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only render the pages that changed since the last export",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: the number of CPUs, 0 to run in this process)",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.EXPORT_ROOT:
+            raise CommandError("EXPORT_ROOT isn't set")
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        started = time.time()
+        previous = read_manifest()
+
+        pages = {}
+        for url, view_name, pk in site_urls():
+            parts = urlsplit(url)
+            name = export_file_name(parts.path, parse_qsl(parts.query))
+            if name is not None:
+                pages[name] = {"url": url, "view": view_name, "pk": pk}
+
+        if options["incremental"] and previous["built"]:
+            changed = changed_pages(datetime.datetime.fromtimestamp(previous["built"], datetime.timezone.utc))
+            names = [
+                name for name, page in pages.items()
+                if name not in previous["files"]
+                or (page["view"], None) in changed
+                or (page["view"], page["pk"]) in changed
+                or not os.path.isfile(os.path.join(settings.EXPORT_ROOT, name))
+            ]
+        else:
+            names = list(pages)
+
+        digests = self.render(names, pages, previous["files"], options["workers"])
+
+        files = {}
+        for name, page in pages.items():
+            sha256 = digests[name] if name in digests else previous["files"].get(name, {}).get("sha256")
+            if sha256:
+                files[name] = {**page, "sha256": sha256}
+            else:
+                remove_file(name)
+        for name in previous["files"].keys() - pages.keys():
+            remove_file(name)
+        write_manifest({"built": started, "files": files})
+
+        skipped = sum(1 for name in names if not digests[name])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(names) - skipped} pages rendered, {skipped} skipped, {len(files)} exported"
+        ))
+
+    @staticmethod
+    def render(names, pages, previous_files, workers):
+        """
+        Renders the pages in a pool of `workers` processes, returning their digests by name.
+        """
+        tasks = {name: (pages[name]["url"], name, previous_files.get(name, {}).get("sha256")) for name in names}
+        if workers == 0 or not tasks:
+            return {name: export_page(*task) for name, task in tasks.items()}
+
+        # The worker processes open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = {name: pool.submit(export_page, *task) for name, task in tasks.items()}
+            return {name: future.result() for name, future in futures.items()}
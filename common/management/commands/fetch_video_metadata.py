@@ -0,0 +1,49 @@
+"""
+Resolves the metadata of the videos saved before it was stored on save,
+through `VIDEO_METADATA_FETCHER`, and schedules their thumbnail renditions:
+
+    python manage.py fetch_video_metadata [--all]
+"""
+from django.core.management.base import BaseCommand
+
+from common.renditions import schedule_renditions
+from gallery.embeds import copy_video_metadata, update_video_metadata
+from gallery.imagegenerators import VIDEO_THUMBNAIL_RENDITIONS
+from gallery.models import Video
+
+
+class Command(BaseCommand):
+    help = "Resolves the metadata of the videos missing it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Resolve the metadata of every video again",
+        )
+
+    def handle(self, *args, **options):
+        translations = Video._parler_meta.root_model.objects.order_by("pk")
+        if not options["all"]:
+            translations = translations.filter(video_provider="")
+
+        resolved = {}
+        updated = unresolved = 0
+        for translation in translations.iterator():
+            if translation.video in resolved:
+                # Another translation with the same URL
+                copy_video_metadata(translation, resolved[translation.video])
+            else:
+                update_video_metadata(translation)
+            # Invalidates the pages showing the video
+            translation.save()
+            resolved[translation.video] = translation
+            if not translation.video_provider:
+                unresolved += 1
+                self.stderr.write(f"unsupported or unavailable: {translation.video}")
+                continue
+            if translation.video_thumbnail:
+                schedule_renditions(translation.video_thumbnail, VIDEO_THUMBNAIL_RENDITIONS)
+            updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} videos updated, {unresolved} unresolved"))
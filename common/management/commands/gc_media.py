@@ -0,0 +1,188 @@
+"""
+Deletes the uploaded files that nothing references anymore:
+
+    python manage.py gc_media --dry-run
+    python manage.py gc_media [--grace-period 24]
+
+The references are the file fields of every model (including the translation
+tables) and the media URLs in the rich text fields. The renditions of a
+referenced image, and its thumbnail in the CKEditor image browser, are kept
+with it.
+
+Only the upload directories and the renditions directory are scanned, one
+directory at a time. Files modified during the grace period are kept, since
+the rows referencing them may not be saved yet.
+"""
+import functools
+import os
+import re
+import time
+from urllib.parse import unquote
+
+from ckeditor.fields import RichTextField
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import FileField
+
+from common.models import MediaBlob, RenditionJob
+
+# Suffix of the thumbnails of the CKEditor image browser (see `get_thumb_filename`)
+THUMBNAIL_SUFFIX = "_thumb"
+
+
+@functools.cache
+def model_fields(field_class):
+    """
+    Returns the (model, field name) of every field of the class.
+    """
+    return [
+        (model, field.attname)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, field_class)
+    ]
+
+
+def media_url_re():
+    """
+    Returns the pattern of the media URLs, capturing the file names.
+    """
+    return re.compile(re.escape(settings.MEDIA_URL) + r"([^\"'\s<>?#]+)")
+
+
+def referenced_names():
+    """
+    Returns the names of the files referenced by the file fields and the rich text.
+    """
+    names = set()
+    for model, field_name in model_fields(FileField):
+        rows = model._default_manager.exclude(**{field_name: ""}).values_list(field_name, flat=True)
+        names.update(rows.iterator())
+    url_re = media_url_re()
+    for model, field_name in model_fields(RichTextField):
+        rows = (
+            model._default_manager
+            .filter(**{f"{field_name}__contains": settings.MEDIA_URL})
+            .values_list(field_name, flat=True)
+        )
+        for value in rows.iterator():
+            names.update(unquote(path) for path in url_re.findall(value))
+    return names
+
+
+def is_still_referenced(name):
+    """
+    Checks the references of a file again, right before deleting it.
+    """
+    if MediaBlob.objects.filter(name=name, refcount__gt=0).exists():
+        return True
+    if any(
+        model._default_manager.filter(**{field_name: name}).exists()
+        for model, field_name in model_fields(FileField)
+    ):
+        return True
+    url = default_storage.url(name)
+    return any(
+        model._default_manager.filter(**{f"{field_name}__contains": url}).exists()
+        for model, field_name in model_fields(RichTextField)
+    )
+
+
+def media_directories():
+    """
+    Returns the directories of MEDIA_ROOT holding uploads or renditions.
+    """
+    directories = {
+        field.upload_to.strip("/")
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, FileField) and isinstance(field.upload_to, str) and field.upload_to.strip("/")
+    }
+    directories.add(settings.CKEDITOR_UPLOAD_PATH.strip("/"))
+    directories.add(settings.IMAGEKIT_CACHEFILE_DIR.strip("/"))
+    # Scan nested directories only once
+    return [
+        directory for directory in sorted(directories)
+        if not any(directory.startswith(f"{other}/") for other in directories)
+    ]
+
+
+def walk(directory):
+    """
+    Yields the (name, modification time, size) of the files in a directory of
+    MEDIA_ROOT, recursively, listing one directory at a time.
+    """
+    subdirectories = []
+    try:
+        with os.scandir(default_storage.path(directory)) as entries:
+            for entry in entries:
+                name = f"{directory}/{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat()
+                    yield name, stat.st_mtime, stat.st_size
+    except FileNotFoundError:
+        return
+    for subdirectory in sorted(subdirectories):
+        yield from walk(subdirectory)
+
+
+def source_name(name, cache_dir):
+    """
+    Returns the name of the image a rendition or thumbnail was made from
+    (without extension for the renditions), or None for other files.
+    """
+    if name.startswith(f"{cache_dir}/"):
+        return os.path.dirname(name[len(cache_dir) + 1:])
+    root, extension = os.path.splitext(name)
+    if root.endswith(THUMBNAIL_SUFFIX):
+        return f"{root[:-len(THUMBNAIL_SUFFIX)]}{extension}"
+    return None
+
+
+class Command(BaseCommand):
+    help = "Deletes the uploaded files and renditions that nothing references"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the files that would be deleted",
+        )
+        parser.add_argument(
+            "--grace-period",
+            type=float,
+            default=24,
+            help="Keep the files modified during the last hours (default: 24)",
+        )
+
+    def handle(self, *args, **options):
+        names = referenced_names()
+        roots = {os.path.splitext(name)[0] for name in names}
+        cache_dir = settings.IMAGEKIT_CACHEFILE_DIR.strip("/")
+        cutoff = time.time() - options["grace_period"] * 60 * 60
+        verb = "would delete" if options["dry_run"] else "deleted"
+
+        count = total = 0
+        for directory in media_directories():
+            for name, modified, size in walk(directory):
+                if name in names or modified > cutoff:
+                    continue
+                source = source_name(name, cache_dir)
+                if source is not None:
+                    if source in names or (name.startswith(f"{cache_dir}/") and source in roots):
+                        continue
+                elif is_still_referenced(name):
+                    continue
+                if not options["dry_run"]:
+                    default_storage.delete(name)
+                    MediaBlob.objects.filter(name=name).delete()
+                    RenditionJob.objects.filter(source_name=name).delete()
+                count += 1
+                total += size
+                self.stdout.write(f"{verb}: {name} ({size} bytes)")
+
+        self.stdout.write(self.style.SUCCESS(f"{count} files {verb}, {total} bytes"))
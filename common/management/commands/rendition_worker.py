@@ -0,0 +1,55 @@
+"""
+Generates the scheduled image renditions in a pool of worker processes.
+
+Run it next to the web server:
+
+    python manage.py rendition_worker
+
+or from cron, processing the pending jobs and exiting:
+
+    python manage.py rendition_worker --once
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from common.jobs import process_jobs
+
+
+class Command(BaseCommand):
+    help = "Generates the scheduled image renditions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when there are no more jobs ready to run",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: the number of CPUs, 0 to run in this process)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Number of jobs claimed at a time",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait when there are no jobs",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done, failed = process_jobs(options["batch_size"], options["workers"])
+            if done or failed:
+                self.stdout.write(f"{done} done, {failed} failed")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
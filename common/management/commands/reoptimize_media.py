@@ -0,0 +1,211 @@
+"""
+Optimizes the images uploaded before the uploads were optimized (see
+`common.uploads`), in a pool of processes:
+
+    python manage.py reoptimize_media
+
+The news and gallery images and the CKEditor uploads are re-encoded to new
+files, and the rows referencing each file are updated in a transaction.
+The old files are left in place. The renditions of every image are
+scheduled for the `rendition_worker`.
+
+The progress is kept in MEDIA_OPTIMIZATION_MANIFEST with the SHA-256 of
+each file, so an interrupted run resumes where it stopped, and files that
+didn't change since they were processed are skipped.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from common.renditions import (
+    ADMIN_THUMBNAIL,
+    CKEDITOR_THUMBNAIL_ID,
+    CONTENT_RENDITION,
+    StoredFile,
+    field_renditions,
+    get_cachefile,
+    get_rendition_file,
+    schedule_renditions,
+)
+from common.richtext import rich_text_fields
+from common.storage import content_hash, content_storage, tracked_fields
+from common.uploads import reoptimize_file, stored_images
+
+
+def read_manifest(path):
+    """
+    Returns the manifest of the previous runs, or an empty one.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+
+def write_manifest(path, manifest):
+    """
+    Replaces the manifest atomically.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def media_sources():
+    """
+    Returns the stored images to optimize, with the (model, field name) of the
+    image fields referencing them (none for the CKEditor uploads).
+    Files of the image fields that no row references are left alone.
+    """
+    sources = {}
+    for model, field_name in tracked_fields():
+        referenced = set(model._default_manager.exclude(**{field_name: ""}).values_list(field_name, flat=True))
+        for name in stored_images(model._meta.get_field(field_name).upload_to, content_storage):
+            if name in referenced:
+                sources.setdefault(name, []).append((model, field_name))
+    for name in stored_images(settings.CKEDITOR_UPLOAD_PATH.rstrip("/")):
+        sources.setdefault(name, [])
+    return sources
+
+
+def replace_field_file(name, result, fields):
+    """
+    Stores the optimized image of the image fields, and points the rows to it.
+    Returns its name.
+    """
+    directory = fields[0][0]._meta.get_field(fields[0][1]).upload_to
+    filename = f"{os.path.splitext(os.path.basename(name))[0]}{result['extension']}"
+    new_name = content_storage.save(os.path.join(directory, filename), ContentFile(result["content"]))
+    with transaction.atomic():
+        for model, field_name in fields:
+            field = model._meta.get_field(field_name)
+            for instance in model._default_manager.select_for_update().filter(**{field_name: name}):
+                setattr(instance, field_name, new_name)
+                setattr(instance, field.width_field, result["width"])
+                setattr(instance, field.height_field, result["height"])
+                # Updates the refcounts, and invalidates the pages showing it
+                instance.save()
+    return new_name
+
+
+def replace_upload(name, result):
+    """
+    Stores the optimized CKEditor upload, and replaces its URL in the rich text.
+    Returns its name.
+    """
+    new_name = default_storage.save(
+        f"{os.path.splitext(name)[0]}{result['extension']}",
+        ContentFile(result["content"]),
+    )
+    old_url, new_url = default_storage.url(name), default_storage.url(new_name)
+    with transaction.atomic():
+        for model, field in rich_text_fields():
+            rows = model._default_manager.select_for_update().filter(**{f"{field.source_field}__contains": old_url})
+            for instance in rows:
+                setattr(instance, field.source_field, getattr(instance, field.source_field).replace(old_url, new_url))
+                # Renders the rich text again
+                instance.save()
+    return new_name
+
+
+def schedule_file_renditions(name, fields):
+    """
+    Schedules the renditions of a stored image.
+    """
+    source = StoredFile(name)
+    if not fields:
+        get_cachefile(name, CKEDITOR_THUMBNAIL_ID).generate()
+        schedule_renditions(source, (CONTENT_RENDITION,))
+    for model, field_name in fields:
+        names = [rendition for rendition in field_renditions(model, field_name) if rendition != ADMIN_THUMBNAIL[0]]
+        schedule_renditions(source, names)
+        get_rendition_file(source, *ADMIN_THUMBNAIL).generate()
+
+
+class Command(BaseCommand):
+    help = "Optimizes the uploaded images, updating the rows referencing them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: the number of CPUs, 0 to run in this process)",
+        )
+        parser.add_argument(
+            "--manifest",
+            default=settings.MEDIA_OPTIMIZATION_MANIFEST,
+            help="File keeping the progress (default: MEDIA_OPTIMIZATION_MANIFEST)",
+        )
+
+    def handle(self, *args, **options):
+        manifest_path = options["manifest"]
+        manifest = read_manifest(manifest_path)
+        files = manifest["files"]
+        sources = media_sources()
+        tasks = {name: files.get(name, {}).get("sha256") for name in sources}
+
+        optimized = skipped = failed = saved = 0
+        for name, result in self.optimize(tasks, options["workers"]):
+            if isinstance(result, Exception):
+                failed += 1
+                self.stderr.write(f"{name}: {type(result).__name__}: {result}")
+                continue
+            if result["sha256"] == tasks[name]:
+                skipped += 1
+                continue
+
+            new_name = None
+            if result["content"] is not None:
+                if sources[name]:
+                    new_name = replace_field_file(name, result, sources[name])
+                else:
+                    new_name = replace_upload(name, result)
+                size = len(result["content"])
+                files[new_name] = {"sha256": content_hash(ContentFile(result["content"]))[0], "size": size}
+                optimized += 1
+                saved += result["size"] - size
+                self.stdout.write(f"{name} -> {new_name}: {result['size']} -> {size} bytes")
+            schedule_file_renditions(new_name or name, sources[name])
+            files[name] = {"sha256": result["sha256"], "size": result["size"], "optimized": new_name}
+            write_manifest(manifest_path, manifest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{optimized} images optimized, {skipped} unchanged, {failed} failed: {saved} bytes saved"
+        ))
+
+    @staticmethod
+    def optimize(tasks, workers):
+        """
+        Yields the (name, result or exception) of `reoptimize_file` for the
+        files, run in a pool of `workers` processes, as they complete.
+        """
+        if workers == 0:
+            for name, known_digest in tasks.items():
+                try:
+                    yield name, reoptimize_file(name, known_digest)
+                except Exception as exc:
+                    yield name, exc
+            return
+        if not tasks:
+            return
+
+        # The worker processes open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = {
+                pool.submit(reoptimize_file, name, known_digest): name
+                for name, known_digest in tasks.items()
+            }
+            for future in as_completed(futures):
+                exc = future.exception()
+                yield futures[future], exc if exc is not None else future.result()
@@ -0,0 +1,27 @@
+"""
+Preloads the live translations of every language into the cache:
+
+    python manage.py warm_cache
+
+Run by `build.sh` and when the site starts, so the workers don't query the
+translations of every object on their first requests (see `common.translations`).
+"""
+from django.core.management.base import BaseCommand
+
+from common.translations import warm_translations
+
+
+class Command(BaseCommand):
+    help = "Preloads the live translations into the cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--language",
+            action="append",
+            dest="languages",
+            help="Only preload this language (can be repeated, default: every language)",
+        )
+
+    def handle(self, *args, **options):
+        cached, markers = warm_translations(options["languages"])
+        self.stdout.write(self.style.SUCCESS(f"{cached} translations cached, {markers} fallbacks marked"))
@@ -0,0 +1,53 @@
+"""
+Managers shared by the translatable content models.
+"""
+from django.db.models import Index, Prefetch, Q
+from django.utils.translation import get_language
+from parler.managers import TranslatableManager, TranslatableQuerySet
+from parler.utils import get_active_language_choices
+
+
+def live_date_index(name):
+    """
+    Returns the index of the translation table covering the live listings,
+    newest first (see `LiveQuerySet.live`).
+
+    `live` is the index condition rather than a column: the ORM filters on it
+    as a bare boolean, which SQLite can't match against an indexed column.
+    """
+    return Index(fields=["language_code", "-date", "-master"], condition=Q(live=True), name=name)
+
+
+class LiveQuerySet(TranslatableQuerySet):
+    """
+    QuerySet for content with `live` and `date` translated fields.
+    """
+
+    def live(self, language_code=None):
+        """
+        Returns the live objects for the language, newest first.
+        Ties are broken by pk, in the same order as the listing indexes.
+        """
+        language_code = language_code or get_language()
+        return self.translated(language_code, live=True).order_by(
+            "-translations__date",
+            "-translations__master",
+        )
+
+    def with_translations(self, language_code=None):
+        """
+        Loads the translations for the language (and its fallbacks) in a single
+        prefetch query, instead of one query per object when a translated
+        field is first read.
+        """
+        language_code = language_code or get_language()
+        meta = self.model._parler_meta.root
+        translations = meta.model.objects.filter(
+            language_code__in=get_active_language_choices(language_code),
+        )
+        return self.language(language_code).prefetch_related(
+            Prefetch(meta.rel_name, queryset=translations),
+        )
+
+
+LiveManager = TranslatableManager.from_queryset(LiveQuerySet)
@@ -0,0 +1,86 @@
+"""
+Counters of the caching layers, shared by the worker processes.
+
+The counters are kept in the `METRICS_CACHE_ALIAS` cache, so they reflect
+every gunicorn worker when that cache is shared (as in production).
+Show them with `python manage.py cache_metrics`.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+METRICS_PREFIX = "metrics"
+
+# The counters, and what they count
+METRICS = {
+    "page_renders": "public pages rendered by their view",
+    "page_stale_serves": "stale pages served while another request renders them",
+    "page_coalesced_waits": "requests that waited for another request's render",
+    "page_fallback_serves": "saved pages served because of database errors",
+    "translation_cache_hits": "translations found in the cache",
+    "translation_cache_misses": "translations missing from the cache, loaded from the database",
+}
+
+
+def get_metrics_cache():
+    """
+    Returns the cache backend holding the counters.
+    """
+    return caches[settings.METRICS_CACHE_ALIAS]
+
+
+def _key(name):
+    return f"{METRICS_PREFIX}:{name}"
+
+
+def incr_counter(cache, key, delta=1):
+    """
+    Increments a counter that never expires, creating it if needed.
+    """
+    if cache.add(key, delta, timeout=None):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # The counter was evicted between add() and incr()
+        cache.set(key, delta, timeout=None)
+
+
+async def aincr_counter(cache, key, delta=1):
+    """
+    Async version of `incr_counter`.
+    """
+    if await cache.aadd(key, delta, timeout=None):
+        return
+    try:
+        await cache.aincr(key, delta)
+    except ValueError:
+        await cache.aset(key, delta, timeout=None)
+
+
+def incr_metric(name, delta=1):
+    """
+    Increments a counter.
+    """
+    incr_counter(get_metrics_cache(), _key(name), delta)
+
+
+async def aincr_metric(name, delta=1):
+    """
+    Async version of `incr_metric`.
+    """
+    await aincr_counter(get_metrics_cache(), _key(name), delta)
+
+
+def get_metrics():
+    """
+    Returns the value of every counter, by name.
+    """
+    values = get_metrics_cache().get_many([_key(name) for name in METRICS])
+    return {name: values.get(_key(name), 0) for name in METRICS}
+
+
+def reset_metrics():
+    """
+    Sets every counter back to 0.
+    """
+    get_metrics_cache().delete_many([_key(name) for name in METRICS])
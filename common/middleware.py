@@ -0,0 +1,108 @@
+"""
+Middleware shared by the apps.
+"""
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .export import EXPORT_ENVIRON_KEY, export_file_name, export_file_path
+from .frontcache import trim_vary
+
+# Cache-Control of the exported pages: browsers revalidate them with the ETag
+EXPORTED_PAGE_CACHE_CONTROL = "no-cache"
+
+
+class ExportedSiteMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, also serving the pages exported by `export_site` (with their
+    pre-compressed variants) to anonymous visitors.
+
+    Requests with a session, a non-pagination query string, or for pages
+    that weren't exported (or were invalidated since) go to the views.
+
+    Under ASGI the files are looked up in the event loop (they're only
+    stat'ed), and the other requests go to the async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve_file(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        response = self.serve_file(request)
+        return response if response is not None else await self.get_response(request)
+
+    def serve_file(self, request):
+        """
+        Returns the response serving a static file or an exported page, or None.
+        """
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+
+        path = self.exported_page_path(request)
+        if path is None:
+            return None
+        try:
+            response = self.serve(self.get_static_file(path, request.path_info), request)
+        except OSError:
+            # Removed by an invalidation in the meantime
+            return None
+        response["Cache-Control"] = EXPORTED_PAGE_CACHE_CONTROL
+        return response
+
+    @staticmethod
+    def exported_page_path(request):
+        """
+        Returns the path of the exported page for the request, or None.
+        """
+        if not settings.EXPORT_ROOT or request.method not in ("GET", "HEAD"):
+            return None
+        if EXPORT_ENVIRON_KEY in request.META or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        params = [(name, value) for name, values in request.GET.lists() for value in values]
+        name = export_file_name(request.path_info, params)
+        path = export_file_path(name) if name else None
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+
+class FrontCacheMiddleware:
+    """
+    Trims the `Vary` header of the public pages tagged with surrogate keys,
+    after the session middleware added `Cookie` to it (so it goes above it).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        trim_vary(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        trim_vary(response)
+        return response
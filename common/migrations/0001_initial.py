@@ -0,0 +1,36 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:06
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenditionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_name', models.CharField(max_length=255, verbose_name='source name')),
+                ('generator_id', models.CharField(max_length=100, verbose_name='generator id')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=7, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='available at')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'available_at'], name='renditionjob_status_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='renditionjob',
+            constraint=models.UniqueConstraint(fields=('source_name', 'generator_id'), name='renditionjob_unique_source_generator'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+"""
+Models for the common app.
+"""
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class RenditionJob(models.Model):
+    """
+    A rendition file waiting to be generated by the `rendition_worker` command.
+
+    There is at most one job per (source file, generator), so scheduling
+    the same rendition again is a no-op.
+    """
+    class Status(models.TextChoices):
+        """
+        Enum for the job states.
+        """
+        PENDING = "pending", _("Pending")
+        RUNNING = "running", _("Running")
+        DONE = "done", _("Done")
+        FAILED = "failed", _("Failed")
+
+    source_name = models.CharField(_("source name"), max_length=255)
+    generator_id = models.CharField(_("generator id"), max_length=100)
+    status = models.CharField(
+        _("status"),
+        max_length=7,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(_("attempts"), default=0)
+    last_error = models.TextField(_("last error"), blank=True)
+    available_at = models.DateTimeField(_("available at"), default=timezone.now)
+    created = models.DateTimeField(_("created"), auto_now_add=True)
+    updated = models.DateTimeField(_("updated"), auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source_name", "generator_id"],
+                name="renditionjob_unique_source_generator",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "available_at"], name="renditionjob_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.generator_id} {self.source_name}"
+
+
+class MediaBlob(models.Model):
+    """
+    A file of the content-addressed storage, named after the hash of its content.
+
+    `refcount` is the number of database rows referencing the file,
+    kept up to date by `common.storage`.
+    """
+    name = models.CharField(_("name"), max_length=255, unique=True)
+    sha256 = models.CharField(_("SHA-256"), max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(_("size"))
+    refcount = models.PositiveIntegerField(_("reference count"), default=0)
+    created = models.DateTimeField(_("created"), auto_now_add=True)
+
+    def __str__(self):
+        return self.name
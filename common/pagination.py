@@ -0,0 +1,264 @@
+"""
+Pagination of the live listings.
+
+The default mode is keyset (cursor) pagination: pages are addressed by an
+opaque `?after=` / `?before=` token encoding the (date, pk) of the last /
+first item shown, so every page is a single index range scan on the
+translation table with no COUNT(*) and no OFFSET.
+
+Page-number links (`?page=`) remain available; their total count is cached
+until the listing is invalidated.
+
+Every page is cached under its query string (see `common.cache`), so only
+the canonical ones are served: a cursor must be the token of a live item of
+the listing, and a page number must be written as Django would write it
+and be in range. Malformed queries are a 404, which isn't cached. A valid
+cursor whose item was since deleted or unpublished (e.g. in the links of
+an older copy of a page) is redirected to the cursor of the same position
+(see `redirect_moved_cursors`).
+"""
+import base64
+import collections.abc
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.http import Http404, HttpResponseRedirect
+from django.utils.functional import cached_property
+
+from .cache import get_page_cache, view_cache_key
+
+
+def encode_cursor(date, pk):
+    """
+    Returns the opaque token for the item with the date and pk.
+    """
+    value = f"{date.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, date_field):
+    """
+    Returns the (date, pk) encoded in the token, or None if the token is invalid.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        date, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        return date_field.to_python(date), int(pk)
+    except Exception:
+        return None
+
+
+class CursorMoved(Exception):
+    """
+    Raised for a cursor whose item isn't live anymore, with the cursors of
+    the same position in the listing (both None for the first page).
+    """
+
+    def __init__(self, after=None, before=None):
+        super().__init__(after, before)
+        self.after = after
+        self.before = before
+
+
+class KeysetPage(collections.abc.Sequence):
+    """
+    A page of a keyset-paginated listing.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, keys, has_next, has_previous):
+        self.object_list = object_list
+        self._keys = keys
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(*self._keys[-1]) if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(*self._keys[0]) if self._has_previous else None
+
+
+class KeysetPaginator:
+    """
+    Paginates the live objects of a translatable model in a language, newest first.
+
+    The keys are read from the translation table only (covered by the
+    `<model>_live_date_idx` index), then the objects of the page are fetched
+    by pk with their translations.
+    """
+
+    def __init__(self, model, language_code, per_page):
+        self.model = model
+        self.language_code = language_code
+        self.per_page = per_page
+        self.translation_model = model._parler_meta.root_model
+
+    def _keys(self):
+        return self.translation_model.objects.filter(
+            language_code=self.language_code,
+            live=True,
+        ).values_list("date", "master_id")
+
+    def _cursor(self, token):
+        """
+        Returns the (date, pk) of the cursor. Raises InvalidPage if the token
+        isn't the canonical token of a (date, pk).
+        """
+        cursor = decode_cursor(token, self.translation_model._meta.get_field("date"))
+        if cursor is None or encode_cursor(*cursor) != token:
+            raise InvalidPage("Invalid cursor")
+        return cursor
+
+    def _moved(self, after=None, before=None):
+        """
+        Returns CursorMoved for the cursor of an item that isn't live anymore,
+        with the cursor of the same position.
+        """
+        keys = self._keys()
+        if after is not None:
+            # The page after the item preceding the position
+            date, pk = after
+            key = keys.filter(Q(date__gt=date) | Q(date=date, master_id__gt=pk)).order_by("date", "master_id").first()
+            return CursorMoved(after=encode_cursor(*key) if key else None)
+        date, pk = before
+        key = keys.filter(Q(date__lt=date) | Q(date=date, master_id__lt=pk)).order_by("-date", "-master_id").first()
+        if key is not None:
+            # The page before the item following the position
+            return CursorMoved(before=encode_cursor(*key))
+        # Past the end of the listing: its last page
+        key = keys.order_by("date", "master_id")[self.per_page:self.per_page + 1].first()
+        return CursorMoved(after=encode_cursor(*key) if key else None)
+
+    def page(self, after=None, before=None):
+        """
+        Returns the page following the `after` cursor, or preceding the `before` cursor,
+        or the first page without a cursor. Raises InvalidPage if a cursor
+        is malformed, and CursorMoved if its item isn't live anymore.
+        """
+        if after is not None and before is not None:
+            raise InvalidPage("Both cursors given")
+
+        keys = self._keys()
+        if before is not None:
+            cursor = date, pk = self._cursor(before)
+            keys = keys.filter(Q(date__gt=date) | Q(date=date, master_id__gte=pk))
+            keys = list(keys.order_by("date", "master_id")[:self.per_page + 2])
+        else:
+            if after is not None:
+                cursor = date, pk = self._cursor(after)
+                keys = keys.filter(Q(date__lt=date) | Q(date=date, master_id__lte=pk))
+            keys = list(keys.order_by("-date", "-master_id")[:self.per_page + 2])
+
+        if after is not None or before is not None:
+            # The range starts with the item of the cursor itself
+            if not keys or tuple(keys[0]) != cursor:
+                raise self._moved(**{"after" if after is not None else "before": cursor})
+            keys = keys[1:]
+        else:
+            keys = keys[:self.per_page + 1]
+
+        if before is not None:
+            has_previous = len(keys) > self.per_page
+            keys = keys[:self.per_page][::-1]
+            has_next = True
+        else:
+            has_next = len(keys) > self.per_page
+            keys = keys[:self.per_page]
+            has_previous = after is not None
+
+        objects = self.model.objects.with_translations(self.language_code).in_bulk(
+            [pk for date, pk in keys]
+        )
+        object_list = [objects[pk] for date, pk in keys if pk in objects]
+        return KeysetPage(object_list, keys, has_next, has_previous)
+
+    def get_page(self, after=None, before=None):
+        """
+        Returns the page of the cursors like `page()`, or the first page if they are invalid.
+        """
+        try:
+            return self.page(after=after or None, before=before or None)
+        except CursorMoved as moved:
+            return self.page(after=moved.after, before=moved.before)
+        except InvalidPage:
+            return self.page()
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator for the page-number mode, caching the object count
+    until the listing's view is invalidated.
+    """
+
+    def __init__(self, object_list, per_page, view_name, language_code, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.view_name = view_name
+        self.language_code = language_code
+
+    @cached_property
+    def count(self):
+        cache = get_page_cache()
+        key = view_cache_key(self.view_name, self.language_code, "count")
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, None)
+        return count
+
+
+def paginate(request, model, per_page, view_name):
+    """
+    Returns the page of live objects requested by the query string:
+    page-number mode for `?page=`, keyset mode otherwise.
+    Raises Http404 for a query string that isn't the canonical one of a page,
+    and CursorMoved for a cursor whose item isn't live anymore.
+    """
+    language_code = request.LANGUAGE_CODE
+    after, before = request.GET.get("after"), request.GET.get("before")
+    try:
+        if "page" in request.GET:
+            number = request.GET["page"]
+            if after is not None or before is not None or not number.isdecimal() or number != str(int(number)):
+                raise InvalidPage("Invalid page number")
+            objects = model.objects.live(language_code).with_translations(language_code)
+            paginator = CachedCountPaginator(objects, per_page, view_name, language_code)
+            page = paginator.page(number)
+            # Load the objects here, so the async views don't query them later
+            page.object_list = list(page.object_list)
+            return page
+
+        return KeysetPaginator(model, language_code, per_page).page(after=after, before=before)
+    except InvalidPage:
+        raise Http404("Invalid page")
+
+
+def redirect_moved_cursors(view):
+    """
+    Decorator of an async listing view, redirecting the cursors of the items
+    that aren't live anymore to the cursors of the same position.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except CursorMoved as moved:
+            query = {name: token for name, token in (("after", moved.after), ("before", moved.before)) if token}
+            return HttpResponseRedirect(f"{request.path}?{urlencode(query)}" if query else request.path)
+    return wrapper
@@ -0,0 +1,375 @@
+"""
+Named renditions (resized copies) of the uploaded images.
+
+Each rendition has a display width and is generated at 1x and 2x that width,
+in WebP and JPEG, by django-imagekit (under `CACHE/images/` in the media storage).
+Templates use them through the `responsive_image` tag in `renditions`.
+
+The files are generated in the background by the `rendition_worker` command
+(see `common.jobs`), never during a request.
+"""
+import base64
+import io
+
+from ckeditor_uploader.utils import get_thumb_filename
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+from imagekit import ImageSpec, register
+from imagekit.cachefiles import ImageCacheFile
+from imagekit.registry import generator_registry
+from imagekit.specs.sourcegroups import ImageFieldSourceGroup
+from PIL import Image, ImageOps
+from pilkit.processors import ResizeToFit
+
+# name: (display width in CSS pixels, `sizes` attribute)
+RENDITIONS = {
+    "grid": (320, "(min-width: 768px) 25vw, (min-width: 576px) 50vw, 100vw"),
+    "card": (480, "(min-width: 768px) 25vw, (min-width: 576px) 50vw, 100vw"),
+    "detail": (1200, "(min-width: 1400px) 1296px, 100vw"),
+    "thumbnail": (100, "100px"),
+    "content": (800, "(min-width: 992px) 800px, 100vw"),
+}
+
+# rendition of the images uploaded through CKEditor, shown in the rich text
+CONTENT_RENDITION = "content"
+
+# rendition, scale and format of the thumbnails shown in the admin changelists
+ADMIN_THUMBNAIL = ("thumbnail", 1, "jpeg")
+
+# pixel densities generated for each rendition
+SCALES = (1, 2)
+
+# format name: (PIL format, save options, MIME type)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 75, "method": 6}, "image/webp"),
+    "jpeg": ("JPEG", {"quality": 80, "progressive": True, "optimize": True}, "image/jpeg"),
+}
+
+# size (in pixels) of the inline placeholders shown while the images load
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 40
+# number of colors the dominant color is picked from
+PLACEHOLDER_COLORS = 8
+
+# generator of the thumbnails shown in the CKEditor image browser
+CKEDITOR_THUMBNAIL_ID = "murasaki:ckeditor-thumbnail"
+
+# Sent for each row showing an image whose renditions were generated, with the row as `instance`
+renditions_generated = Signal()
+
+
+class RenditionSpec(ImageSpec):
+    """
+    Base spec for the renditions: fit the source into `width`, never upscaling.
+    """
+    generator_id = None
+    width = None
+
+    @property
+    def processors(self):
+        return [ResizeToFit(width=self.width, upscale=False)]
+
+
+class CKEditorThumbnailSpec(ImageSpec):
+    """
+    The thumbnail of an image uploaded through CKEditor,
+    stored where the CKEditor image browser looks for it.
+    """
+    generator_id = CKEDITOR_THUMBNAIL_ID
+    processors = [ResizeToFit(75, 75)]
+
+    @property
+    def cachefile_name(self):
+        return get_thumb_filename(self.source.name)
+
+
+class StoredFile(File):
+    """
+    A file of the default storage, opened when it's first read.
+    """
+
+    def __init__(self, name):
+        super().__init__(None, name)
+
+    def open(self, mode="rb"):
+        if self.closed:
+            self.file = default_storage.open(self.name, mode)
+        else:
+            self.seek(0)
+        return self
+
+
+_spec_classes = {}
+_registered_generators = set()
+# (model, field name): the names of the renditions registered for the field
+_field_renditions = {}
+
+
+def generator_id(name, scale, image_format):
+    """
+    Returns the imagekit generator id of a rendition.
+    """
+    return f"murasaki:{name}:{scale}x:{image_format}"
+
+
+def rendition_name(key):
+    """
+    Returns the name of the rendition of an imagekit generator id, or None.
+    """
+    parts = key.split(":")
+    if len(parts) == 4 and parts[0] == "murasaki":
+        return parts[1]
+    return None
+
+
+def get_spec_class(name, scale, image_format):
+    """
+    Returns the spec class of a rendition, at the scale and in the format.
+    """
+    key = generator_id(name, scale, image_format)
+    if key not in _spec_classes:
+        width = RENDITIONS[name][0] * scale
+        pil_format, options, mime_type = FORMATS[image_format]
+        _spec_classes[key] = type(
+            f"{name.title()}{scale}x{image_format.title()}Spec",
+            (RenditionSpec,),
+            {"generator_id": key, "width": width, "format": pil_format, "options": options},
+        )
+    return _spec_classes[key]
+
+
+def get_rendition_file(source, name, scale, image_format):
+    """
+    Returns the imagekit cache file of a rendition of the source image.
+    """
+    return ImageCacheFile(get_spec_class(name, scale, image_format)(source=source))
+
+
+def get_cachefile(source_name, generator_id):
+    """
+    Returns the imagekit cache file of a registered generator,
+    for the file with the name in the default storage.
+    """
+    generator = generator_registry.get(generator_id, source=StoredFile(source_name))
+    return ImageCacheFile(generator)
+
+
+def schedule_renditions(image, names):
+    """
+    Schedules the generation of the renditions of the image (an image field file).
+    """
+    for name in names:
+        for scale in SCALES:
+            for image_format in FORMATS:
+                get_rendition_file(image, name, scale, image_format).generate()
+
+
+def rendition_srcsets(source, name, source_width, source_height):
+    """
+    Returns the srcset entries (cache file, width) of the rendition in each
+    format, skipping the scales that would be the same size
+    (small sources are never upscaled).
+    """
+    srcsets = {}
+    for image_format in FORMATS:
+        entries = []
+        widths = set()
+        for scale in SCALES:
+            width, height = rendition_size(source_width, source_height, name, scale)
+            if width in widths:
+                continue
+            widths.add(width)
+            entries.append((get_rendition_file(source, name, scale, image_format), width))
+        srcsets[image_format] = entries
+    return srcsets
+
+
+def missing_renditions(srcsets, schedule=False):
+    """
+    Returns the cache files of the srcsets that don't exist yet. With
+    `schedule`, also schedules their generation: only when saving, since
+    rendering a page mustn't write to the database.
+    """
+    missing = []
+    for entries in srcsets.values():
+        for cachefile, _ in entries:
+            backend = cachefile.cachefile_backend
+            if not backend.exists(cachefile):
+                if schedule:
+                    cachefile.generate()
+                    if backend.exists(cachefile):
+                        continue
+                missing.append(cachefile)
+    return missing
+
+
+def _format_srcset(entries):
+    return ", ".join(f"{cachefile.url} {width}w" for cachefile, width in entries)
+
+
+def picture_html(srcsets, name, width, height, attrs):
+    """
+    Returns a <picture> of the renditions in the srcsets, with the rendition's
+    `sizes` and the rendition's width and height.
+    """
+    sizes = RENDITIONS[name][1]
+    sources = format_html_join(
+        "",
+        "<source type=\"{}\" srcset=\"{}\" sizes=\"{}\">",
+        (
+            (FORMATS[image_format][2], _format_srcset(entries), sizes)
+            for image_format, entries in srcsets.items()
+            if image_format != "jpeg"
+        ),
+    )
+    jpeg = srcsets["jpeg"]
+    return format_html(
+        "<picture>{}<img src=\"{}\" srcset=\"{}\" sizes=\"{}\" width=\"{}\" height=\"{}\"{}></picture>",
+        sources,
+        jpeg[0][0].url,
+        _format_srcset(jpeg),
+        sizes,
+        width,
+        height,
+        flatatt(attrs),
+    )
+
+
+def image_dimensions(image):
+    """
+    Returns the (width, height) of an image field file, read from the model's
+    `width_field` and `height_field` when they are set, so the file isn't opened.
+    """
+    field = image.field
+    instance = getattr(image, "instance", None)
+    if instance is not None and field.width_field and field.height_field:
+        width = getattr(instance, field.width_field)
+        height = getattr(instance, field.height_field)
+        if width and height:
+            return width, height
+    return image.width, image.height
+
+
+def admin_thumbnail(image, width, height, size=100):
+    """
+    Returns an <img> of the admin thumbnail of the image, fitted in a `size` square.
+
+    Only the stored dimensions are used, so the image file is never opened.
+    The original is shown until the thumbnail is generated.
+    """
+    scale = min(size / width, size / height, 1)
+    thumbnail = get_rendition_file(image, *ADMIN_THUMBNAIL)
+    if thumbnail.cachefile_backend.exists(thumbnail):
+        url = thumbnail.url
+    else:
+        thumbnail.generate()
+        url = image.url
+    return format_html(
+        '<img src="{}" width="{}" height="{}" />',
+        url,
+        round(width * scale),
+        round(height * scale),
+    )
+
+
+def rendition_size(source_width, source_height, name, scale=1):
+    """
+    Returns the (width, height) of a rendition, given the source dimensions.
+    """
+    width = min(RENDITIONS[name][0] * scale, source_width)
+    height = round(source_height * width / source_width)
+    return width, height
+
+
+def register_rendition_generators(names):
+    """
+    Registers the generators of the renditions with imagekit,
+    so the `rendition_worker` can find them.
+    """
+    for name in names:
+        for scale in SCALES:
+            for image_format in FORMATS:
+                key = generator_id(name, scale, image_format)
+                if key not in _registered_generators:
+                    register.generator(key, get_spec_class(name, scale, image_format))
+                    _registered_generators.add(key)
+
+
+def register_renditions(model, field_name, names):
+    """
+    Registers the renditions of an image field with imagekit,
+    so `manage.py generateimages` can pre-generate them.
+    """
+    register_rendition_generators(names)
+    _field_renditions[(model, field_name)] = tuple(names)
+    for name in names:
+        for scale in SCALES:
+            for image_format in FORMATS:
+                key = generator_id(name, scale, image_format)
+                register.source_group(key, ImageFieldSourceGroup(model, field_name))
+
+
+def field_renditions(model, field_name):
+    """
+    Returns the names of the renditions registered for an image field.
+    """
+    return _field_renditions.get((model, field_name), ())
+
+
+def send_renditions_generated(generated):
+    """
+    Sends `renditions_generated` for the rows of the image fields showing
+    the sources of the generated (source name, generator id) pairs.
+    The admin thumbnails aren't shown by any page.
+    """
+    for (model, field_name), names in _field_renditions.items():
+        sources = {
+            source_name
+            for source_name, key in generated
+            if rendition_name(key) in names and rendition_name(key) != ADMIN_THUMBNAIL[0]
+        }
+        if sources:
+            for instance in model._default_manager.filter(**{f"{field_name}__in": sources}):
+                renditions_generated.send(sender=model, instance=instance)
+
+
+def image_placeholder(file):
+    """
+    Returns the placeholder of an image file: a tiny JPEG as a data URI,
+    and the dominant color of the image (as "#rrggbb").
+    """
+    with Image.open(file) as image:
+        # JPEGs are decoded at a reduced scale
+        image.draft("RGB", (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=PLACEHOLDER_QUALITY, optimize=True)
+    data_uri = f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+    quantized = image.quantize(PLACEHOLDER_COLORS)
+    count, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return data_uri, f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def placeholder_style(image):
+    """
+    Returns the inline style painting the placeholder of an image field file
+    (stored in the model's `placeholder_field` and `color_field`), or "".
+    """
+    field = image.field
+    instance = getattr(image, "instance", None)
+    placeholder_field = getattr(field, "placeholder_field", None)
+    color_field = getattr(field, "color_field", None)
+    placeholder = getattr(instance, placeholder_field) if instance is not None and placeholder_field else ""
+    color = getattr(instance, color_field) if instance is not None and color_field else ""
+    if placeholder:
+        return f"background: {color or 'transparent'} url({placeholder}) center / cover no-repeat"
+    if color:
+        return f"background-color: {color}"
+    return ""
@@ -0,0 +1,321 @@
+"""
+Rendering of the CKEditor rich text, done once when it's saved.
+
+The HTML is sanitized with an allowlist of tags and attributes (inline
+styles keep a few vetted properties, and iframes are only kept for the video
+players in `EMBED_HOSTS`), and the images uploaded through CKEditor are rewritten to their "content" renditions
+with their dimensions and `loading="lazy"` (see `RenderedHTMLField`).
+Images whose renditions aren't generated yet keep their original file, and
+the rich text is rendered again when the `rendition_worker` generates them.
+"""
+import html
+import re
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.utils.text import Truncator
+
+from .renditions import (
+    CONTENT_RENDITION,
+    StoredFile,
+    missing_renditions,
+    picture_html,
+    rendition_size,
+    rendition_srcsets,
+)
+
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "caption", "cite", "code", "del", "div",
+    "em", "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i",
+    "img", "ins", "li", "ol", "p", "pre", "s", "small", "span", "strong", "sub",
+    "sup", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "u", "ul",
+}
+
+# Attributes allowed on every tag, and on specific tags
+GLOBAL_ATTRIBUTES = {"class", "title", "lang", "dir", "style"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "target", "rel"},
+    "iframe": {"src", "width", "height", "allow", "allowfullscreen", "frameborder"},
+    "img": {"src", "alt", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan", "scope"},
+    "ol": {"start", "type"},
+}
+
+# Attributes kept without a value
+BOOLEAN_ATTRIBUTES = {"allowfullscreen"}
+
+URL_ATTRIBUTES = {"href", "src"}
+ALLOWED_URL_SCHEMES = {"", "http", "https", "mailto", "tel"}
+
+# Hosts of the video players whose iframes are kept (over https)
+EMBED_HOSTS = {"www.youtube.com", "www.youtube-nocookie.com", "player.vimeo.com"}
+
+COLOR_RE = re.compile(r"#[0-9a-f]{3,8}|[a-z]+|(rgb|rgba|hsl|hsla)\([\d\s.,%/]+\)", re.IGNORECASE)
+LENGTH_RE = re.compile(r"auto|0|\d+(\.\d+)?(px|em|rem|%|vw|vh)", re.IGNORECASE)
+
+# CSS property: pattern of the values kept in the style attributes
+ALLOWED_STYLES = {
+    "text-align": re.compile(r"left|right|center|justify|start|end", re.IGNORECASE),
+    "color": COLOR_RE,
+    "background-color": COLOR_RE,
+    "width": LENGTH_RE,
+    "height": LENGTH_RE,
+}
+
+VOID_TAGS = {"br", "hr", "img"}
+
+# Tags dropped with their content (the iframes of the players in EMBED_HOSTS are kept, empty)
+DROPPED_CONTENT_TAGS = {"script", "style", "iframe", "object", "embed", "template", "noscript"}
+
+# Length of the plain-text excerpts, in characters
+EXCERPT_LENGTH = 200
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Tags separating words in the plain text
+BLOCK_TAGS = {
+    "blockquote", "br", "caption", "div", "figcaption", "figure", "h1", "h2", "h3",
+    "h4", "h5", "h6", "hr", "li", "p", "pre", "td", "th", "tr",
+}
+
+
+def _is_safe_url(url):
+    # Browsers ignore control characters and whitespace in the scheme
+    scheme = urlsplit(re.sub(r"[\x00-\x20]", "", url)).scheme
+    return scheme.lower() in ALLOWED_URL_SCHEMES
+
+
+def _is_embed_url(url):
+    parts = urlsplit(url.strip())
+    return parts.scheme == "https" and parts.hostname in EMBED_HOSTS
+
+
+def sanitize_style(value):
+    """
+    Returns the declarations of a style attribute whose property and value are allowed.
+    """
+    declarations = []
+    for declaration in value.split(";"):
+        name, sep, style = declaration.partition(":")
+        name, style = name.strip().lower(), style.strip()
+        if sep and name in ALLOWED_STYLES and ALLOWED_STYLES[name].fullmatch(style):
+            declarations.append(f"{name}: {style}")
+    return "; ".join(declarations)
+
+
+def uploaded_image_name(src):
+    """
+    Returns the storage name of an image uploaded through CKEditor, or None
+    if the URL is something else.
+    """
+    prefix = settings.MEDIA_URL + settings.CKEDITOR_UPLOAD_PATH
+    path = urlsplit(src).path
+    if not path.startswith(prefix) or ".." in path:
+        return None
+    return unquote(path[len(settings.MEDIA_URL):])
+
+
+def uploaded_image_html(name, attrs):
+    """
+    Returns the HTML of an image uploaded through CKEditor: its content rendition,
+    or the original file with its dimensions until the rendition is generated.
+    """
+    try:
+        with default_storage.open(name) as f:
+            width, height = get_image_dimensions(f)
+    except (OSError, ValueError):
+        width = height = None
+    if not width or not height:
+        return None
+
+    attrs = {key: value for key, value in attrs.items() if key not in ("src", "width", "height")}
+    attrs.setdefault("alt", "")
+    attrs["loading"] = "lazy"
+    attrs["decoding"] = "async"
+    source = StoredFile(name)
+    srcsets = rendition_srcsets(source, CONTENT_RENDITION, width, height)
+    if missing_renditions(srcsets, schedule=True):
+        return format_tag("img", {
+            "src": default_storage.url(name),
+            "width": width,
+            "height": height,
+            **attrs,
+        })
+    return picture_html(srcsets, CONTENT_RENDITION, *rendition_size(width, height, CONTENT_RENDITION), attrs)
+
+
+def format_tag(tag, attrs):
+    attributes = "".join(f' {name}="{html.escape(str(value))}"' for name, value in attrs.items())
+    return f"<{tag}{attributes}>"
+
+
+class RichTextSanitizer(HTMLParser):
+    """
+    Keeps the allowed tags and attributes of the HTML, escaping the text.
+    """
+
+    def __init__(self, rewrite_images=True):
+        super().__init__(convert_charrefs=True)
+        self.rewrite_images = rewrite_images
+        self.output = []
+        self.open_tags = []
+        self.dropping = None
+
+    def allowed_attrs(self, tag, attrs):
+        """
+        Returns the allowed attributes of the tag, with their values sanitized.
+        """
+        allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+        attrs = {
+            name: "" if value is None else value
+            for name, value in attrs
+            if name in allowed and (value is not None or name in BOOLEAN_ATTRIBUTES)
+            and (name not in URL_ATTRIBUTES or _is_safe_url(value))
+        }
+        if "style" in attrs:
+            attrs["style"] = sanitize_style(attrs["style"])
+            if not attrs["style"]:
+                del attrs["style"]
+        return attrs
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropping:
+            return
+        if tag in DROPPED_CONTENT_TAGS:
+            # The content of a kept iframe is dropped too: browsers don't show it
+            self.dropping = tag
+            if tag == "iframe":
+                attrs = self.allowed_attrs(tag, attrs)
+                if _is_embed_url(attrs.get("src", "")):
+                    self.output.append(f"{format_tag(tag, attrs)}</iframe>")
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        attrs = self.allowed_attrs(tag, attrs)
+        if tag == "a" and attrs.get("target") == "_blank":
+            attrs["rel"] = "noopener noreferrer"
+        if tag == "img":
+            if "src" not in attrs:
+                return
+            name = uploaded_image_name(attrs["src"]) if self.rewrite_images else None
+            image = uploaded_image_html(name, attrs) if name else None
+            self.output.append(image or format_tag(tag, attrs))
+            return
+        self.output.append(format_tag(tag, attrs))
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        dropping = self.dropping
+        self.handle_starttag(tag, attrs)
+        if not dropping and self.dropping == tag:
+            # A self-closed <iframe /> has no content to drop
+            self.dropping = None
+        if tag in self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropping:
+            if tag == self.dropping:
+                self.dropping = None
+            return
+        if tag not in self.open_tags:
+            return
+        # Close the tags left open inside this one
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.output.append(html.escape(data, quote=False))
+
+    def get_html(self):
+        self.close()
+        return "".join(self.output) + "".join(f"</{tag}>" for tag in reversed(self.open_tags))
+
+
+class TextExtractor(HTMLParser):
+    """
+    Collects the text of the HTML.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.dropping = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_CONTENT_TAGS and not self.dropping:
+            self.dropping = tag
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag == self.dropping:
+            self.dropping = None
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(data)
+
+    def get_text(self):
+        self.close()
+        return WHITESPACE_RE.sub(" ", "".join(self.parts)).strip()
+
+
+def render_rich_text(value):
+    """
+    Returns the sanitized HTML of CKEditor rich text, with the uploaded images rewritten.
+    """
+    if not value:
+        return ""
+    sanitizer = RichTextSanitizer()
+    sanitizer.feed(value)
+    return sanitizer.get_html()
+
+
+def excerpt(value, length=EXCERPT_LENGTH):
+    """
+    Returns the plain text of rich text, truncated to `length` characters.
+    """
+    if not value:
+        return ""
+    extractor = TextExtractor()
+    extractor.feed(value)
+    return Truncator(extractor.get_text()).chars(length)
+
+
+def rich_text_fields():
+    """
+    Returns the (model, field) of every RenderedHTMLField.
+    """
+    from .fields import RenderedHTMLField
+
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, RenderedHTMLField)
+    ]
+
+
+def refresh_rich_text(source_names):
+    """
+    Renders again the rich text showing any of the uploaded images, once
+    their renditions exist. Saving the rows invalidates the pages showing them.
+    """
+    for model, field in rich_text_fields():
+        for name in source_names:
+            rows = model._default_manager.filter(**{f"{field.source_field}__contains": name})
+            for instance in rows:
+                instance.save()
@@ -0,0 +1,166 @@
+"""
+Content-addressed storage for the uploaded images.
+
+Files are named after the SHA-256 of their content, in the directory of
+the field's `upload_to`, e.g. `news/3f/3fa9...c2.jpg`. Saving a file that
+is already stored returns the existing name instead of writing a copy,
+so the translations of an object (or objects sharing an image) share a
+single file.
+
+Each stored file has a `MediaBlob` row whose reference count is the number
+of rows referencing it, updated when the models using the storage are
+saved or deleted. Files no longer referenced are left in place.
+"""
+import functools
+import hashlib
+import os
+import re
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_save
+
+# Length of the hash prefix used as a subdirectory, to keep directories small
+PREFIX_LENGTH = 2
+
+# A SHA-256 digest as a path component, with or without extension
+DIGEST_COMPONENT_RE = re.compile(r"(?:^|/)[0-9a-f]{64}(?:[./]|$)")
+
+
+def content_hash(content):
+    """
+    Returns the SHA-256 hex digest and the size of the file's content.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha256.update(chunk)
+        size += len(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return sha256.hexdigest(), size
+
+
+def blob_name(name, digest):
+    """
+    Returns the content-addressed name of a file saved as `name`.
+    """
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(directory, digest[:PREFIX_LENGTH], f"{digest}{extension}")
+
+
+def is_blob_name(name):
+    """
+    Returns whether the name is a content-addressed name.
+    """
+    directory, filename = os.path.split(name)
+    digest = os.path.splitext(filename)[0]
+    return (
+        len(digest) == 64
+        and os.path.basename(directory) == digest[:PREFIX_LENGTH]
+        and all(c in "0123456789abcdef" for c in digest)
+    )
+
+
+def is_content_addressed(name):
+    """
+    Returns whether the content of the file with the name can never change:
+    content-addressed files, and the imagekit renditions of content-addressed
+    files (whose names include the source name and a hash of the spec).
+    """
+    return bool(DIGEST_COMPONENT_RE.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming the files after the hash of their content,
+    and storing identical files only once.
+    """
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        digest, size = content_hash(content)
+        name = blob_name(name, digest)
+        if not self.exists(name):
+            saved_name = super()._save(name, content)
+            if saved_name != name:
+                # Another process stored the same content concurrently
+                super().delete(saved_name)
+        MediaBlob.objects.get_or_create(name=name, defaults={"sha256": digest, "size": size})
+        return name
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_content_storage():
+    """
+    Returns the storage of the uploaded images (used as the `storage` of the fields).
+    """
+    return content_storage
+
+
+@functools.cache
+def tracked_fields():
+    """
+    Returns the (model, field name) of every file field using the content-addressed storage.
+    """
+    return [
+        (model, field.attname)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def update_refcounts(*names):
+    """
+    Recounts the rows referencing the files.
+    """
+    from .models import MediaBlob
+
+    for name in set(filter(None, names)):
+        refcount = sum(
+            model._default_manager.filter(**{field_name: name}).count()
+            for model, field_name in tracked_fields()
+        )
+        MediaBlob.objects.filter(name=name).update(refcount=refcount)
+
+
+def _field_names(sender):
+    return [field_name for model, field_name in tracked_fields() if model is sender]
+
+
+def _remember_previous_names(sender, instance, **kwargs):
+    """
+    Keeps the names referenced before the save, whose refcounts may drop.
+    """
+    field_names = _field_names(sender)
+    previous = None
+    if instance.pk is not None:
+        previous = sender._default_manager.filter(pk=instance.pk).values(*field_names).first()
+    instance._previous_blob_names = list(previous.values()) if previous else []
+
+
+def _update_saved_refcounts(sender, instance, **kwargs):
+    names = [getattr(instance, field_name).name for field_name in _field_names(sender)]
+    update_refcounts(*names, *getattr(instance, "_previous_blob_names", []))
+
+
+def _update_deleted_refcounts(sender, instance, **kwargs):
+    update_refcounts(*(getattr(instance, field_name).name for field_name in _field_names(sender)))
+
+
+def connect_signals():
+    """
+    Keeps the refcounts up to date when the models using the storage change.
+    """
+    for model in {model for model, field_name in tracked_fields()}:
+        pre_save.connect(_remember_previous_names, sender=model)
+        post_save.connect(_update_saved_refcounts, sender=model)
+        post_delete.connect(_update_deleted_refcounts, sender=model)
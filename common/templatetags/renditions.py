@@ -0,0 +1,62 @@
+"""
+Template tags for the image renditions.
+"""
+from django import template
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from common.renditions import (
+    image_dimensions,
+    missing_renditions,
+    picture_html,
+    placeholder_style,
+    rendition_size,
+    rendition_srcsets,
+)
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def responsive_image(context, image, rendition, **attrs):
+    """
+    Renders a <picture> for the image, with WebP and JPEG renditions in `srcset`,
+    the rendition's `sizes`, and the intrinsic width and height.
+    The stored placeholder of the image is painted behind it while it loads.
+
+    Until the renditions are generated, the original file is shown instead,
+    and the page is only cached for `PLACEHOLDER_PAGE_CACHE_TIMEOUT`. Their
+    generation is scheduled when the image is saved: rendering only checks
+    that the files exist.
+    Falls back to the original file if the renditions can't be generated.
+
+    Usage: {% responsive_image photo.image "grid" alt=photo.title class="img-fluid" %}
+    """
+    if not image:
+        return ""
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    style = placeholder_style(image)
+    if style:
+        attrs["style"] = "; ".join(filter(None, [attrs.get("style", "").strip().rstrip(";"), style]))
+    try:
+        source_width, source_height = image_dimensions(image)
+        srcsets = rendition_srcsets(image, rendition, source_width, source_height)
+        pending = missing_renditions(srcsets)
+    except Exception:
+        return format_html("<img src=\"{}\"{}>", image.url, flatatt(attrs))
+
+    width, height = rendition_size(source_width, source_height, rendition)
+    if pending:
+        request = context.get("request")
+        if request is not None:
+            request.page_cache_timeout = settings.PLACEHOLDER_PAGE_CACHE_TIMEOUT
+        return format_html(
+            "<img src=\"{}\" width=\"{}\" height=\"{}\"{}>",
+            image.url,
+            width,
+            height,
+            flatatt(attrs),
+        )
+    return picture_html(srcsets, rendition, width, height, attrs)
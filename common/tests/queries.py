@@ -0,0 +1,34 @@
+"""
+Shared helpers for the tests counting the queries of the views
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """
+    Checks that a page costs a constant number of queries, whatever the number
+    of items. The test case creates the items in `create_items(count)`.
+    """
+    def create_items(self, count):
+        raise NotImplementedError
+
+    def count_queries(self, url):
+        """
+        Returns the number of queries needed to render the page with cold caches
+        """
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, count=10):
+        """
+        Asserts that the page costs as many queries with one item as with `count`
+        """
+        self.create_items(1)
+        single = self.count_queries(url)
+        self.create_items(count - 1)
+        self.assertEqual(self.count_queries(url), single)
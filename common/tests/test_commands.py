@@ -0,0 +1,188 @@
+"""
+Unit tests for the management commands of the common app
+"""
+import os
+import time
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from common.jobs import process_jobs
+from common.models import MediaBlob, RenditionJob
+from common.renditions import get_rendition_file
+from gallery.models import Photo
+from pages.models import NewsItem
+from .test_renditions import RenditionTestCase, make_image
+from .test_uploads import make_camera_image
+
+
+class ExplainListingsTests(TestCase):
+    """
+    Test the explain_listings command
+    """
+
+    def test_listings_use_indexes(self):
+        """
+        Test that every live listing uses its index on SQLite
+        """
+        out = StringIO()
+        call_command("explain_listings", stdout=out)
+        output = out.getvalue()
+        for index_name in (
+            "newsitem_live_date_idx",
+            "tourdate_live_date_idx",
+            "photo_live_date_idx",
+            "video_live_date_idx",
+        ):
+            self.assertIn(f"uses {index_name}", output)
+        self.assertNotIn("does not use", output)
+        # The index also provides the ordering
+        self.assertNotIn("TEMP B-TREE", output)
+
+
+class BackfillImageMetadataTests(RenditionTestCase):
+    """
+    Test the backfill_image_metadata command
+    """
+
+    def test_backfill(self):
+        photo = Photo.objects.language("en").create(title="Photo", image=make_image(400, 300))
+        missing = Photo.objects.language("en").create(title="Missing", image="gallery/photos/missing.jpg")
+        translations = Photo._parler_meta.root_model.objects
+        translations.update(
+            image_width=None,
+            image_height=None,
+            image_size=None,
+            image_mime_type="",
+            image_placeholder="",
+            image_color="",
+        )
+        RenditionJob.objects.all().delete()
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command("backfill_image_metadata", stdout=stdout, stderr=stderr)
+
+        translation = translations.get(master=photo)
+        self.assertEqual((translation.image_width, translation.image_height), (400, 300))
+        self.assertEqual(translation.image_size, photo.image.size)
+        self.assertEqual(translation.image_mime_type, "image/jpeg")
+        self.assertTrue(translation.image_placeholder.startswith("data:image/jpeg;base64,"))
+        self.assertEqual(translation.image_color[0], "#")
+        self.assertIsNone(translations.get(master=missing).image_width)
+        self.assertIn("1 images updated, 1 missing", stdout.getvalue())
+        # the admin thumbnail is scheduled
+        self.assertEqual(RenditionJob.objects.get().generator_id, "murasaki:thumbnail:1x:jpeg")
+
+
+@override_settings(CKEDITOR_IMAGE_MAX_SIZE=1000)
+class ReoptimizeMediaTests(RenditionTestCase):
+    """
+    Test the reoptimize_media command
+    """
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+        super().tearDown()
+
+    def reoptimize(self):
+        out = StringIO()
+        call_command(
+            "reoptimize_media",
+            workers=0,
+            manifest=os.path.join(self.media_root, "manifest.json"),
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_reoptimize(self):
+        photo = Photo.objects.language("en").create(title="Photo", image=make_camera_image(2000, 1000))
+        old_image = photo.image.name
+        upload = default_storage.save("content/ckeditor/2020/01/01/camera.jpg", make_camera_image(1600, 1200))
+        news_item = NewsItem.objects.language("en").create(
+            title="News",
+            body=f'<p><img src="{default_storage.url(upload)}"></p>',
+        )
+        RenditionJob.objects.all().delete()
+
+        output = self.reoptimize()
+        self.assertIn("2 images optimized, 0 unchanged, 0 failed", output)
+
+        translation = Photo._parler_meta.root_model.objects.get(master=photo)
+        self.assertNotEqual(translation.image.name, old_image)
+        self.assertEqual((translation.image_width, translation.image_height), (1000, 500))
+        self.assertEqual(translation.image_size, translation.image.size)
+        self.assertEqual(MediaBlob.objects.get(name=old_image).refcount, 0)
+        self.assertEqual(MediaBlob.objects.get(name=translation.image.name).refcount, 1)
+        # the old file is left in place
+        self.assertTrue(default_storage.exists(old_image))
+
+        news_item = NewsItem.objects.language("en").get(pk=news_item.pk)
+        self.assertNotIn(default_storage.url(upload), news_item.body)
+        self.assertIn('width="1000" height="750"', news_item.body_html)
+        self.assertTrue(RenditionJob.objects.filter(source_name=translation.image.name).exists())
+        self.assertTrue(RenditionJob.objects.filter(generator_id="murasaki:ckeditor-thumbnail").exists())
+
+        # The new files and the old CKEditor upload are skipped
+        self.assertIn("0 images optimized, 3 unchanged, 0 failed", self.reoptimize())
+
+
+class GcMediaTests(RenditionTestCase):
+    """
+    Test the gc_media command
+    """
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+        super().tearDown()
+
+    def age(self, *names):
+        """
+        Makes the files two days old
+        """
+        old = time.time() - 2 * 24 * 60 * 60
+        for name in names:
+            os.utime(default_storage.path(name), (old, old))
+
+    def gc_media(self, **options):
+        out = StringIO()
+        call_command("gc_media", stdout=out, **options)
+        return out.getvalue()
+
+    def test_gc(self):
+        photo = Photo.objects.language("en").create(title="Photo", image=make_image(400, 300, "kept.jpg"))
+        orphan = Photo.objects.language("en").create(title="Orphan", image=make_image(500, 300, "orphan.jpg"))
+        orphan_image = orphan.image.name
+        orphan.delete()
+        kept_rendition = get_rendition_file(photo.image, "grid", 1, "jpeg")
+        kept_rendition.generate()
+        process_jobs(workers=0)
+        kept_rendition = kept_rendition.name
+        orphan_rendition = f"CACHE/images/{os.path.splitext(orphan_image)[0]}/0123456789abcdef.jpg"
+        default_storage.save(orphan_rendition, make_image(320, 192))
+
+        upload = default_storage.save("content/ckeditor/2024/01/01/used.jpg", make_image(100, 100))
+        unused = default_storage.save("content/ckeditor/2024/01/01/unused.jpg", make_image(100, 100))
+        unused_thumbnail = default_storage.save("content/ckeditor/2024/01/01/unused_thumb.jpg", make_image(75, 75))
+        recent = default_storage.save("content/ckeditor/2024/01/01/recent.jpg", make_image(100, 100))
+        NewsItem.objects.language("en").create(
+            title="News",
+            body=f'<p><img src="{default_storage.url(upload)}"></p>',
+        )
+        self.age(photo.image.name, orphan_image, kept_rendition, orphan_rendition, upload, unused, unused_thumbnail)
+
+        output = self.gc_media(dry_run=True)
+        self.assertIn("4 files would delete", output)
+        self.assertTrue(default_storage.exists(orphan_image))
+
+        output = self.gc_media()
+        self.assertIn("4 files deleted", output)
+        for name in (orphan_image, orphan_rendition, unused, unused_thumbnail):
+            self.assertFalse(default_storage.exists(name), name)
+        for name in (photo.image.name, kept_rendition, upload, recent):
+            self.assertTrue(default_storage.exists(name), name)
+        self.assertFalse(MediaBlob.objects.filter(name=orphan_image).exists())
+
+        # With no grace period, the recent upload goes too
+        self.assertIn("1 files deleted", self.gc_media(grace_period=0))
@@ -0,0 +1,146 @@
+"""
+Unit tests for the static export of the public pages
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from common.export import export_file_name, export_page
+from common.jobs import process_jobs
+from common.renditions import schedule_renditions
+from pages.imagegenerators import NEWS_ITEM_RENDITIONS
+from pages.models import NewsItem, Page
+from .test_renditions import RenditionTestCase, make_image
+
+
+class ExportFileNameTests(SimpleTestCase):
+    """
+    Test mapping URLs to exported files
+    """
+
+    def test_names(self):
+        self.assertEqual(export_file_name("/en/"), "en/index.html")
+        self.assertEqual(export_file_name("/ja/news/", [("after", "abc_-1")]), "ja/news/index.after=abc_-1.html")
+
+    def test_not_exported(self):
+        self.assertIsNone(export_file_name("/en/news"))
+        self.assertIsNone(export_file_name("/en/news/", [("page", "2")]))
+        self.assertIsNone(export_file_name("/en/news/", [("after", "../../x")]))
+
+
+class ExportSiteTests(RenditionTestCase):
+    """
+    Test the export_site command and serving the exported pages
+    """
+    def setUp(self) -> None:
+        super().setUp()
+        self.export_root = tempfile.mkdtemp()
+        self.export_override = override_settings(EXPORT_ROOT=self.export_root)
+        self.export_override.enable()
+        Page.objects.language("en").create(title="News", page_type=Page.PageType.NEWS)
+        self.news_items = [
+            NewsItem.objects.language("en").create(
+                title=f"News {number}",
+                body="Body",
+                live=True,
+                image=make_image(40, 30),
+            )
+            for number in range(12)
+        ]
+        for news_item in self.news_items:
+            schedule_renditions(news_item.image, NEWS_ITEM_RENDITIONS)
+        process_jobs(workers=0)
+
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+        NewsItem.objects.all().delete()
+        self.export_override.disable()
+        shutil.rmtree(self.export_root)
+        super().tearDown()
+
+    def export(self, *args):
+        out = StringIO()
+        call_command("export_site", *args, workers=0, stdout=out)
+        return out.getvalue()
+
+    def read_manifest(self):
+        with open(os.path.join(self.export_root, "manifest.json")) as f:
+            return json.load(f)
+
+    def test_export(self):
+        self.export()
+        files = self.read_manifest()["files"]
+        self.assertIn("en/index.html", files)
+        self.assertIn("ja/gallery/photos/index.html", files)
+        self.assertIn(f"en/news/{self.news_items[0].pk}/index.html", files)
+        # the second page of the news, and its link back to the first one
+        pages = [name for name, entry in files.items() if entry["view"] == "news" and name.startswith("en/")]
+        self.assertEqual(len(pages), 3)
+
+        path = os.path.join(self.export_root, "en", "news", "index.html")
+        with open(path, "rb") as f, gzip.open(f"{path}.gz") as compressed:
+            self.assertEqual(f.read(), compressed.read())
+
+    def test_serve_exported(self):
+        self.export()
+        with open(os.path.join(self.export_root, "en", "news", "index.html"), "wb") as f:
+            f.write(b"exported")
+
+        response = self.client.get("/en/news/")
+        self.assertEqual(b"".join(response.streaming_content), b"exported")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        response = self.client.get("/en/news/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        # Other query strings and sessions go to the views
+        self.assertNotEqual(self.client.get("/en/news/?page=1").content, b"exported")
+        self.client.cookies["sessionid"] = "session"
+        self.assertNotEqual(self.client.get("/en/news/").content, b"exported")
+
+    def test_invalidation(self):
+        self.export()
+        # the first export created the default pages
+        self.export("--incremental")
+        self.assertIn("0 pages rendered", self.export("--incremental"))
+
+        news_item = self.news_items[0]
+        news_item.title = "Changed"
+        with self.captureOnCommitCallbacks(execute=True):
+            news_item.save()
+        self.assertFalse(os.path.exists(os.path.join(self.export_root, "en", "news", "index.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.export_root, "en", f"news/{news_item.pk}/index.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.export_root, "en", "band", "index.html")))
+
+        output = self.export("--incremental")
+        self.assertTrue(os.path.exists(os.path.join(self.export_root, "en", "news", "index.html")))
+        # the home page, the news pages (in both languages) and the detail page
+        self.assertIn("7 pages rendered", output)
+
+    def test_bypasses_page_cache(self):
+        """
+        Test that the export renders the page rather than exporting the cached copy
+        """
+        self.client.get("/en/news/")
+        # Changed without the signals, so the cached page isn't invalidated
+        NewsItem._parler_meta.root_model.objects.filter(master=self.news_items[-1]).update(title="Changed")
+        self.assertNotIn("Changed", self.client.get("/en/news/").content.decode())
+        self.assertIsNotNone(export_page("/en/news/", "en/news/index.html"))
+        with open(os.path.join(self.export_root, "en", "news", "index.html")) as f:
+            self.assertIn("Changed", f.read())
+
+    def test_manifest_read_once(self):
+        """
+        Test that the invalidations only read the manifest again when it changes
+        """
+        self.export()
+        self.news_items[0].save()
+        with mock.patch("common.export.read_manifest") as read_manifest:
+            self.news_items[1].save()
+            self.news_items[2].save()
+        read_manifest.assert_not_called()
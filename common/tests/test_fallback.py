@@ -0,0 +1,81 @@
+"""
+Unit tests for the circuit breaker and the statement timeout of the degraded mode
+"""
+from unittest import mock
+
+from django.db.backends.signals import connection_created
+from django.test import SimpleTestCase, override_settings
+
+from common.fallback import CircuitBreaker, _set_statement_timeout, limit_statement_time
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """
+    Test opening and closing the circuit breaker
+    """
+    def setUp(self) -> None:
+        self.breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+        patcher = mock.patch("common.fallback.time.monotonic", return_value=100)
+        self.monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.monotonic.return_value = 131
+        # a single trial call
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+        self.monotonic.return_value = 162
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.is_open)
+
+
+class StatementTimeoutTests(SimpleTestCase):
+    """
+    Test setting the statement timeout on the connections of the web processes
+    """
+    def tearDown(self) -> None:
+        connection_created.disconnect(dispatch_uid="statement_timeout")
+
+    def test_postgresql(self):
+        connection = mock.MagicMock(vendor="postgresql")
+        with self.settings(DATABASE_STATEMENT_TIMEOUT=5000):
+            _set_statement_timeout(sender=None, connection=connection)
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.execute.assert_called_once_with("SET statement_timeout = 5000")
+
+    def test_other_vendors(self):
+        connection = mock.MagicMock(vendor="sqlite")
+        with self.settings(DATABASE_STATEMENT_TIMEOUT=5000):
+            _set_statement_timeout(sender=None, connection=connection)
+        connection.cursor.assert_not_called()
+
+    @override_settings(DATABASE_STATEMENT_TIMEOUT=5000)
+    def test_connected(self):
+        limit_statement_time()
+        self.assertTrue(connection_created.has_listeners())
+
+    def test_no_limit(self):
+        """
+        Test that nothing is connected without a timeout
+        """
+        limit_statement_time()
+        self.assertFalse(connection_created.has_listeners())
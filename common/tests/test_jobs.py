@@ -0,0 +1,159 @@
+"""
+Unit tests for the rendition jobs and the rendition worker
+"""
+import datetime
+import io
+
+from ckeditor_uploader.utils import get_thumb_filename
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from common import jobs
+from common.cache import _view_state
+from common.models import RenditionJob
+from common.renditions import get_rendition_file
+from common.uploads import RenditionUploadBackend
+from gallery.models import Photo
+from .test_renditions import RenditionTestCase, make_image
+
+
+class RenditionJobTests(RenditionTestCase):
+    """
+    Test scheduling and processing the rendition jobs
+    """
+
+    def create_photo(self, image=None):
+        return Photo.objects.language("en").create(
+            title="Photo",
+            image=image or make_image(2000, 1000),
+        )
+
+    def test_enqueue_idempotent(self):
+        """
+        Test that scheduling the same rendition twice creates a single job
+        """
+        photo = self.create_photo()
+        rendition = get_rendition_file(photo.image, "grid", 1, "jpeg")
+        self.assertTrue(jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg"))
+        self.assertFalse(jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg"))
+        rendition.generate()
+        self.assertEqual(RenditionJob.objects.count(), 1)
+
+    def test_enqueue_finished_again(self):
+        """
+        Test that scheduling a rendition again sets its finished job back to pending
+        """
+        photo = self.create_photo()
+        jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg")
+        for status in (RenditionJob.Status.DONE, RenditionJob.Status.FAILED):
+            RenditionJob.objects.update(status=status, attempts=jobs.MAX_ATTEMPTS, last_error="Error")
+            self.assertTrue(jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg"))
+            job = RenditionJob.objects.get()
+            self.assertEqual(job.status, RenditionJob.Status.PENDING)
+            self.assertEqual((job.attempts, job.last_error), (0, ""))
+        self.assertEqual(len(jobs.claim_jobs(10)), 1)
+
+    def test_invalidates_pages_showing_image(self):
+        """
+        Test that generating the renditions of a photo only invalidates the pages showing it
+        """
+        photo = self.create_photo()
+        jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg")
+        photos, detail, news = _view_state("photos"), _view_state("photo-detail", photo.pk), _view_state("news")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(jobs.process_jobs(workers=0), (1, 0))
+        self.assertNotEqual(_view_state("photos")[0], photos[0])
+        self.assertNotEqual(_view_state("photo-detail", photo.pk)[0], detail[0])
+        self.assertEqual(_view_state("news")[0], news[0])
+
+    def test_claim_once(self):
+        """
+        Test that a claimed job isn't claimed again by another worker
+        """
+        photo = self.create_photo()
+        jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg")
+        self.assertEqual(len(jobs.claim_jobs(10)), 1)
+        self.assertEqual(jobs.claim_jobs(10), [])
+
+    def test_reclaim_stale(self):
+        """
+        Test that a job left running by a killed worker is claimed again
+        """
+        photo = self.create_photo()
+        jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg")
+        jobs.claim_jobs(10)
+        RenditionJob.objects.update(updated=timezone.now() - datetime.timedelta(hours=1))
+        claimed = jobs.claim_jobs(10)
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claimed[0].attempts, 2)
+
+    def test_process_pool(self):
+        """
+        Test that the worker command generates the files in worker processes
+        """
+        photo = self.create_photo()
+        rendition = get_rendition_file(photo.image, "detail", 1, "webp")
+        rendition.generate()
+        call_command("rendition_worker", once=True, workers=2, stdout=io.StringIO())
+
+        job = RenditionJob.objects.get()
+        self.assertEqual(job.status, RenditionJob.Status.DONE)
+        self.assertEqual(job.attempts, 1)
+        with default_storage.open(rendition.name) as f:
+            self.assertEqual(Image.open(f).size, (1200, 600))
+        self.assertTrue(rendition.cachefile_backend.exists(rendition))
+
+    def test_retries(self):
+        """
+        Test that a failing job is retried later, then marked as failed
+        """
+        photo = self.create_photo(
+            SimpleUploadedFile("broken.jpg", b"not an image", content_type="image/jpeg"),
+        )
+        jobs.enqueue(photo.image.name, "murasaki:grid:1x:jpeg")
+        for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+            self.assertEqual(jobs.process_jobs(workers=0), (0, 1))
+            job = RenditionJob.objects.get()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn("UnidentifiedImageError", job.last_error)
+            # not ready to run again until the retry delay has passed
+            self.assertEqual(jobs.process_jobs(workers=0), (0, 0))
+            RenditionJob.objects.update(available_at=timezone.now())
+        self.assertEqual(job.status, RenditionJob.Status.FAILED)
+
+    def test_admin_schedules_renditions(self):
+        """
+        Test that saving a photo in the admin schedules its renditions
+        without generating them
+        """
+        User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.login(username="admin", password="password")
+        response = self.client.post(reverse("admin:gallery_photo_add") + "?language=en", {
+            "title": "Photo",
+            "image": make_image(2000, 1000),
+            "date": "2023-01-01",
+            "description": "",
+            "live": "on",
+        })
+        self.assertEqual(response.status_code, 302)
+        # grid and detail, at two scales, in two formats, and the admin thumbnail
+        self.assertEqual(RenditionJob.objects.count(), 9)
+        photo = Photo.objects.language("en").get()
+        self.assertFalse(default_storage.exists(get_rendition_file(photo.image, "grid", 1, "jpeg").name))
+
+    def test_ckeditor_upload(self):
+        """
+        Test that the CKEditor upload backend schedules the browser thumbnail
+        """
+        backend = RenditionUploadBackend(default_storage, make_image(800, 600, "upload.jpg"))
+        saved_path = backend.save_as("content/ckeditor/upload.jpg")
+        self.assertFalse(default_storage.exists(get_thumb_filename(saved_path)))
+
+        jobs.process_jobs(workers=0)
+        with default_storage.open(get_thumb_filename(saved_path)) as f:
+            self.assertEqual(Image.open(f).size, (75, 56))
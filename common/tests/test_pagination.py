@@ -0,0 +1,219 @@
+"""
+Unit tests for the keyset and cached-count pagination
+"""
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from common.pagination import (
+    CachedCountPaginator,
+    CursorMoved,
+    KeysetPaginator,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
+from pages.models import NewsItem, TourDate
+
+NewsItemTranslation = NewsItem._parler_meta.root_model
+
+
+class KeysetPaginatorTests(TestCase):
+    """
+    Test walking the listings with cursors
+    """
+    def setUp(self) -> None:
+        for i in range(25):
+            NewsItem.objects.language("en").create(title=f"News {i}", live=True, image="news/default.jpg")
+        # Some items share a date, so the pk has to break the tie
+        NewsItemTranslation.objects.filter(master__in=NewsItem.objects.all()[:5]).update(
+            date=timezone.now(),
+        )
+        self.expected = list(NewsItem.objects.live("en").values_list("pk", flat=True))
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+
+    def test_walk_forward(self):
+        """
+        Test that following the next cursors visits every item once, in listing order
+        """
+        paginator = KeysetPaginator(NewsItem, "en", 10)
+        page = paginator.get_page()
+        self.assertFalse(page.has_previous())
+        seen = [item.pk for item in page]
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            self.assertTrue(page.has_previous())
+            seen.extend(item.pk for item in page)
+        self.assertEqual(seen, self.expected)
+
+    def test_walk_backward(self):
+        """
+        Test that the previous cursors lead back to the first page
+        """
+        paginator = KeysetPaginator(NewsItem, "en", 10)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        third = paginator.get_page(after=second.next_cursor)
+        self.assertEqual(len(third), 5)
+        self.assertFalse(third.has_next())
+
+        back = paginator.get_page(before=third.previous_cursor)
+        self.assertEqual([item.pk for item in back], [item.pk for item in second])
+        back = paginator.get_page(before=back.previous_cursor)
+        self.assertEqual([item.pk for item in back], [item.pk for item in first])
+        self.assertFalse(back.has_previous())
+
+    def test_constant_queries(self):
+        """
+        Test that a deep page costs the same as the first page: keys, objects and translations
+        """
+        paginator = KeysetPaginator(NewsItem, "en", 10)
+        page = paginator.get_page(after=paginator.get_page().next_cursor)
+        with self.assertNumQueries(3):
+            page = paginator.get_page(after=page.next_cursor)
+            [item.title for item in page]
+
+    def test_invalid_cursor(self):
+        """
+        Test that an invalid cursor shows the first page
+        """
+        page = KeysetPaginator(NewsItem, "en", 10).get_page(after="not-a-cursor")
+        self.assertEqual([item.pk for item in page], self.expected[:10])
+
+    def test_strict_cursors(self):
+        """
+        Test that page() only accepts the canonical cursors
+        """
+        paginator = KeysetPaginator(NewsItem, "en", 10)
+        cursor = paginator.page().next_cursor
+        for token in ("not-a-cursor", "", f"{cursor}="):
+            with self.assertRaises(InvalidPage):
+                paginator.page(after=token)
+            with self.assertRaises(InvalidPage):
+                paginator.page(before=token)
+        with self.assertRaises(InvalidPage):
+            paginator.page(after=cursor, before=cursor)
+
+    def test_moved_cursors(self):
+        """
+        Test that the cursor of a deleted item moves to the cursor of the same position
+        """
+        paginator = KeysetPaginator(NewsItem, "en", 10)
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor)
+        third = paginator.page(after=second.next_cursor)
+        NewsItem.objects.filter(pk__in=[self.expected[9], self.expected[20]]).delete()
+
+        with self.assertRaises(CursorMoved) as moved:
+            paginator.page(after=first.next_cursor)
+        page = paginator.page(after=moved.exception.after, before=moved.exception.before)
+        self.assertEqual([item.pk for item in page], self.expected[10:20])
+
+        with self.assertRaises(CursorMoved) as moved:
+            paginator.page(before=third.previous_cursor)
+        page = paginator.page(after=moved.exception.after, before=moved.exception.before)
+        self.assertEqual([item.pk for item in page], self.expected[10:20])
+
+        # An unpublished item moves too, and get_page() follows
+        item = NewsItem.objects.language("en").get(pk=self.expected[19])
+        item.live = False
+        item.save()
+        page = paginator.get_page(after=second.next_cursor)
+        self.assertEqual([item.pk for item in page], self.expected[21:])
+
+    def test_moved_cursor_redirected(self):
+        """
+        Test that the listing redirects a moved cursor instead of a 404
+        """
+        cursor = KeysetPaginator(NewsItem, "en", 10).page().next_cursor
+        NewsItem.objects.filter(pk=self.expected[9]).delete()
+        response = self.client.get("/en/news/", {"after": cursor})
+        item = NewsItem.objects.get(pk=self.expected[8]).get_translation("en")
+        self.assertRedirects(
+            response,
+            f"/en/news/?after={encode_cursor(item.date, item.master_id)}",
+            fetch_redirect_response=False,
+        )
+
+    def test_language(self):
+        """
+        Test that only the items of the language are listed
+        """
+        page = KeysetPaginator(NewsItem, "ja", 10).get_page()
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_next())
+
+
+class CursorTests(TestCase):
+    """
+    Test the cursor encoding
+    """
+
+    def test_date_field(self):
+        date_field = TourDate._parler_meta.root_model._meta.get_field("date")
+        date = date_field.to_python("2020-01-31")
+        self.assertEqual(decode_cursor(encode_cursor(date, 42), date_field), (date, 42))
+
+    def test_datetime_field(self):
+        date_field = NewsItemTranslation._meta.get_field("date")
+        date = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(date, 42), date_field), (date, 42))
+
+
+class CachedCountPaginatorTests(TestCase):
+    """
+    Test the page-number mode
+    """
+    def setUp(self) -> None:
+        for i in range(3):
+            NewsItem.objects.language("en").create(title=f"News {i}", live=True, image="news/default.jpg")
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+
+    def count(self):
+        objects = NewsItem.objects.live("en")
+        return CachedCountPaginator(objects, 10, "news", "en").count
+
+    def test_count_cached(self):
+        """
+        Test that the count is only queried once
+        """
+        self.assertEqual(self.count(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count(), 3)
+
+    def test_count_invalidated(self):
+        """
+        Test that the count is refreshed when a news item is added
+        """
+        self.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            NewsItem.objects.language("en").create(title="News 4", live=True, image="news/default.jpg")
+        self.assertEqual(self.count(), 4)
+
+    def test_paginate_modes(self):
+        """
+        Test that `?page=` selects the page-number mode, and keyset mode is the default
+        """
+        factory = RequestFactory()
+        request = factory.get("/en/news/", {"page": 1})
+        request.LANGUAGE_CODE = "en"
+        self.assertEqual(paginate(request, NewsItem, 10, "news").number, 1)
+        request = factory.get("/en/news/")
+        request.LANGUAGE_CODE = "en"
+        self.assertTrue(paginate(request, NewsItem, 10, "news").is_keyset)
+
+    def test_paginate_invalid_number(self):
+        """
+        Test that page numbers out of range or not written canonically are a 404
+        """
+        factory = RequestFactory()
+        for number in ("0", "2", "01", "1.0", "", "x"):
+            request = factory.get("/en/news/", {"page": number})
+            request.LANGUAGE_CODE = "en"
+            with self.assertRaises(Http404):
+                paginate(request, NewsItem, 10, "news")
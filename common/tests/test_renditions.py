@@ -0,0 +1,179 @@
+"""
+Unit tests for the image renditions and the responsive_image tag
+"""
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+
+from common.jobs import process_jobs
+from common.models import RenditionJob
+from common.renditions import get_rendition_file, rendition_size, schedule_renditions
+from gallery.models import Photo
+
+
+def make_image(width, height, name="photo.jpg"):
+    """
+    Returns an uploaded JPEG of the specified size
+    """
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (120, 30, 140)).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class RenditionTestCase(TestCase):
+    """
+    Base test case storing media files in a temporary directory
+    """
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+
+    def tearDown(self) -> None:
+        Photo.objects.all().delete()
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def render(self, image, rendition, request=None):
+        template = Template("{% load renditions %}{% responsive_image image rendition alt=alt %}")
+        return template.render(Context({
+            "image": image,
+            "rendition": rendition,
+            "alt": "Alt",
+            "request": request,
+        }))
+
+
+class RenditionTests(RenditionTestCase):
+    """
+    Test generating the renditions
+    """
+
+    def test_rendition_size(self):
+        self.assertEqual(rendition_size(2000, 1000, "grid"), (320, 160))
+        self.assertEqual(rendition_size(2000, 1000, "grid", scale=2), (640, 320))
+        # never upscaled
+        self.assertEqual(rendition_size(200, 100, "grid", scale=2), (200, 100))
+
+    def test_generate(self):
+        """
+        Test that the renditions are resized and encoded in the requested format
+        """
+        photo = Photo.objects.language("en").create(title="Photo", image=make_image(2000, 1000))
+        rendition = get_rendition_file(photo.image, "grid", 2, "webp")
+        rendition.generate()
+        self.assertFalse(default_storage.exists(rendition.name))
+        process_jobs(workers=0)
+        with default_storage.open(rendition.name) as f:
+            image = Image.open(f)
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (640, 320))
+
+
+class ResponsiveImageTagTests(RenditionTestCase):
+    """
+    Test the responsive_image template tag
+    """
+
+    def test_placeholder(self):
+        """
+        Test that the original image is shown until the renditions are generated
+        """
+        photo = Photo.objects.language("en").create(title="Photo", image=make_image(2000, 1000))
+        request = RequestFactory().get("/")
+        html = self.render(photo.image, "grid", request)
+        self.assertIn(f'src="{photo.image.url}"', html)
+        self.assertIn('width="320" height="160"', html)
+        self.assertNotIn("<picture>", html)
+        # rendering doesn't write to the database: the jobs are recorded when the image is saved
+        self.assertEqual(RenditionJob.objects.count(), 0)
+        # the page is only cached until the renditions are likely to exist
+        self.assertEqual(request.page_cache_timeout, settings.PLACEHOLDER_PAGE_CACHE_TIMEOUT)
+
+        schedule_renditions(photo.image, ("grid",))
+        self.assertEqual(RenditionJob.objects.count(), 4)
+        process_jobs(workers=0)
+        request = RequestFactory().get("/")
+        self.assertIn("<picture>", self.render(photo.image, "grid", request))
+        self.assertFalse(hasattr(request, "page_cache_timeout"))
+
+    def test_picture(self):
+        """
+        Test that a large image gets WebP and JPEG srcsets with 1x and 2x widths
+        """
+        photo = Photo.objects.language("en").create(title="Photo", image=make_image(2000, 1000))
+        schedule_renditions(photo.image, ("grid",))
+        process_jobs(workers=0)
+        html = self.render(photo.image, "grid")
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(" 320w, ", html)
+        self.assertIn(" 640w\"", html)
+        self.assertIn('width="320" height="160"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('alt="Alt"', html)
+        self.assertNotIn(photo.image.url + '"', html)
+
+    def test_small_image(self):
+        """
+        Test that a small image doesn't list the same width twice
+        """
+        photo = Photo.objects.language("en").create(title="Photo", image=make_image(300, 200))
+        schedule_renditions(photo.image, ("grid",))
+        process_jobs(workers=0)
+        html = self.render(photo.image, "grid")
+        self.assertEqual(html.count(" 300w"), 2)
+        self.assertIn('width="300" height="200"', html)
+
+    def test_invalid_image(self):
+        """
+        Test that the original file is used when the renditions can't be generated
+        """
+        photo = Photo.objects.language("en").create(
+            title="Photo",
+            image=SimpleUploadedFile("broken.jpg", b"not an image", content_type="image/jpeg"),
+        )
+        html = self.render(photo.image, "grid")
+        self.assertIn(f'src="{photo.image.url}"', html)
+        self.assertNotIn("<picture>", html)
+
+    def test_no_image(self):
+        self.assertEqual(self.render(None, "grid"), "")
+
+    def test_image_placeholder(self):
+        """
+        Test that the placeholder and dominant color are stored on upload, and painted
+        behind the image
+        """
+        buffer = io.BytesIO()
+        image = Image.new("RGB", (400, 200), (120, 30, 140))
+        image.paste((250, 250, 250), (0, 0, 100, 200))
+        image.save(buffer, "JPEG")
+        photo = Photo.objects.language("en").create(
+            title="Photo",
+            image=SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg"),
+        )
+        translation = Photo._parler_meta.root_model.objects.get(master=photo)
+        self.assertTrue(translation.image_placeholder.startswith("data:image/jpeg;base64,"))
+        self.assertLess(len(translation.image_placeholder), 1000)
+        red, green, blue = (int(translation.image_color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertLess(abs(red - 120) + abs(green - 30) + abs(blue - 140), 30)
+
+        template = Template('{% load renditions %}{% responsive_image image "grid" style="height: 200px;" %}')
+        html = template.render(Context({"image": photo.image}))
+        self.assertIn(
+            f'style="height: 200px; background: {translation.image_color} url({translation.image_placeholder})'
+            ' center / cover no-repeat"',
+            html,
+        )
+
+        # Saving again doesn't open the image
+        translation.image_color = "#000000"
+        translation.save()
+        self.assertEqual(translation.image_color, "#000000")
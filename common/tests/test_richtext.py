@@ -0,0 +1,140 @@
+"""
+Unit tests for the rendering of the rich text
+"""
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase
+from PIL import Image
+
+from common.jobs import process_jobs
+from common.richtext import excerpt, render_rich_text
+from pages.models import NewsItem
+from .test_renditions import RenditionTestCase
+
+
+class SanitizeTests(SimpleTestCase):
+    """
+    Test sanitizing the CKEditor HTML
+    """
+
+    def test_allowed(self):
+        value = '<p class="lead">Hello <strong>world</strong><br>&amp; <a href="/en/news/">news</a></p>'
+        self.assertEqual(render_rich_text(value), value)
+
+    def test_dangerous(self):
+        value = (
+            '<p onclick="alert(1)">Text<script>alert(2)</script></p>'
+            '<a href="javascript:alert(3)">link</a>'
+            '<a href=" java\tscript:alert(4)">link</a>'
+            '<iframe src="https://example.com"><p>inside</p></iframe>'
+            '<img src="x" onerror="alert(5)">'
+        )
+        self.assertEqual(
+            render_rich_text(value),
+            '<p>Text</p><a>link</a><a>link</a><img src="x">',
+        )
+
+    def test_styles(self):
+        """
+        Test that only the vetted CSS properties are kept, with safe values
+        """
+        value = (
+            '<p style="text-align:center; COLOR: #520b5e; position: fixed">a</p>'
+            '<span style="background-color: rgb(255, 0, 0); width: 50%; height: 20px">b</span>'
+            '<span style="color: red; background-color: url(javascript:alert(1))">c</span>'
+            '<div style="width: expression(alert(1)); height: 1e9px">d</div>'
+        )
+        self.assertEqual(
+            render_rich_text(value),
+            '<p style="text-align: center; color: #520b5e">a</p>'
+            '<span style="background-color: rgb(255, 0, 0); width: 50%; height: 20px">b</span>'
+            '<span style="color: red">c</span>'
+            '<div>d</div>',
+        )
+
+    def test_video_iframes(self):
+        """
+        Test that the iframes of the allowed players are kept, without their content
+        """
+        value = (
+            '<iframe src="https://www.youtube.com/embed/abc" width="560" height="315" '
+            'allowfullscreen onload="alert(1)"><p>inside</p></iframe>'
+            '<iframe src="https://player.vimeo.com/video/1" />'
+            '<p>after</p>'
+            '<iframe src="http://www.youtube.com/embed/abc"></iframe>'
+            '<iframe src="https://www.youtube.com.example.com/embed/abc"></iframe>'
+            '<iframe src="javascript:alert(1)"></iframe>'
+        )
+        self.assertEqual(
+            render_rich_text(value),
+            '<iframe src="https://www.youtube.com/embed/abc" width="560" height="315" allowfullscreen=""></iframe>'
+            '<iframe src="https://player.vimeo.com/video/1"></iframe>'
+            '<p>after</p>',
+        )
+        self.assertEqual(excerpt(value), "after")
+
+    def test_unknown_tags_keep_text(self):
+        self.assertEqual(render_rich_text("<font color=red>&lt;b&gt;</font>"), "&lt;b&gt;")
+
+    def test_unbalanced(self):
+        self.assertEqual(render_rich_text("<ul><li>one<li>two</ul></div><p>open"), "<ul><li>one<li>two</li></li></ul><p>open</p>")
+
+    def test_target_blank(self):
+        self.assertEqual(
+            render_rich_text('<a href="https://example.com" target="_blank">x</a>'),
+            '<a href="https://example.com" target="_blank" rel="noopener noreferrer">x</a>',
+        )
+
+
+class ExcerptTests(SimpleTestCase):
+    """
+    Test the plain-text excerpts
+    """
+
+    def test_text(self):
+        self.assertEqual(excerpt("<p>First&nbsp;line</p><p>Second <b>line</b></p><style>p {}</style>"), "First line Second line")
+
+    def test_truncated(self):
+        self.assertEqual(excerpt("<p>" + "あ" * 300 + "</p>", 10), "あ" * 9 + "…")
+
+
+class UploadedImageTests(RenditionTestCase):
+    """
+    Test rewriting the images uploaded through CKEditor
+    """
+    def setUp(self) -> None:
+        super().setUp()
+        buffer = io.BytesIO()
+        Image.new("RGB", (1000, 500), (120, 30, 140)).save(buffer, "JPEG")
+        self.name = default_storage.save("content/ckeditor/2024/01/01/photo.jpg", ContentFile(buffer.getvalue()))
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+        super().tearDown()
+
+    def test_rewritten(self):
+        news_item = NewsItem.objects.language("en").create(
+            title="News",
+            body=f'<p>Look</p><p><img alt="Photo" src="/media/{self.name}" style="height:50px; width:100px" /></p>',
+        )
+        # Until the renditions are generated
+        self.assertIn(
+            f'<img src="/media/{self.name}" width="1000" height="500" alt="Photo" style="height: 50px; width: 100px" loading="lazy" decoding="async">',
+            news_item.body_html,
+        )
+        self.assertEqual(news_item.excerpt, "Look")
+
+        process_jobs(workers=0)
+        news_item = NewsItem.objects.language("en").get(pk=news_item.pk)
+        self.assertIn("<picture><source type=\"image/webp\"", news_item.body_html)
+        self.assertIn('width="800" height="400"', news_item.body_html)
+        self.assertIn('loading="lazy"', news_item.body_html)
+
+    def test_other_images(self):
+        """
+        Test that other images are only sanitized
+        """
+        value = '<img src="https://example.com/photo.jpg" alt="Photo"><img src="/media/content/ckeditor/missing.jpg">'
+        self.assertEqual(render_rich_text(value), value)
@@ -0,0 +1,85 @@
+"""
+Unit tests for the content-addressed storage
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from common.models import MediaBlob
+from common.storage import content_storage, is_blob_name
+from gallery.models import Photo
+from .test_renditions import RenditionTestCase, make_image
+
+
+class ContentAddressedStorageTests(RenditionTestCase):
+    """
+    Test storing the uploaded images by content hash
+    """
+
+    def test_dedupe(self):
+        """
+        Test that identical files are stored once, under their hash
+        """
+        first = content_storage.save("news/a.jpg", ContentFile(b"same", name="a.jpg"))
+        second = content_storage.save("news/b.JPG", ContentFile(b"same", name="b.JPG"))
+        other = content_storage.save("news/c.jpg", ContentFile(b"other", name="c.jpg"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(is_blob_name(first))
+        self.assertTrue(first.startswith("news/"))
+        self.assertEqual(len(os.listdir(os.path.dirname(content_storage.path(first)))), 1)
+        self.assertEqual(MediaBlob.objects.get(name=first).size, 4)
+
+    def test_translations_share_file(self):
+        """
+        Test that both translations reference a single file
+        """
+        image = make_image(400, 300)
+        photo = Photo.objects.language("en").create(title="Photo", image=image)
+        photo.set_current_language("ja")
+        photo.title = "写真"
+        photo.image = make_image(400, 300)
+        photo.save()
+
+        names = set(photo.translations.values_list("image", flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(MediaBlob.objects.get(name=names.pop()).refcount, 2)
+
+    def test_refcounts(self):
+        """
+        Test that the refcounts follow changes and deletions
+        """
+        photo = Photo.objects.language("en").create(title="Photo", image=make_image(400, 300))
+        first = photo.image.name
+        photo.image = make_image(500, 300)
+        photo.save()
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 0)
+        self.assertEqual(MediaBlob.objects.get(name=photo.image.name).refcount, 1)
+
+        second = photo.image.name
+        photo.delete()
+        self.assertEqual(MediaBlob.objects.get(name=second).refcount, 0)
+        # the files are kept
+        self.assertTrue(content_storage.exists(first))
+
+    def test_dedupe_media_command(self):
+        """
+        Test that files saved before the storage are moved to shared content-addressed names
+        """
+        os.makedirs(content_storage.path("gallery/photos"))
+        for name in ("gallery/photos/a.jpg", "gallery/photos/a_e7WM6Sr.jpg"):
+            with open(content_storage.path(name), "wb") as f:
+                f.write(b"duplicate")
+        first = Photo.objects.language("en").create(title="First", image="gallery/photos/a.jpg")
+        second = Photo.objects.language("en").create(title="Second", image="gallery/photos/a_e7WM6Sr.jpg")
+
+        call_command("dedupe_media", stdout=io.StringIO())
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.translations.get().image, second.translations.get().image)
+        name = first.translations.get().image.name
+        self.assertTrue(is_blob_name(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 2)
@@ -0,0 +1,82 @@
+"""
+Unit tests for the translation cache
+"""
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from parler.cache import get_translation_cache_key
+
+from common.metrics import get_metrics, reset_metrics
+from common.translations import FLUSH_INTERVAL, flush_translation_metrics, request_finished_flush
+from pages.models import NewsItem
+
+
+class TranslationCacheTests(TestCase):
+    """
+    Test preloading the translations, and counting the lookups
+    """
+    def setUp(self) -> None:
+        self.news_item = NewsItem.objects.language("en").create(
+            title="News",
+            body="Body",
+            live=True,
+            image="news/default.jpg",
+        )
+        self.draft = NewsItem.objects.language("en").create(
+            title="Draft",
+            body="Body",
+            image="news/default.jpg",
+        )
+        self.translation_model = NewsItem._parler_meta.root_model
+        cache.clear()
+        flush_translation_metrics()
+        reset_metrics()
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+
+    def key(self, news_item, language_code):
+        return get_translation_cache_key(self.translation_model, news_item.pk, language_code)
+
+    def test_warm_cache(self):
+        self.news_item.create_translation("ja", title="ニュース", body="本文", live=True, image="news/default.jpg")
+        stdout = StringIO()
+        call_command("warm_cache", stdout=stdout)
+        self.assertEqual(cache.get(self.key(self.news_item, "en"))["title"], "News")
+        self.assertEqual(cache.get(self.key(self.news_item, "ja"))["title"], "ニュース")
+        # Drafts are loaded on demand, and missing translations fall back to English
+        self.assertIsNone(cache.get(self.key(self.draft, "en")))
+        self.assertEqual(cache.get(self.key(self.draft, "ja")), {"__FALLBACK__": True})
+        self.assertIn("2 translations cached, 1 fallbacks marked", stdout.getvalue())
+
+        news_item = NewsItem.objects.language("ja").get(pk=self.news_item.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(news_item.title, "ニュース")
+
+    def test_metrics(self):
+        call_command("warm_cache", stdout=StringIO())
+        for pk in (self.news_item.pk, self.draft.pk):
+            NewsItem.objects.language("en").get(pk=pk).title
+        flush_translation_metrics()
+        metrics = get_metrics()
+        self.assertEqual((metrics["translation_cache_hits"], metrics["translation_cache_misses"]), (1, 1))
+
+        stdout = StringIO()
+        call_command("cache_metrics", stdout=stdout)
+        self.assertIn("translation cache hit ratio: 50.0%", stdout.getvalue())
+
+    def test_metrics_flushed_periodically(self):
+        """
+        Test that the end of a request only writes the lookups every FLUSH_INTERVAL seconds
+        """
+        flush_translation_metrics()
+        NewsItem.objects.language("en").get(pk=self.news_item.pk).title
+        request_finished_flush()
+        self.assertEqual(get_metrics()["translation_cache_misses"], 0)
+        with mock.patch("common.translations.time.monotonic", return_value=time.monotonic() + FLUSH_INTERVAL):
+            request_finished_flush()
+        self.assertEqual(get_metrics()["translation_cache_misses"], 1)
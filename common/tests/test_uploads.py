@@ -0,0 +1,118 @@
+"""
+Unit tests for the optimization of the CKEditor uploads
+"""
+import io
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image, ImageCms
+
+from common.models import RenditionJob
+from common.uploads import RenditionUploadBackend, optimize_image
+from .test_renditions import RenditionTestCase
+
+
+def make_camera_image(width, height, name="camera.jpg", orientation=None):
+    """
+    Returns an uploaded noisy JPEG with EXIF metadata, like a camera's
+    """
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=98, exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(CKEDITOR_IMAGE_MAX_SIZE=1000, CKEDITOR_IMAGE_FORMAT="jpeg")
+class OptimizeImageTests(RenditionTestCase):
+    """
+    Test re-encoding the uploaded images
+    """
+
+    def test_resized(self):
+        upload = make_camera_image(2000, 1500, orientation=6)
+        content, extension = optimize_image(upload)
+        self.assertEqual(extension, ".jpg")
+        self.assertLess(content.size, upload.size)
+        image = Image.open(content)
+        # rotated according to the orientation, then fitted
+        self.assertEqual(image.size, (750, 1000))
+        self.assertEqual(len(image.getexif()), 0)
+        self.assertTrue(image.info.get("progressive"))
+
+    def test_webp(self):
+        content, extension = optimize_image(make_camera_image(400, 300), "webp")
+        self.assertEqual(extension, ".webp")
+        self.assertEqual(Image.open(content).format, "WEBP")
+
+    def test_transparent_png(self):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (1200, 600), (120, 30, 140, 128)).save(buffer, "PNG")
+        content, extension = optimize_image(SimpleUploadedFile("logo.png", buffer.getvalue()))
+        self.assertEqual(extension, ".png")
+        image = Image.open(content)
+        self.assertEqual((image.mode, image.size), ("RGBA", (1000, 500)))
+
+    def test_cmyk(self):
+        """
+        Test that a CMYK image is converted to RGB without its CMYK profile
+        """
+        buffer = io.BytesIO()
+        Image.new("CMYK", (1200, 600), (255, 0, 0, 0)).save(buffer, "JPEG", icc_profile=b"CMYK profile")
+        content, extension = optimize_image(SimpleUploadedFile("print.jpg", buffer.getvalue()))
+        image = Image.open(content)
+        self.assertEqual(image.mode, "RGB")
+        self.assertIsNone(image.info.get("icc_profile"))
+        # Cyan
+        red, green, blue = image.getpixel((0, 0))
+        self.assertLess(red, 64)
+        self.assertGreater(min(green, blue), 192)
+
+    def test_rgb_profile_kept(self):
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+        buffer = io.BytesIO()
+        Image.effect_noise((1200, 600), 64).convert("RGB").save(buffer, "JPEG", icc_profile=profile)
+        content, extension = optimize_image(SimpleUploadedFile("photo.jpg", buffer.getvalue()))
+        self.assertEqual(Image.open(content).info.get("icc_profile"), profile)
+
+    def test_kept(self):
+        """
+        Test that small images without metadata, animations and broken files are kept
+        """
+        buffer = io.BytesIO()
+        Image.effect_noise((100, 100), 64).convert("RGB").save(buffer, "JPEG", quality=30)
+        self.assertIsNone(optimize_image(SimpleUploadedFile("small.jpg", buffer.getvalue())))
+
+        buffer = io.BytesIO()
+        frames = [Image.new("P", (1200, 1200), color) for color in (1, 2)]
+        frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:])
+        self.assertIsNone(optimize_image(SimpleUploadedFile("animated.gif", buffer.getvalue())))
+
+        self.assertIsNone(optimize_image(SimpleUploadedFile("broken.jpg", b"not an image")))
+
+    def test_upload_backend(self):
+        backend = RenditionUploadBackend(default_storage, make_camera_image(2000, 1000, "upload.jpeg"))
+        saved_path = backend.save_as("content/ckeditor/upload.jpeg")
+        self.assertEqual(saved_path, "content/ckeditor/upload.jpg")
+        with default_storage.open(saved_path) as f:
+            self.assertEqual(Image.open(f).size, (1000, 500))
+        # the thumbnail and the content renditions are generated in the background
+        self.assertTrue(RenditionJob.objects.filter(generator_id="murasaki:ckeditor-thumbnail").exists())
+
+    def test_benchmark(self):
+        default_storage.save("content/ckeditor/2024/01/01/camera.jpg", make_camera_image(2000, 1000))
+        default_storage.save("content/ckeditor/2024/01/01/camera_thumb.jpg", make_camera_image(75, 38))
+        out = StringIO()
+        call_command("benchmark_uploads", stdout=out)
+        output = out.getvalue()
+        self.assertIn("content/ckeditor/2024/01/01/camera.jpg: ", output)
+        self.assertNotIn("camera_thumb", output)
+        self.assertIn("1 images: ", output)
+        # nothing is changed
+        self.assertEqual(len(default_storage.listdir("content/ckeditor/2024/01/01")[1]), 2)
@@ -0,0 +1,32 @@
+"""
+Unit tests for the cached URL reversal
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import translation
+
+from common.utils import cached_reverse
+
+
+class CachedReverseTests(SimpleTestCase):
+    """
+    Test that the cached URLs are the reversed ones
+    """
+
+    def test_cached_reverse(self):
+        for language_code in ("en", "ja"):
+            with translation.override(language_code):
+                self.assertEqual(cached_reverse("news"), reverse("news"))
+                self.assertEqual(cached_reverse("news-detail", pk=12), reverse("news-detail", kwargs={"pk": 12}))
+                self.assertEqual(cached_reverse("photos"), f"/{language_code}/gallery/photos/")
+        with translation.override("en"):
+            self.assertEqual(cached_reverse("video-detail", "ja", pk=3), "/ja/gallery/videos/3/")
+
+    def test_benchmark_urls(self):
+        stdout = StringIO()
+        call_command("benchmark_urls", number=10, stdout=stdout)
+        self.assertIn("news-detail (ja): reverse", stdout.getvalue())
+        self.assertIn("cached_reverse is", stdout.getvalue())
@@ -0,0 +1,136 @@
+"""
+Unit tests for the media serving view
+"""
+import os
+import shutil
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings
+
+from common.frontcache import LocalPurgeBackend
+from common.views import purge, serve_media
+
+DIGEST = "3f" + "a" * 62
+
+
+class ServeMediaTests(SimpleTestCase):
+    """
+    Test serving the media files
+    """
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_ACCEL_REDIRECT=None)
+        self.override.enable()
+        os.makedirs(os.path.join(self.media_root, "news", "3f"))
+        for name in ("news/photo.jpg", f"news/3f/{DIGEST}.jpg"):
+            with open(os.path.join(self.media_root, name), "wb") as f:
+                f.write(b"0123456789")
+        self.factory = RequestFactory()
+
+    def tearDown(self) -> None:
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def get(self, path, **headers):
+        return serve_media(self.factory.get(f"/media/{path}", **headers), path)
+
+    def test_full(self):
+        response = self.get("news/photo.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+    def test_immutable(self):
+        """
+        Test that content-addressed files are cached forever
+        """
+        response = self.get(f"news/3f/{DIGEST}.jpg")
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_range(self):
+        response = self.get("news/photo.jpg", HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+
+        response = self.get("news/photo.jpg", HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        response = self.get("news/photo.jpg", HTTP_RANGE="bytes=20-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_asgi(self):
+        """
+        Test that under ASGI the files are streamed by an async iterator
+        """
+        async def read(response):
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        request = AsyncRequestFactory().get("/media/news/photo.jpg")
+        response = serve_media(request, "news/photo.jpg")
+        self.assertTrue(response.is_async)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(async_to_sync(read)(response), b"0123456789")
+
+        request = AsyncRequestFactory().get("/media/news/photo.jpg", headers={"Range": "bytes=2-5"})
+        response = serve_media(request, "news/photo.jpg")
+        self.assertTrue(response.is_async)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(async_to_sync(read)(response), b"2345")
+
+    def test_if_range_mismatch(self):
+        """
+        Test that the whole file is sent when it changed since the client's partial copy
+        """
+        response = self.get("news/photo.jpg", HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        etag = self.get("news/photo.jpg")["ETag"]
+        response = self.get("news/photo.jpg", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        last_modified = self.get("news/photo.jpg")["Last-Modified"]
+        response = self.get("news/photo.jpg", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_accel_redirect(self):
+        with self.settings(MEDIA_ACCEL_REDIRECT="/protected-media/"):
+            response = self.get("news/photo.jpg")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/news/photo.jpg")
+        self.assertEqual(response.content, b"")
+
+    def test_not_found(self):
+        for path in ("news/missing.jpg", "news", "../etc/passwd"):
+            with self.assertRaises(Http404):
+                self.get(path)
+
+
+@override_settings(PURGE_TOKEN="secret")
+class PurgeTests(SimpleTestCase):
+    """
+    Test the stand-in for the purge API of a front cache
+    """
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+        LocalPurgeBackend.purged.clear()
+
+    def post(self, **headers):
+        return purge(self.factory.post("/purge/", **headers))
+
+    def test_purge(self):
+        response = self.post(HTTP_SURROGATE_KEY="page:news newsitem:42", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(list(LocalPurgeBackend.purged), ["page:news", "newsitem:42"])
+
+    def test_invalid(self):
+        self.assertEqual(self.post(HTTP_SURROGATE_KEY="page:news").status_code, 403)
+        self.assertEqual(self.post(HTTP_AUTHORIZATION="Bearer secret").status_code, 400)
+        self.assertFalse(LocalPurgeBackend.purged)
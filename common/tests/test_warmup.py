@@ -0,0 +1,29 @@
+"""
+Unit tests for the warm-up of the gunicorn master
+"""
+from django.test import SimpleTestCase
+from django.urls import clear_url_caches, get_resolver
+
+from common.utils import _url_template
+from common.warmup import site_templates, warm_process
+
+
+class WarmProcessTests(SimpleTestCase):
+    """
+    Test that the warm-up loads the URLs and the site's templates
+    """
+
+    def test_site_templates(self):
+        templates = site_templates()
+        self.assertIn("base.html", templates)
+        self.assertIn("pages/news.html", templates)
+        self.assertIn("gallery/video_facade.html", templates)
+        # Not the templates of the installed packages
+        self.assertNotIn("admin/base.html", templates)
+
+    def test_warm_process(self):
+        _url_template.cache_clear()
+        clear_url_caches()
+        self.assertEqual(warm_process(), len(site_templates()))
+        self.assertGreater(_url_template.cache_info().currsize, 0)
+        self.assertTrue(get_resolver()._populated)
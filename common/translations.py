@@ -0,0 +1,121 @@
+"""
+Cache of the parler translations.
+
+parler keeps each translation it loads in the default cache, which is shared
+by the gunicorn workers in production, so a translation is only queried once
+per change. `warm_translations` preloads the live translations of every
+language (see `manage.py warm_cache`), so the first requests after a deploy
+don't query them either.
+
+The lookups of that cache are counted in the `translation_cache_hits` and
+`translation_cache_misses` metrics. They are added up in-process and written
+to the metrics cache at the end of a request at most every `FLUSH_INTERVAL`
+seconds, rather than on every lookup or request.
+"""
+import threading
+import time
+from collections import Counter
+
+import parler.cache
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import request_finished
+from parler.cache import _cache_translation, _cache_translation_needs_fallback
+from parler.models import TranslatableModel
+
+from .metrics import incr_metric
+
+# Seconds between the writes of a process's counted lookups to the metrics cache
+FLUSH_INTERVAL = 10
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+class CountingCache:
+    """
+    Wraps the cache backend of parler, counting its hits and misses.
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, default, version)
+        with _pending_lock:
+            _pending["translation_cache_misses" if value is default else "translation_cache_hits"] += 1
+        return value
+
+
+def flush_translation_metrics():
+    """
+    Adds the lookups counted by this process to the metrics.
+    """
+    global _last_flush
+    with _pending_lock:
+        counts = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    for name, count in counts.items():
+        if count:
+            incr_metric(name, count)
+
+
+def request_finished_flush(**kwargs):
+    """
+    Flushes the counted lookups at the end of a request, unless they were
+    flushed less than `FLUSH_INTERVAL` seconds ago.
+    """
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush_translation_metrics()
+
+
+def count_translation_lookups():
+    """
+    Starts counting the lookups of the translation cache.
+    """
+    if not isinstance(parler.cache.cache, CountingCache):
+        parler.cache.cache = CountingCache(parler.cache.cache)
+    request_finished.connect(request_finished_flush, dispatch_uid="flush_translation_metrics")
+
+
+def translatable_models():
+    """
+    Returns the translatable models.
+    """
+    return [model for model in apps.get_models() if issubclass(model, TranslatableModel)]
+
+
+def warm_translations(language_codes=None):
+    """
+    Stores the live translations of every translatable model in the cache,
+    and marks the objects without a translation in a language as needing
+    the fallback. Translations that aren't live are left to be loaded on demand.
+
+    Returns the number of translations, and of fallback markers, stored.
+    """
+    language_codes = language_codes or [code for code, name in settings.LANGUAGES]
+    cached = markers = 0
+    for model in translatable_models():
+        for meta in model._parler_meta:
+            translations = meta.model.objects.filter(language_code__in=language_codes)
+            if "live" in meta.get_translated_fields():
+                translations = translations.filter(live=True)
+            for translation in translations.iterator():
+                _cache_translation(translation)
+                cached += 1
+
+            languages = {}
+            for master_id, language_code in meta.model.objects.values_list("master_id", "language_code").iterator():
+                languages.setdefault(master_id, set()).add(language_code)
+            for master_id, translated in languages.items():
+                instance = model(pk=master_id)
+                instance._state.adding = False
+                for language_code in set(language_codes) - translated:
+                    _cache_translation_needs_fallback(instance, language_code, related_name=meta.rel_name)
+                    markers += 1
+    return cached, markers
@@ -0,0 +1,169 @@
+"""
+Upload backend for the CKEditor image uploader.
+
+The uploaded images are re-encoded before they are stored: fitted into
+`CKEDITOR_IMAGE_MAX_SIZE`, rotated according to their EXIF orientation,
+stripped of their metadata, and saved as progressive JPEG (or WebP, see
+`CKEDITOR_IMAGE_FORMAT`) with the quality of the renditions. Their color
+profile is kept, unless they are converted to another mode (e.g. from
+CMYK): the colors are then converted through it to sRGB.
+"""
+import io
+import os
+
+from ckeditor_uploader.backends import DummyBackend
+from ckeditor_uploader.utils import get_thumb_filename, is_valid_image_extension
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageCms, ImageOps
+
+from .renditions import (
+    CKEDITOR_THUMBNAIL_ID,
+    CONTENT_RENDITION,
+    FORMATS,
+    StoredFile,
+    get_cachefile,
+    schedule_renditions,
+)
+from .storage import content_hash
+
+# format name: extension of the re-encoded uploads
+EXTENSIONS = {
+    "jpeg": ".jpg",
+    "webp": ".webp",
+    "png": ".png",
+}
+
+# Images with transparency can't be saved as JPEG
+PNG_FORMAT = ("PNG", {"optimize": True}, "image/png")
+
+
+def _has_transparency(image):
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def _convert(image, mode, icc_profile):
+    """
+    Returns the image converted to the mode, and the color profile of the result.
+    """
+    if image.mode == mode:
+        return image, icc_profile
+    if icc_profile:
+        # The profile describes the original mode: convert the colors through it
+        try:
+            source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            converted = ImageCms.profileToProfile(image, source, ImageCms.createProfile("sRGB"), outputMode=mode)
+        except (ImageCms.PyCMSError, OSError, ValueError):
+            pass
+        else:
+            # Browsers assume sRGB without a profile
+            return converted, None
+    return image.convert(mode), None
+
+
+def optimize_image(file_object, image_format=None, max_size=None):
+    """
+    Returns the re-encoded content of an uploaded image, and its extension.
+
+    Returns None for files that are stored as-is: animations, files that
+    aren't images, and images that would only grow without losing any metadata.
+    """
+    image_format = image_format or settings.CKEDITOR_IMAGE_FORMAT
+    max_size = max_size or settings.CKEDITOR_IMAGE_MAX_SIZE
+    try:
+        file_object.seek(0)
+        original_size = file_object.size
+        image = Image.open(file_object)
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        file_object.seek(0)
+    if getattr(image, "is_animated", False):
+        return None
+
+    has_metadata = bool(image.info.get("exif") or image.getexif())
+    icc_profile = image.info.get("icc_profile")
+    image = ImageOps.exif_transpose(image)
+    resized = max(image.size) > max_size
+    if resized:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+    if _has_transparency(image) and image_format == "jpeg":
+        image_format = "png"
+        pil_format, options, _ = PNG_FORMAT
+    else:
+        pil_format, options, _ = FORMATS[image_format]
+        image, icc_profile = _convert(image, "RGBA" if _has_transparency(image) else "RGB", icc_profile)
+
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, icc_profile=icc_profile, **options)
+    if buffer.tell() >= original_size and not resized and not has_metadata:
+        return None
+    return ContentFile(buffer.getvalue()), EXTENSIONS[image_format]
+
+
+def stored_images(directory, storage=default_storage):
+    """
+    Yields the names of the images in the directory of the storage, recursively,
+    except the thumbnails of the CKEditor image browser.
+    """
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    names = {os.path.join(directory, name) for name in files}
+    thumbnails = {get_thumb_filename(name) for name in names}
+    for name in sorted(names - thumbnails):
+        if is_valid_image_extension(name):
+            yield name
+    for subdirectory in sorted(directories):
+        yield from stored_images(os.path.join(directory, subdirectory), storage)
+
+
+def reoptimize_file(name, known_digest=None):
+    """
+    Optimizes a stored image like the uploads, without changing it.
+    Runs in the worker processes of `reoptimize_media`.
+
+    Returns a dict with the SHA-256 and size of the file and, if it can be
+    optimized, the optimized content, extension and dimensions.
+    The file isn't optimized if its SHA-256 is `known_digest`.
+    """
+    with default_storage.open(name) as f:
+        file_object = File(f, name=name)
+        digest, size = content_hash(file_object)
+        result = {"name": name, "sha256": digest, "size": size, "content": None}
+        if digest == known_digest:
+            return result
+        optimized = optimize_image(file_object)
+    if optimized is not None:
+        content, extension = optimized
+        data = content.read()
+        with Image.open(io.BytesIO(data)) as image:
+            result["width"], result["height"] = image.size
+        result.update(content=data, extension=extension)
+    return result
+
+
+class RenditionUploadBackend(DummyBackend):
+    """
+    Saves the optimized upload and schedules its thumbnail and content
+    renditions for the `rendition_worker`, instead of resizing the image
+    during the upload request like `PillowBackend`.
+    """
+
+    def save_as(self, filepath):
+        if not self.is_image:
+            return super().save_as(filepath)
+        optimized = optimize_image(self.file_object)
+        if optimized is None:
+            saved_path = super().save_as(filepath)
+        else:
+            content, extension = optimized
+            saved_path = self.storage_engine.save(f"{os.path.splitext(filepath)[0]}{extension}", content)
+        get_cachefile(saved_path, CKEDITOR_THUMBNAIL_ID).generate()
+        schedule_renditions(StoredFile(saved_path), (CONTENT_RENDITION,))
+        return saved_path
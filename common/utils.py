@@ -1,16 +1,59 @@
 """
 This module contains utility functions that are used in multiple apps.
 """
+import functools
+
+from django.core.signals import setting_changed
+from django.db.models import Max
+from django.dispatch import receiver
+from django.urls import get_script_prefix, reverse
 from django.utils import translation
 
+# Stand-in for the arguments when reversing the URL templates
+URL_ARGUMENT_SENTINEL = 987654321
+
+
+@functools.lru_cache(maxsize=None)
+def _url_template(viewname, language_code, script_prefix, argument_names):
+    """
+    Returns the URL of the view in the language as a `str.format` template,
+    with a replacement field for each argument.
+    """
+    sentinels = {name: URL_ARGUMENT_SENTINEL + i for i, name in enumerate(argument_names)}
+    with translation.override(language_code):
+        url = reverse(viewname, kwargs=sentinels)
+    url = url.replace("{", "{{").replace("}", "}}")
+    for name, sentinel in sentinels.items():
+        url = url.replace(str(sentinel), f"{{{name}}}")
+    return url
+
+
+@receiver(setting_changed)
+def _clear_url_templates(setting, **kwargs):
+    if setting in ("ROOT_URLCONF", "LANGUAGES", "LANGUAGE_CODE"):
+        _url_template.cache_clear()
+
+
+def cached_reverse(viewname, language_code=None, **kwargs):
+    """
+    Returns the URL of the view in the language (default: the active one),
+    like `reverse` under `translation.override`.
+
+    The URL of each view and language is only reversed once, and the arguments
+    are formatted into it, so the arguments have to be integers (the pks).
+    """
+    if language_code is None:
+        language_code = translation.get_language()
+    template = _url_template(viewname, language_code, get_script_prefix(), tuple(sorted(kwargs)))
+    return template.format(**kwargs)
+
 
 class UrlSwitcher:
     def get_absolute_url_for(self, language_code):
         """
         Returns the URL for this page in the specified language.
         """
-        with translation.override(language_code):
-            return self.get_absolute_url()
+        return self.get_absolute_url(language_code)
 
     def get_switch_language(self):
         """
@@ -37,3 +80,12 @@ def get_switch_language_url(url_getter, language_code):
         'label': 'English',
         'code': 'en',
     }
+
+
+def last_updated(model, **filters):
+    """
+    Returns the latest `updated` time of the model's translations matching the filters,
+    or None if there are none.
+    """
+    translations = model._parler_meta.root_model.objects.filter(**filters)
+    return translations.aggregate(last_updated=Max("updated"))["last_updated"]
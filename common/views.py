@@ -0,0 +1,179 @@
+"""
+Serving the media files in production, and a stand-in for the purge API
+of a front cache (for development).
+
+Under WSGI, full responses are `FileResponse`s, which gunicorn sends with
+sendfile(). Under ASGI (the default uvicorn workers) there is no sendfile,
+and Django would read a sync iterator whole into memory before sending it:
+the files are streamed in chunks read in a thread by an async iterator
+instead. Single byte ranges are supported (for large downloads and media
+seeking), as well as `If-None-Match` / `If-Modified-Since`. When a front
+proxy serves the files itself, `MEDIA_ACCEL_REDIRECT` hands the response
+off to it with an `X-Accel-Redirect` header, which spares the workers the
+copying under either interface.
+"""
+import mimetypes
+import os
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
+
+from .frontcache import LocalPurgeBackend
+from .storage import is_content_addressed
+
+# Cache-Control of the files whose name changes with their content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _parse_range(header, size):
+    """
+    Returns the (start, end) of a single byte range (end included),
+    "invalid" if it can't be satisfied, or None to send the whole file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple ranges aren't supported: ignoring the header is allowed
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # Suffix range: the last `end` bytes
+        length = int(end)
+        if length == 0:
+            return "invalid"
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _aread_range(path, start, length):
+    # Each read runs in a thread of its own, not in the request's sync thread
+    f = await sync_to_async(open, thread_sensitive=False)(path, "rb")
+    try:
+        await sync_to_async(f.seek, thread_sensitive=False)(start)
+        while length > 0:
+            chunk = await sync_to_async(f.read, thread_sensitive=False)(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(f.close, thread_sensitive=False)()
+
+
+def _cache_headers(response, path, etag, mtime):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    response["Accept-Ranges"] = "bytes"
+    if is_content_addressed(path):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response["Cache-Control"] = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serves the media file at the path (relative to MEDIA_ROOT).
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = quote_etag(f"{stat.st_size:x}-{int(stat.st_mtime):x}")
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return _cache_headers(not_modified, path, etag, stat.st_mtime)
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        # The proxy handles ranges itself
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT + path
+        return _cache_headers(response, path, etag, stat.st_mtime)
+
+    byte_range = None
+    if "HTTP_RANGE" in request.META and request.META.get("HTTP_IF_RANGE", etag) == etag:
+        byte_range = _parse_range(request.META["HTTP_RANGE"], stat.st_size)
+
+    if byte_range == "invalid":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return _cache_headers(response, path, etag, stat.st_mtime)
+
+    is_asgi = isinstance(request, ASGIRequest)
+    if byte_range is None and not is_asgi:
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        return _cache_headers(response, path, etag, stat.st_mtime)
+
+    start, end = byte_range or (0, stat.st_size - 1)
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        (_aread_range if is_asgi else _read_range)(full_path, start, length),
+        status=206 if byte_range else 200,
+        content_type=content_type,
+    )
+    response["Content-Length"] = length
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    return _cache_headers(response, path, etag, stat.st_mtime)
+
+
+@csrf_exempt
+@require_POST
+def purge(request):
+    """
+    Local stand-in for the purge API of a front cache: records the surrogate
+    keys sent by `HttpPurgeBackend` with `LocalPurgeBackend`.
+    """
+    if settings.PURGE_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if not constant_time_compare(authorization, f"Bearer {settings.PURGE_TOKEN}"):
+            return HttpResponseForbidden()
+    keys = request.headers.get(settings.SURROGATE_KEY_HEADER, "").split()
+    if not keys:
+        return HttpResponseBadRequest()
+    LocalPurgeBackend().purge(keys)
+    return HttpResponse(status=202)
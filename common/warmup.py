@@ -0,0 +1,73 @@
+"""
+Loads in the gunicorn master what each worker would otherwise load on its
+first requests: the URLconf (and the URL templates of `cached_reverse`) and
+the message catalogs of every language, and the site's compiled templates.
+
+With `preload_app` (see `gunicorn.conf.py`), this runs once before the
+workers are forked, and the workers share that memory with the master
+(copy-on-write) instead of each building its own copy.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.template.autoreload import get_template_directories
+from django.template.loader import get_template
+from django.urls import get_resolver
+from django.utils import translation
+
+from .translations import flush_translation_metrics
+from .utils import cached_reverse
+
+# URL name: arguments of the public views
+PUBLIC_VIEWS = {
+    "home": {},
+    "news": {},
+    "news-detail": {"pk": 1},
+    "tour": {},
+    "tour-detail": {"pk": 1},
+    "music": {},
+    "band": {},
+    "shop": {},
+    "photos": {},
+    "photo-detail": {"pk": 1},
+    "videos": {},
+    "video-detail": {"pk": 1},
+}
+
+
+def site_templates():
+    """
+    Returns the names of the templates of the project and its apps
+    (not those of the installed packages).
+    """
+    base_dir = Path(settings.BASE_DIR).resolve()
+    names = set()
+    for directory in get_template_directories():
+        directory = directory.resolve()
+        if base_dir not in directory.parents:
+            continue
+        names.update(path.relative_to(directory).as_posix() for path in directory.rglob("*.html"))
+    return sorted(names)
+
+
+def warm_process():
+    """
+    Loads the URLconf, the catalogs and the templates into this process.
+    Returns the number of templates compiled.
+    """
+    resolver = get_resolver()
+    for language_code, _name in settings.LANGUAGES:
+        # Loads the catalogs of the language, and the resolver's reverse dict for it
+        with translation.override(language_code):
+            resolver.reverse_dict
+        for view_name, kwargs in PUBLIC_VIEWS.items():
+            cached_reverse(view_name, language_code, **kwargs)
+
+    # The cached template loader keeps the compiled templates
+    names = site_templates()
+    for template_name in names:
+        get_template(template_name)
+
+    # The lookups of the warm-up shouldn't be counted again by every worker
+    flush_translation_metrics()
+    return len(names)
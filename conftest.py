@@ -0,0 +1,16 @@
+"""
+Project-wide pytest fixtures
+"""
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Start every test with empty caches, since the test database is rolled back between tests
+    but cached pages are not.
+    """
+    for cache in caches.all():
+        cache.clear()
+    yield
@@ -1,9 +1,10 @@
 from django.contrib import admin
-from django.utils.html import mark_safe
 from django.utils.translation import gettext_lazy as _
 from embed_video.admin import AdminVideoMixin
 from parler.admin import TranslatableAdmin
 
+from common.renditions import ADMIN_THUMBNAIL, admin_thumbnail, get_rendition_file, schedule_renditions
+from .imagegenerators import PHOTO_RENDITIONS, VIDEO_THUMBNAIL_RENDITIONS
 from .models import Photo, Video
 
 
@@ -11,15 +12,11 @@ class PhotoAdmin(TranslatableAdmin):
 
     def thumbnail(self, obj):
         """
-        Return a thumbnail of the image
+        Return the thumbnail of the image, using the stored dimensions
+        so the changelist doesn't open the image files
         """
-        if obj.image:
-            try:
-                width = min(obj.image.width or 100, 100)
-                height = min(obj.image.height or 100, 100)
-                return mark_safe(f'<img src="{obj.image.url}" width="{width}" height="{height}" />')
-            except Exception:
-                pass
+        if obj.image and obj.image_width and obj.image_height:
+            return admin_thumbnail(obj.image, obj.image_width, obj.image_height)
         return '-'
     thumbnail.short_description = _('Thumbnail')
 
@@ -29,7 +26,8 @@ class PhotoAdmin(TranslatableAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Override the save_model method to create translations for the photo
+        Override the save_model method to create translations for the photo,
+        and to schedule the generation of the image renditions
         """
         super().save_model(request, obj, form, change)
         if not obj.has_translation(obj.get_switch_language()):
@@ -41,6 +39,9 @@ class PhotoAdmin(TranslatableAdmin):
                 date=obj.date,
                 live=obj.live,
             )
+        if obj.image:
+            schedule_renditions(obj.image, PHOTO_RENDITIONS)
+            get_rendition_file(obj.image, *ADMIN_THUMBNAIL).generate()
 
 
 class VideoAdmin(AdminVideoMixin, TranslatableAdmin):
@@ -50,7 +51,8 @@ class VideoAdmin(AdminVideoMixin, TranslatableAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Override the save_model method to create translations for the video
+        Override the save_model method to create translations for the video,
+        and to schedule the generation of the thumbnail renditions
         """
         super().save_model(request, obj, form, change)
         if not obj.has_translation(obj.get_switch_language()):
@@ -61,6 +63,8 @@ class VideoAdmin(AdminVideoMixin, TranslatableAdmin):
                 video=obj.video,
                 live=obj.live,
             )
+        if obj.video_thumbnail:
+            schedule_renditions(obj.video_thumbnail, VIDEO_THUMBNAIL_RENDITIONS)
 
 
 admin.site.register(Photo, PhotoAdmin)
@@ -0,0 +1,201 @@
+"""
+Metadata of the embedded videos, resolved once when a video is saved.
+
+The provider, video code, title, duration and thumbnail of each video are
+stored on its translation (the thumbnail under MEDIA_ROOT), so the listings
+render a click-to-load facade instead of the providers' iframes, without
+parsing the URL on every render. The provider and code are parsed from the
+URL when the video is saved; the rest is fetched once the save is committed
+(see `gallery.signals`), so the save doesn't wait for the provider.
+
+The providers are queried through the fetcher in `VIDEO_METADATA_FETCHER`:
+`OEmbedMetadataFetcher` by default, `OfflineMetadataFetcher` (which only
+parses the URL) in the tests.
+"""
+import json
+import logging
+import urllib.request
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_string
+from embed_video.backends import EmbedVideoException, detect_backend
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the providers
+FETCH_TIMEOUT = 5
+
+# Largest thumbnail downloaded, in bytes
+MAX_THUMBNAIL_SIZE = 5 * 1024 * 1024
+
+# provider: (oEmbed endpoint, URL of the player loaded by the facade)
+PROVIDERS = {
+    "youtube": ("https://www.youtube.com/oembed", "https://www.youtube-nocookie.com/embed/{code}?autoplay=1"),
+    "vimeo": ("https://vimeo.com/api/oembed.json", "https://player.vimeo.com/video/{code}?autoplay=1"),
+}
+
+# embed_video backend: provider
+BACKEND_PROVIDERS = {
+    "YoutubeBackend": "youtube",
+    "VimeoBackend": "vimeo",
+}
+
+
+def parse_video_url(url):
+    """
+    Returns the (provider, video code) of a video URL, or None for other URLs.
+    """
+    try:
+        backend = detect_backend(url)
+        code = backend.code
+    except EmbedVideoException:
+        return None
+    provider = BACKEND_PROVIDERS.get(type(backend).__name__)
+    if provider is None or not code:
+        return None
+    return provider, code
+
+
+def player_url(provider, code):
+    """
+    Returns the URL of the player of a video, started when it's loaded.
+    """
+    return PROVIDERS[provider][1].format(code=code)
+
+
+class BaseMetadataFetcher:
+    """
+    Looks up the metadata of the videos.
+    """
+
+    def fetch(self, url):
+        """
+        Returns the metadata of the video at the URL: a dict with its `provider`,
+        `code`, `title`, `duration` (in seconds, or None) and `thumbnail_url`,
+        or None if the provider isn't supported.
+        """
+        raise NotImplementedError
+
+    def fetch_thumbnail(self, url):
+        """
+        Returns the content of the thumbnail at the URL.
+        """
+        raise NotImplementedError
+
+
+class OfflineMetadataFetcher(BaseMetadataFetcher):
+    """
+    Parses the video URL without querying the provider
+    (for the tests): no title, duration or thumbnail.
+    """
+
+    def fetch(self, url):
+        parsed = parse_video_url(url)
+        if parsed is None:
+            return None
+        provider, code = parsed
+        return {"provider": provider, "code": code, "title": "", "duration": None, "thumbnail_url": ""}
+
+    def fetch_thumbnail(self, url):
+        raise OSError(f"Not fetching {url} offline")
+
+
+class OEmbedMetadataFetcher(BaseMetadataFetcher):
+    """
+    Queries the oEmbed endpoint of the provider.
+    """
+
+    def fetch(self, url):
+        parsed = parse_video_url(url)
+        if parsed is None:
+            return None
+        provider, code = parsed
+        endpoint = f"{PROVIDERS[provider][0]}?{urlencode({'url': url, 'format': 'json'})}"
+        with urllib.request.urlopen(endpoint, timeout=FETCH_TIMEOUT) as response:
+            data = json.load(response)
+        duration = data.get("duration")
+        return {
+            "provider": provider,
+            "code": code,
+            "title": data.get("title") or "",
+            "duration": int(duration) if duration else None,
+            "thumbnail_url": data.get("thumbnail_url") or "",
+        }
+
+    def fetch_thumbnail(self, url):
+        with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+            return response.read(MAX_THUMBNAIL_SIZE)
+
+
+def get_metadata_fetcher():
+    """
+    Returns the configured metadata fetcher.
+    """
+    return import_string(settings.VIDEO_METADATA_FETCHER)()
+
+
+def parse_video_metadata(translation):
+    """
+    Sets the provider and code of a video translation from its URL, and clears
+    the metadata fetched from the provider. Returns whether the provider is supported.
+    """
+    metadata = OfflineMetadataFetcher().fetch(translation.video)
+    translation.video_provider, translation.video_code = (
+        (metadata["provider"], metadata["code"]) if metadata else ("", "")
+    )
+    translation.video_title = ""
+    translation.video_duration = None
+    translation.video_thumbnail = ""
+    return metadata is not None
+
+
+def update_video_metadata(translation):
+    """
+    Sets the metadata fields of a video translation from its provider.
+    The video is saved with whatever could be resolved if the provider fails.
+    """
+    fetcher = get_metadata_fetcher()
+    try:
+        metadata = fetcher.fetch(translation.video)
+    except (OSError, ValueError):
+        logger.warning("Could not fetch the metadata of %s", translation.video, exc_info=True)
+        metadata = OfflineMetadataFetcher().fetch(translation.video)
+    if metadata is None:
+        metadata = {"provider": "", "code": "", "title": "", "duration": None, "thumbnail_url": ""}
+
+    translation.video_provider = metadata["provider"]
+    translation.video_code = metadata["code"]
+    translation.video_title = metadata["title"][:512]
+    translation.video_duration = metadata["duration"]
+    translation.video_thumbnail = ""
+    if metadata["thumbnail_url"]:
+        try:
+            content = fetcher.fetch_thumbnail(metadata["thumbnail_url"])
+        except (OSError, ValueError):
+            logger.warning("Could not fetch the thumbnail of %s", translation.video, exc_info=True)
+        else:
+            translation.video_thumbnail = ContentFile(content, name=f"{metadata['code']}.jpg")
+
+
+# The fields set by `update_video_metadata`, and by the thumbnail's field
+METADATA_FIELDS = (
+    "video_provider",
+    "video_code",
+    "video_title",
+    "video_duration",
+    "video_thumbnail",
+    "video_thumbnail_width",
+    "video_thumbnail_height",
+    "video_thumbnail_placeholder",
+    "video_thumbnail_color",
+)
+
+
+def copy_video_metadata(translation, other):
+    """
+    Copies the metadata fields of another translation of the same video.
+    """
+    for name in METADATA_FIELDS:
+        setattr(translation, name, getattr(other, name))
@@ -0,0 +1,12 @@
+"""
+Image renditions of the gallery app, discovered by django-imagekit.
+"""
+from common.renditions import ADMIN_THUMBNAIL, register_renditions
+from .models import Photo, Video
+
+# renditions shown by the templates, scheduled when an image is saved
+PHOTO_RENDITIONS = ("grid", "detail")
+VIDEO_THUMBNAIL_RENDITIONS = ("card",)
+
+register_renditions(Photo._parler_meta.root_model, "image", PHOTO_RENDITIONS + (ADMIN_THUMBNAIL[0],))
+register_renditions(Video._parler_meta.root_model, "video_thumbnail", VIDEO_THUMBNAIL_RENDITIONS)
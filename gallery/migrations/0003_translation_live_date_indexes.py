@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_alter_phototranslation_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='phototranslation',
+            index=models.Index(condition=models.Q(('live', True)), fields=['language_code', '-date', '-master'], name='photo_live_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videotranslation',
+            index=models.Index(condition=models.Q(('live', True)), fields=['language_code', '-date', '-master'], name='video_live_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:09
+
+import common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0003_translation_live_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='phototranslation',
+            name='image',
+            field=models.ImageField(storage=common.storage.get_content_storage, upload_to='gallery/photos', verbose_name='image'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:12
+
+import common.fields
+import common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0004_alter_phototranslation_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phototranslation',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='image height'),
+        ),
+        migrations.AddField(
+            model_name='phototranslation',
+            name='image_mime_type',
+            field=models.CharField(blank=True, editable=False, max_length=50, verbose_name='image MIME type'),
+        ),
+        migrations.AddField(
+            model_name='phototranslation',
+            name='image_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='image size'),
+        ),
+        migrations.AddField(
+            model_name='phototranslation',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='image width'),
+        ),
+        migrations.AlterField(
+            model_name='phototranslation',
+            name='image',
+            field=common.fields.ImageMetadataField(height_field='image_height', mime_type_field='image_mime_type', size_field='image_size', storage=common.storage.get_content_storage, upload_to='gallery/photos', verbose_name='image', width_field='image_width'),
+        ),
+    ]
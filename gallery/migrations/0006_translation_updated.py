@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0005_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phototranslation',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated'),
+        ),
+    ]
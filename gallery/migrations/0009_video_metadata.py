@@ -0,0 +1,60 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:46
+
+import common.fields
+import common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0008_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_code',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='video code'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_duration',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='video duration'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_provider',
+            field=models.CharField(blank=True, editable=False, max_length=20, verbose_name='video provider'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_thumbnail',
+            field=common.fields.ImageMetadataField(blank=True, color_field='video_thumbnail_color', editable=False, height_field='video_thumbnail_height', placeholder_field='video_thumbnail_placeholder', storage=common.storage.get_content_storage, upload_to='gallery/videos', verbose_name='video thumbnail', width_field='video_thumbnail_width'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_thumbnail_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='video thumbnail color'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='video thumbnail height'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_thumbnail_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='video thumbnail placeholder'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='video thumbnail width'),
+        ),
+        migrations.AddField(
+            model_name='videotranslation',
+            name='video_title',
+            field=models.CharField(blank=True, editable=False, max_length=512, verbose_name='video title'),
+        ),
+    ]
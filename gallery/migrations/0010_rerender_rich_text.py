@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:02
+
+from django.db import migrations
+
+
+# The rendered fields of each translation model
+RENDERED_FIELDS = [
+    ("PhotoTranslation", ['description_html']),
+    ("VideoTranslation", ['description_html']),
+]
+
+
+def render_rich_text(apps, schema_editor):
+    """
+    Renders the rich text again, keeping the inline styles and video iframes now allowed.
+    """
+    for model_name, fields in RENDERED_FIELDS:
+        model = apps.get_model("gallery", model_name)
+        for translation in model.objects.all():
+            translation.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0009_video_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_rich_text, migrations.RunPython.noop),
+    ]
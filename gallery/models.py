@@ -9,12 +9,14 @@ Models are translatable using django-parler.
 """
 from ckeditor.fields import RichTextField
 from django.db import models
-from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from embed_video.fields import EmbedVideoField
 from parler.models import TranslatableModel, TranslatedFields
 
-from common.utils import UrlSwitcher
+from common.fields import ExcerptField, ImageMetadataField, RenderedHTMLField
+from common.managers import LiveManager, live_date_index
+from common.storage import get_content_storage
+from common.utils import UrlSwitcher, cached_reverse
 
 
 class Photo(TranslatableModel, UrlSwitcher):
@@ -22,18 +24,39 @@ class Photo(TranslatableModel, UrlSwitcher):
     Represents a photo in the gallery.
     """
     translations = TranslatedFields(
+        meta={'indexes': [live_date_index('photo_live_date_idx')]},
         title=models.CharField(_("title"), max_length=512),
         description=RichTextField(_("description"), blank=True),
-        image=models.ImageField(_("image"), upload_to="gallery/photos"),
+        description_html=RenderedHTMLField(_("description HTML"), source_field="description"),
+        image=ImageMetadataField(
+            _("image"),
+            upload_to="gallery/photos",
+            storage=get_content_storage,
+            width_field="image_width",
+            height_field="image_height",
+            size_field="image_size",
+            mime_type_field="image_mime_type",
+            placeholder_field="image_placeholder",
+            color_field="image_color",
+        ),
+        image_width=models.PositiveIntegerField(_("image width"), null=True, blank=True, editable=False),
+        image_height=models.PositiveIntegerField(_("image height"), null=True, blank=True, editable=False),
+        image_size=models.PositiveBigIntegerField(_("image size"), null=True, blank=True, editable=False),
+        image_mime_type=models.CharField(_("image MIME type"), max_length=50, blank=True, editable=False),
+        image_placeholder=models.TextField(_("image placeholder"), blank=True, editable=False),
+        image_color=models.CharField(_("image color"), max_length=7, blank=True, editable=False),
         live=models.BooleanField(_('live'), default=True),
         date=models.DateTimeField(_('date'), auto_now_add=True),
+        updated=models.DateTimeField(_('updated'), auto_now=True),
     )
 
-    def get_absolute_url(self):
+    objects = LiveManager()
+
+    def get_absolute_url(self, language_code=None):
         """
-        Returns the URL for this page.
+        Returns the URL for this page in the language (default: the active one).
         """
-        return reverse("photo-detail", kwargs={"pk": self.pk})
+        return cached_reverse("photo-detail", language_code, pk=self.pk)
 
     def __str__(self):
         return self.title
@@ -44,18 +67,48 @@ class Video(TranslatableModel, UrlSwitcher):
     Represents an embedded video in the gallery.
     """
     translations = TranslatedFields(
+        meta={'indexes': [live_date_index('video_live_date_idx')]},
         title=models.CharField(_("title"), max_length=512),
         description=RichTextField(_("description"), blank=True),
+        description_html=RenderedHTMLField(_("description HTML"), source_field="description"),
+        excerpt=ExcerptField(_("excerpt"), source_field="description"),
         video=EmbedVideoField(_("video")),
+        # metadata of the video, resolved when it's saved (see `gallery.embeds`)
+        video_provider=models.CharField(_("video provider"), max_length=20, blank=True, editable=False),
+        video_code=models.CharField(_("video code"), max_length=100, blank=True, editable=False),
+        video_title=models.CharField(_("video title"), max_length=512, blank=True, editable=False),
+        video_duration=models.PositiveIntegerField(_("video duration"), null=True, blank=True, editable=False),
+        video_thumbnail=ImageMetadataField(
+            _("video thumbnail"),
+            upload_to="gallery/videos",
+            storage=get_content_storage,
+            blank=True,
+            editable=False,
+            width_field="video_thumbnail_width",
+            height_field="video_thumbnail_height",
+            placeholder_field="video_thumbnail_placeholder",
+            color_field="video_thumbnail_color",
+        ),
+        video_thumbnail_width=models.PositiveIntegerField(
+            _("video thumbnail width"), null=True, blank=True, editable=False,
+        ),
+        video_thumbnail_height=models.PositiveIntegerField(
+            _("video thumbnail height"), null=True, blank=True, editable=False,
+        ),
+        video_thumbnail_placeholder=models.TextField(_("video thumbnail placeholder"), blank=True, editable=False),
+        video_thumbnail_color=models.CharField(_("video thumbnail color"), max_length=7, blank=True, editable=False),
         live=models.BooleanField(_('live'), default=True),
         date=models.DateTimeField(_('date'), auto_now_add=True),
+        updated=models.DateTimeField(_('updated'), auto_now=True),
     )
 
-    def get_absolute_url(self):
+    objects = LiveManager()
+
+    def get_absolute_url(self, language_code=None):
         """
-        Returns the URL for this page.
+        Returns the URL for this page in the language (default: the active one).
         """
-        return reverse("video-detail", kwargs={"pk": self.pk})
+        return cached_reverse("video-detail", language_code, pk=self.pk)
 
     def __str__(self):
         return self.title
\ No newline at end of file
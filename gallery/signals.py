@@ -0,0 +1,105 @@
+"""
+Signal handlers for the gallery app.
+
+Saving or deleting a photo or video (or one of its translations), or
+generating the renditions of its image, invalidates the cached pages that
+display it, and purges them from the front cache, once the transaction is
+committed.
+Saving a video translation with a new URL parses its provider and code, and
+fetches the rest of its metadata from the provider after the save is committed.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from common.cache import get_master_pk, invalidate_on_commit
+from common.frontcache import object_key, purge, view_key
+from common.renditions import renditions_generated, schedule_renditions
+from .embeds import METADATA_FIELDS, copy_video_metadata, parse_video_metadata, update_video_metadata
+from .imagegenerators import VIDEO_THUMBNAIL_RENDITIONS
+from .models import Photo, Video
+
+PhotoTranslation = Photo._parler_meta.root_model
+VideoTranslation = Video._parler_meta.root_model
+
+
+@receiver([post_save, post_delete], sender=Photo)
+@receiver([post_save, post_delete], sender=PhotoTranslation)
+@receiver(renditions_generated, sender=PhotoTranslation)
+def photo_changed(sender, instance, **kwargs):
+    """
+    Invalidates the photo listing and the photo's detail page.
+    """
+    pk = get_master_pk(instance)
+    invalidate_on_commit(("photos",), "photo-detail", pk)
+    purge(view_key("photos"), object_key(Photo, pk))
+
+
+@receiver([post_save, post_delete], sender=Video)
+@receiver([post_save, post_delete], sender=VideoTranslation)
+@receiver(renditions_generated, sender=VideoTranslation)
+def video_changed(sender, instance, **kwargs):
+    """
+    Invalidates the video listing and the video's detail page.
+    """
+    pk = get_master_pk(instance)
+    invalidate_on_commit(("videos",), "video-detail", pk)
+    purge(view_key("videos"), object_key(Video, pk))
+
+
+@receiver(pre_save, sender=VideoTranslation)
+def video_url_changed(sender, instance, raw=False, **kwargs):
+    """
+    Parses the provider and code of a new video URL, reusing the metadata
+    of another translation of the video with the same URL. The rest of the
+    metadata is fetched after the save is committed (see `video_saved`).
+    """
+    instance._fetch_video_metadata = False
+    if raw:
+        return
+    if instance.pk is not None:
+        previous = sender.objects.filter(pk=instance.pk).values_list("video", flat=True).first()
+        if previous == instance.video:
+            return
+    other = (
+        sender.objects
+        .filter(master_id=instance.master_id, video=instance.video)
+        .exclude(pk=instance.pk)
+        .exclude(video_provider="")
+        .first()
+    )
+    if other is not None:
+        copy_video_metadata(instance, other)
+    else:
+        instance._fetch_video_metadata = parse_video_metadata(instance)
+
+
+@receiver(post_save, sender=VideoTranslation)
+def video_saved(sender, instance, raw=False, **kwargs):
+    """
+    Fetches the metadata of a new video URL from the provider once the save is committed.
+    """
+    if raw or not getattr(instance, "_fetch_video_metadata", False):
+        return
+    instance._fetch_video_metadata = False
+    pk, url = instance.pk, instance.video
+    transaction.on_commit(lambda: fetch_video_metadata(pk, url))
+
+
+def fetch_video_metadata(pk, url):
+    """
+    Fetches the metadata of the video translation, unless its URL has changed
+    since, copies it to the other translations with the same URL, and
+    schedules the thumbnail renditions. Saving them invalidates the pages.
+    """
+    translation = VideoTranslation.objects.filter(pk=pk, video=url).first()
+    if translation is None:
+        return
+    update_video_metadata(translation)
+    translation.save(update_fields=METADATA_FIELDS)
+    others = VideoTranslation.objects.filter(master_id=translation.master_id, video=url).exclude(pk=pk)
+    for other in others:
+        copy_video_metadata(other, translation)
+        other.save(update_fields=METADATA_FIELDS)
+    if translation.video_thumbnail:
+        schedule_renditions(translation.video_thumbnail, VIDEO_THUMBNAIL_RENDITIONS)
@@ -0,0 +1,24 @@
+"""
+Template tags for the embedded videos.
+"""
+from django import template
+
+from gallery.embeds import player_url
+
+register = template.Library()
+
+
+@register.inclusion_tag("gallery/video_facade.html")
+def video_facade(video):
+    """
+    Renders a click-to-load facade of the video: its stored thumbnail,
+    replaced by the provider's player when it's clicked (see `murasaki.js`).
+    Without JavaScript, it links to the video's page.
+    Videos without metadata get the provider's iframe.
+
+    Usage: {% video_facade video %}
+    """
+    return {
+        "video": video,
+        "player_url": player_url(video.video_provider, video.video_code) if video.video_provider else "",
+    }
@@ -3,10 +3,15 @@ Unit tests for the admin module.
 
 Tests for the custom `save_model()' override and the `thumbnail()' method
 """
+import io
+import tempfile
+from unittest import mock
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from PIL import Image
 
+from common.jobs import process_jobs
 from gallery.admin import PhotoAdmin, VideoAdmin
 from gallery.models import Photo, Video
 
@@ -36,17 +41,30 @@ class PhotoAdminTests(TestCase):
 
     def test_thumbnail(self):
         """
-        Test that the thumbnail() method returns an image tag
+        Test that the thumbnail() method returns an image tag sized from the stored dimensions,
+        without opening the image file
         """
         admin = PhotoAdmin(model=Photo, admin_site=None)
-        obj = Photo(
-            title="Test Photo",
-            image=SimpleUploadedFile("test.jpg", b"file_content", content_type="image/jpeg"),
-            description="Test Description",
-            date="2019-01-01",
-            live=True,
-        )
-        self.assertEqual(admin.thumbnail(obj), '<img src="/media/test.jpg" width="100" height="100" />')
+        buffer = io.BytesIO()
+        Image.new("RGB", (400, 200)).save(buffer, "JPEG")
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            obj = Photo.objects.language("en").create(
+                title="Test Photo",
+                description="Test Description",
+                image=SimpleUploadedFile("test.jpg", buffer.getvalue(), content_type="image/jpeg"),
+                live=True,
+            )
+            obj = Photo.objects.language("en").get(pk=obj.pk)
+            self.assertEqual((obj.image_width, obj.image_height), (400, 200))
+            self.assertEqual(obj.image_size, len(buffer.getvalue()))
+            self.assertEqual(obj.image_mime_type, "image/jpeg")
+            with mock.patch("PIL.Image.open", side_effect=AssertionError("image opened")):
+                thumbnail = admin.thumbnail(obj)
+            # the original is shown until the thumbnail is generated
+            self.assertEqual(thumbnail, f'<img src="{obj.image.url}" width="100" height="50" />')
+
+            process_jobs(workers=0)
+            self.assertIn("/CACHE/images/", admin.thumbnail(obj))
 
     def test_thumbnail_no_image(self):
         """
@@ -0,0 +1,178 @@
+"""
+Unit tests for the metadata of the embedded videos and the video facade
+"""
+import io
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from common.tests.test_renditions import RenditionTestCase
+from gallery.embeds import BaseMetadataFetcher, OEmbedMetadataFetcher, parse_video_url, player_url
+from gallery.models import Video
+
+VIDEO_URL = "https://www.youtube.com/watch?v=9bZkp7q19f0"
+
+
+class StubMetadataFetcher(BaseMetadataFetcher):
+    """
+    Fetcher answering like a provider, without the network
+    """
+    fetched = []
+
+    def fetch(self, url):
+        self.fetched.append(url)
+        parsed = parse_video_url(url)
+        if parsed is None:
+            return None
+        return {
+            "provider": parsed[0],
+            "code": parsed[1],
+            "title": "Gangnam Style",
+            "duration": 253,
+            "thumbnail_url": f"https://img.example.com/{parsed[1]}.jpg",
+        }
+
+    def fetch_thumbnail(self, url):
+        self.fetched.append(url)
+        buffer = io.BytesIO()
+        Image.new("RGB", (480, 360), (120, 30, 140)).save(buffer, "JPEG")
+        return buffer.getvalue()
+
+
+class FailingMetadataFetcher(BaseMetadataFetcher):
+    """
+    Fetcher of an unreachable provider
+    """
+
+    def fetch(self, url):
+        raise OSError("Network is unreachable")
+
+
+class ParseVideoUrlTests(SimpleTestCase):
+    """
+    Test recognizing the providers' URLs
+    """
+
+    def test_parse(self):
+        self.assertEqual(parse_video_url(VIDEO_URL), ("youtube", "9bZkp7q19f0"))
+        self.assertEqual(parse_video_url("https://youtu.be/9bZkp7q19f0"), ("youtube", "9bZkp7q19f0"))
+        self.assertEqual(parse_video_url("https://vimeo.com/76979871"), ("vimeo", "76979871"))
+        self.assertIsNone(parse_video_url("gallery/videos/test-video.mp4"))
+
+    def test_player_url(self):
+        self.assertEqual(
+            player_url("youtube", "9bZkp7q19f0"),
+            "https://www.youtube-nocookie.com/embed/9bZkp7q19f0?autoplay=1",
+        )
+
+    def test_oembed(self):
+        response = io.BytesIO(json.dumps({
+            "title": "Gangnam Style",
+            "thumbnail_url": "https://i.ytimg.com/vi/9bZkp7q19f0/hqdefault.jpg",
+        }).encode())
+        with mock.patch("urllib.request.urlopen", return_value=response) as urlopen:
+            metadata = OEmbedMetadataFetcher().fetch(VIDEO_URL)
+        self.assertIn("https://www.youtube.com/oembed?url=https%3A%2F%2Fwww.youtube.com", urlopen.call_args.args[0])
+        self.assertEqual(metadata, {
+            "provider": "youtube",
+            "code": "9bZkp7q19f0",
+            "title": "Gangnam Style",
+            "duration": None,
+            "thumbnail_url": "https://i.ytimg.com/vi/9bZkp7q19f0/hqdefault.jpg",
+        })
+
+
+@override_settings(VIDEO_METADATA_FETCHER="gallery.tests.test_embeds.StubMetadataFetcher")
+class VideoMetadataTests(RenditionTestCase):
+    """
+    Test resolving the metadata when the videos are saved
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        StubMetadataFetcher.fetched.clear()
+
+    def tearDown(self) -> None:
+        Video.objects.all().delete()
+        super().tearDown()
+
+    def test_resolved_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            video = Video.objects.language("en").create(title="Video", video=VIDEO_URL)
+            video.create_translation("ja", title="ビデオ", video=VIDEO_URL)
+        translations = Video._parler_meta.root_model.objects.filter(master=video)
+        for translation in translations:
+            self.assertEqual((translation.video_provider, translation.video_code), ("youtube", "9bZkp7q19f0"))
+            self.assertEqual((translation.video_title, translation.video_duration), ("Gangnam Style", 253))
+            self.assertEqual((translation.video_thumbnail_width, translation.video_thumbnail_height), (480, 360))
+            self.assertTrue(translation.video_thumbnail_placeholder.startswith("data:image/jpeg;base64,"))
+        # The Japanese translation reuses the metadata and the thumbnail
+        self.assertEqual(len(StubMetadataFetcher.fetched), 2)
+        self.assertEqual(len({translation.video_thumbnail.name for translation in translations}), 1)
+
+        # Saving without changing the URL doesn't query the provider
+        video = Video.objects.language("en").get(pk=video.pk)
+        video.title = "New title"
+        video.save()
+        self.assertEqual(len(StubMetadataFetcher.fetched), 2)
+
+        video.video = "https://vimeo.com/76979871"
+        with self.captureOnCommitCallbacks(execute=True):
+            video.save()
+        translation = translations.get(language_code="en")
+        self.assertEqual((translation.video_provider, translation.video_code), ("vimeo", "76979871"))
+
+    def test_fetched_after_commit(self):
+        """
+        Test that saving only parses the URL, and the provider is queried once the save is committed
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            video = Video.objects.language("en").create(title="Video", video=VIDEO_URL)
+            translation = Video._parler_meta.root_model.objects.get(master=video)
+            self.assertEqual((translation.video_provider, translation.video_code), ("youtube", "9bZkp7q19f0"))
+            self.assertEqual(StubMetadataFetcher.fetched, [])
+
+        # The URL changed before the callbacks ran
+        translation.video = "https://vimeo.com/76979871"
+        with self.captureOnCommitCallbacks():
+            translation.save()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(StubMetadataFetcher.fetched, [])
+
+    @override_settings(VIDEO_METADATA_FETCHER="gallery.tests.test_embeds.FailingMetadataFetcher")
+    def test_provider_unavailable(self):
+        with self.assertLogs("gallery.embeds", "WARNING"), self.captureOnCommitCallbacks(execute=True):
+            video = Video.objects.language("en").create(title="Video", video=VIDEO_URL)
+        translation = Video._parler_meta.root_model.objects.get(master=video)
+        self.assertEqual((translation.video_provider, translation.video_code), ("youtube", "9bZkp7q19f0"))
+        self.assertFalse(translation.video_thumbnail)
+
+    def test_facade(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.language("en").create(title="Video", video=VIDEO_URL)
+        Video.objects.language("en").create(title="Other", video="gallery/videos/test-video.mp4")
+        response = self.client.get("/en/gallery/videos/")
+        self.assertContains(response, 'class="video-facade"', count=1)
+        self.assertContains(response, 'data-player-url="https://www.youtube-nocookie.com/embed/9bZkp7q19f0?autoplay=1"')
+        self.assertContains(response, 'class="video-facade-thumbnail"')
+        # The players are only loaded on click
+        self.assertNotContains(response, "<iframe")
+
+    def test_fetch_video_metadata(self):
+        video = Video.objects.language("en").create(title="Video", video=VIDEO_URL)
+        Video.objects.language("en").create(title="Other", video="gallery/videos/test-video.mp4")
+        translations = Video._parler_meta.root_model.objects
+        translations.update(video_provider="", video_code="", video_title="", video_thumbnail="")
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command("fetch_video_metadata", stdout=stdout, stderr=stderr)
+        translation = translations.get(master=video)
+        self.assertEqual((translation.video_provider, translation.video_title), ("youtube", "Gangnam Style"))
+        self.assertTrue(translation.video_thumbnail)
+        self.assertIn("1 videos updated, 1 unresolved", stdout.getvalue())
+        self.assertIn("gallery/videos/test-video.mp4", stderr.getvalue())
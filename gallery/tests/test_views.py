@@ -1,9 +1,13 @@
 """
 Unit tests for the gallery views module.
 """
+import shutil
+import tempfile
+
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
+from common.tests.queries import QueryCountMixin
 from gallery.models import Photo, Video
 from gallery import views
 
@@ -27,6 +31,9 @@ class GalleryViewTests(TestCase):
     """
 
     def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
         self.photo = Photo.objects.create(
             title="Test Photo",
             image=SimpleUploadedFile("test.jpg", b"file_content", content_type="image/jpeg"),
@@ -41,6 +48,8 @@ class GalleryViewTests(TestCase):
     def tearDown(self) -> None:
         Photo.objects.all().delete()
         Video.objects.all().delete()
+        self.override.disable()
+        shutil.rmtree(self.media_root)
 
     def test_photos_view(self):
         """
@@ -72,4 +81,28 @@ class GalleryViewTests(TestCase):
         """
         response = self.client.get(f'/gallery/videos/{self.video.pk}/', follow=True)
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'gallery/video_detail.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, 'gallery/video_detail.html')
+
+
+class GalleryQueryCountTests(QueryCountMixin, TestCase):
+    """
+    Test that the gallery grids cost a constant number of queries, whatever the number of items
+    """
+
+    def tearDown(self) -> None:
+        Photo.objects.all().delete()
+        Video.objects.all().delete()
+
+    def create_items(self, count):
+        for i in range(count):
+            Photo.objects.language("en").create(title=f"Photo {i}", image="gallery/photos/test.jpg")
+            Video.objects.language("en").create(
+                title=f"Video {i}",
+                video="https://www.youtube.com/watch?v=9bZkp7q19f0",
+            )
+
+    def test_photos(self):
+        self.assertConstantQueries("/en/gallery/photos/", 16)
+
+    def test_videos(self):
+        self.assertConstantQueries("/en/gallery/videos/", 6)
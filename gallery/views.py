@@ -1,8 +1,17 @@
-from django.core.paginator import Paginator
+"""
+Gallery views, async like the site views (see `pages.views`)
+"""
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 
 from .models import Photo, Video
-from common.utils import get_switch_language_url
+from common.cache import cache_public_page, conditional_page
+from common.frontcache import add_surrogate_keys
+from common.pagination import paginate, redirect_moved_cursors
+from common.utils import cached_reverse, get_switch_language_url, last_updated
+
+PHOTOS_PER_PAGE = 16
+VIDEOS_PER_PAGE = 6
 
 
 def url_getter(page):
@@ -10,54 +19,82 @@ def url_getter(page):
     Returns a function that gets the URL for the specified page.
     """
     def get_url(language_code):
-        if language_code == 'en':
-            return f'/en/gallery/{page}/'
-        return f'/ja/gallery/{page}/'
+        return cached_reverse(page, language_code)
 
     return get_url
 
 
-def photos(request):
+def listing_updated(model):
+    """
+    Returns a function giving the updated time of the model's translations
+    in the language, for `conditional_page`.
+    """
+    def modified_times(request, **kwargs):
+        return [last_updated(model, language_code=request.LANGUAGE_CODE)]
+    return modified_times
+
+
+def detail_updated(model):
+    """
+    Returns a function giving the updated time of the object's translations, for `conditional_page`.
+    """
+    def modified_times(request, pk, **kwargs):
+        return [last_updated(model, master_id=pk)]
+    return modified_times
+
+
+@conditional_page("photos", listing_updated(Photo))
+@cache_public_page("photos")
+@redirect_moved_cursors
+async def photos(request):
     """
     Shows the photos page. Photos are paginated.
     """
-    photos = Photo.objects.translated(live=True).order_by("-translations__date")
     get_url = url_getter('photos')
     context = {
         'switch_language': get_switch_language_url(get_url, request.LANGUAGE_CODE),
-        'photos': Paginator(photos, 16).get_page(request.GET.get('page', 1)),
+        'photos': await sync_to_async(paginate)(request, Photo, PHOTOS_PER_PAGE, "photos"),
         'absolute_url': get_url(request.LANGUAGE_CODE),
     }
-    return render(request, "gallery/photos.html", context)
+    add_surrogate_keys(request, context['photos'])
+    return await sync_to_async(render)(request, "gallery/photos.html", context)
 
 
-def photo_detail(request, pk):
-    photo = Photo.objects.get(pk=pk)
+@conditional_page("photo-detail", detail_updated(Photo))
+@cache_public_page("photo-detail")
+async def photo_detail(request, pk):
+    photo = await Photo.objects.with_translations(request.LANGUAGE_CODE).aget(pk=pk)
     context = {
         'switch_language': get_switch_language_url(photo.get_absolute_url_for, request.LANGUAGE_CODE),
         'photo': photo,
     }
-    return render(request, "gallery/photo_detail.html", context)
+    add_surrogate_keys(request, [photo])
+    return await sync_to_async(render)(request, "gallery/photo_detail.html", context)
 
 
-def videos(request):
+@conditional_page("videos", listing_updated(Video))
+@cache_public_page("videos")
+async def videos(request):
     """
     Shows the videos page. Videos are paginated.
     """
-    videos = Video.objects.translated(live=True).order_by("-translations__date")
     get_url = url_getter('videos')
     context = {
         'switch_language': get_switch_language_url(get_url, request.LANGUAGE_CODE),
-        'videos': Paginator(videos, 6).get_page(request.GET.get('page', 1)),
+        'videos': await sync_to_async(paginate)(request, Video, VIDEOS_PER_PAGE, "videos"),
         'absolute_url': get_url(request.LANGUAGE_CODE),
     }
-    return render(request, "gallery/videos.html", context)
+    add_surrogate_keys(request, context['videos'])
+    return await sync_to_async(render)(request, "gallery/videos.html", context)
 
 
-def video_detail(request, pk):
-    video = Video.objects.get(pk=pk)
+@conditional_page("video-detail", detail_updated(Video))
+@cache_public_page("video-detail")
+async def video_detail(request, pk):
+    video = await Video.objects.with_translations(request.LANGUAGE_CODE).aget(pk=pk)
     context = {
         'switch_language': get_switch_language_url(video.get_absolute_url_for, request.LANGUAGE_CODE),
         'video': video,
     }
-    return render(request, "gallery/video_detail.html", context)
\ No newline at end of file
+    add_surrogate_keys(request, [video])
+    return await sync_to_async(render)(request, "gallery/video_detail.html", context)
\ No newline at end of file
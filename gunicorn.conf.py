@@ -0,0 +1,110 @@
+"""
+gunicorn configuration, used by the start command in `render.yaml`:
+
+    gunicorn --config gunicorn.conf.py
+
+The application is loaded once in the master (`preload_app`), along with the
+URLconf, the catalogs and the templates (see `common/warmup.py`), before the
+workers are forked: they share that memory instead of each loading its own
+copy. Workers are restarted after `max_requests` requests (with some jitter,
+so they don't all restart at once), and log their memory when they exit.
+
+Settings from the environment:
+- WEB_CONCURRENCY: number of workers (default: CPU count + 1)
+- GUNICORN_WORKER_CLASS: "uvicorn" (async views, the default) or "gthread"
+- GUNICORN_THREADS: threads per gthread worker (default: 4)
+- GUNICORN_MAX_REQUESTS: requests served by a worker before its restart (default: 1000)
+- GUNICORN_MAX_REQUESTS_JITTER: maximum random requests added (default: a tenth of GUNICORN_MAX_REQUESTS)
+"""
+import gc
+import os
+import resource
+import time
+
+
+def cpu_count():
+    """
+    Returns the number of CPUs this process can run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def rss_kb():
+    """
+    Returns the current resident memory of this process, in KB.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+if os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn") == "gthread":
+    wsgi_app = "murasaki.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 4))
+else:
+    wsgi_app = "murasaki.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", cpu_count() + 1))
+preload_app = True
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# The workers' heartbeat files, in memory rather than on a possibly slow disk
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def when_ready(server):
+    """
+    Warms the preloaded application before the workers are forked.
+    """
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+
+    from common.warmup import warm_process
+
+    start = time.perf_counter()
+    templates = warm_process()
+    # The forked workers mustn't share the master's database connections
+    connections.close_all()
+    # Keep the loaded objects out of the collections, which would write to
+    # (and so copy) the pages they share with the master
+    gc.collect()
+    gc.freeze()
+    server.log.info(
+        "Application warmed in %.0f ms (%d templates), master RSS %s KB",
+        (time.perf_counter() - start) * 1000,
+        templates,
+        rss_kb(),
+    )
+
+
+def worker_exit(server, worker):
+    """
+    Logs the memory of the exiting worker (called in the worker),
+    and writes the translation cache lookups it counted since its last flush.
+    """
+    from common.translations import flush_translation_metrics
+
+    flush_translation_metrics()
+    server.log.info(
+        "Worker %s exiting: RSS %s KB, peak RSS %s KB",
+        worker.pid,
+        rss_kb(),
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    )
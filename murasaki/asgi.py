@@ -8,9 +8,34 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
 import os
+import threading
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'murasaki.settings')
 
 application = get_asgi_application()
+
+# Cancel the slow queries of the requests (but not of the management commands)
+from common.fallback import limit_statement_time  # noqa: E402
+
+limit_statement_time()
+
+# Load the page singletons before the first request.
+# uvicorn imports the application from its event loop, where the ORM can't be used.
+from django.db import connections  # noqa: E402
+
+from pages import singletons  # noqa: E402
+
+
+def warm():
+    """
+    Loads the page singletons, closing the connection of the thread after.
+    """
+    singletons.warm()
+    connections.close_all()
+
+
+warm_thread = threading.Thread(target=warm)
+warm_thread.start()
+warm_thread.join()
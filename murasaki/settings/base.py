@@ -38,6 +38,7 @@ ALLOWED_HOSTS = []
 INSTALLED_APPS = [
     'pages.apps.PageConfig',       # our app main pages
     'gallery.apps.GalleryConfig',  # our app gallery
+    'common.apps.CommonConfig',    # shared utilities and management commands
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -55,7 +56,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'common.middleware.ExportedSiteMiddleware',
+    'common.middleware.FrontCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -103,6 +105,49 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# rendered public pages are cached until the content they show changes
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# pages showing placeholders for renditions not generated yet are cached briefly
+PLACEHOLDER_PAGE_CACHE_TIMEOUT = 60
+# expired or invalidated pages are served for this long while one request renders them again;
+# the render lock expires after PAGE_CACHE_LOCK_TIMEOUT, requests without a stale page wait
+# PAGE_CACHE_LOCK_WAIT seconds for it
+PAGE_CACHE_STALE_TIMEOUT = 60 * 10
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_LOCK_WAIT = 5
+# last good copies of the public pages, served when the database fails (None to disable),
+# the most copies kept, and the circuit breaker skipping the database after repeated errors
+FALLBACK_PAGE_ROOT = None
+FALLBACK_PAGE_MAX_FILES = 5000
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+# milliseconds after which the database cancels a query of the web processes (None for no limit)
+DATABASE_STATEMENT_TIMEOUT = None
+# counters of the caching layers (see `manage.py cache_metrics`)
+METRICS_CACHE_ALIAS = 'default'
+# front cache (CDN) in front of the site: how long it keeps the public pages,
+# the header listing their surrogate keys, and how to purge them
+FRONT_CACHE_TIMEOUT = PAGE_CACHE_TIMEOUT
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+PURGE_BACKEND = None
+PURGE_URL = None
+PURGE_TOKEN = None
+# directory of the static export of the public pages (`export_site`), None to disable it
+EXPORT_ROOT = None
+# looks up the metadata of the embedded videos when they are saved (see `gallery.embeds`)
+VIDEO_METADATA_FETCHER = 'gallery.embeds.OEmbedMetadataFetcher'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -164,9 +209,23 @@ STATIC_ROOT = BASE_DIR / 'static/'
 # media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
+# max-age of the media files whose names don't change with their content
+MEDIA_CACHE_MAX_AGE = 60 * 60
+# internal location prefix of a front proxy serving MEDIA_ROOT (e.g. '/protected-media/'),
+# to hand the media responses off with X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT = None
 CKEDITOR_UPLOAD_PATH = 'content/ckeditor/'
 CKEDITOR_ALLOW_NONIMAGE_FILES = False
-CKEDITOR_BACKEND = 'ckeditor_uploader.backends.CKEditorUploadingBackend'
+CKEDITOR_IMAGE_BACKEND = 'common.uploads.RenditionUploadBackend'
+# uploads through CKEditor are fitted into this size (in pixels) and re-encoded
+# as progressive JPEG ('jpeg') or WebP ('webp'), without their metadata
+CKEDITOR_IMAGE_MAX_SIZE = 2400
+CKEDITOR_IMAGE_FORMAT = 'jpeg'
+# progress of the `reoptimize_media` command
+MEDIA_OPTIMIZATION_MANIFEST = BASE_DIR / 'media_optimization.json'
+
+# image renditions are generated by the rendition_worker command
+IMAGEKIT_DEFAULT_CACHEFILE_BACKEND = 'common.jobs.RenditionJobBackend'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -6,3 +6,6 @@ DATABASES = {
         'NAME': ":memory:"
     }
 }
+
+# videos are saved without querying their providers
+VIDEO_METADATA_FETCHER = 'gallery.embeds.OfflineMetadataFetcher'
@@ -20,7 +20,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 from django.urls import re_path
-from django.views.static import serve
+
+from common.views import purge, serve_media
 
 
 urlpatterns = i18n_patterns(
@@ -37,9 +38,11 @@ urlpatterns = i18n_patterns(
 # Otherwise we need to serve the media files ourselves.
 if settings.DEBUG:
     urlpatterns = urlpatterns + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Stand-in for the front cache's purge API (PURGE_URL = 'http://localhost:8000/purge/')
+    urlpatterns = urlpatterns + [
+        path('purge/', purge),
+    ]
 else:
     urlpatterns = urlpatterns + [
-        re_path(r'^media/(?P<path>.*)$', serve, {
-            'document_root': settings.MEDIA_ROOT,
-        }),
+        re_path(r'^media/(?P<path>.*)$', serve_media),
     ]
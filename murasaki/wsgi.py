@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'murasaki.settings')
 
 application = get_wsgi_application()
+
+# Cancel the slow queries of the requests (but not of the management commands)
+from common.fallback import limit_statement_time  # noqa: E402
+
+limit_statement_time()
+
+# Load the page singletons before the first request
+from pages import singletons  # noqa: E402
+
+singletons.warm()
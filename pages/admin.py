@@ -1,8 +1,9 @@
 from django.contrib import admin
-from django.utils.html import mark_safe
 from django.utils.translation import gettext_lazy as _
 from parler.admin import TranslatableAdmin
 
+from common.renditions import ADMIN_THUMBNAIL, admin_thumbnail, get_rendition_file, schedule_renditions
+from .imagegenerators import NEWS_ITEM_RENDITIONS
 from .models import Page, NewsItem, TourDate
 
 
@@ -50,15 +51,11 @@ class NewsItemAdmin(TranslatableAdmin):
 
     def thumbnail(self, obj):
         """
-        Return a thumbnail of the image
+        Return the thumbnail of the image, using the stored dimensions
+        so the changelist doesn't open the image files
         """
-        if obj.image:
-            try:
-                width = min(obj.image.width or 100, 100)
-                height = min(obj.image.height or 100, 100)
-                return mark_safe(f'<img src="{obj.image.url}" width="{width}" height="{height}" />')
-            except Exception:
-                pass
+        if obj.image and obj.image_width and obj.image_height:
+            return admin_thumbnail(obj.image, obj.image_width, obj.image_height)
         return '-'
     thumbnail.short_description = _('Thumbnail')
 
@@ -68,7 +65,8 @@ class NewsItemAdmin(TranslatableAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Override the save_model method to create translations for the news item
+        Override the save_model method to create translations for the news item,
+        and to schedule the generation of the image renditions
         """
         super().save_model(request, obj, form, change)
         if not obj.has_translation(obj.get_switch_language()):
@@ -79,6 +77,9 @@ class NewsItemAdmin(TranslatableAdmin):
                 live=obj.live,
                 image=obj.image,
             )
+        if obj.image:
+            schedule_renditions(obj.image, NEWS_ITEM_RENDITIONS)
+            get_rendition_file(obj.image, *ADMIN_THUMBNAIL).generate()
 
 
 admin.site.register(Page, PageAdmin)
@@ -0,0 +1,10 @@
+"""
+Image renditions of the pages app, discovered by django-imagekit.
+"""
+from common.renditions import ADMIN_THUMBNAIL, register_renditions
+from .models import NewsItem
+
+# renditions shown by the templates, scheduled when an image is saved
+NEWS_ITEM_RENDITIONS = ("card", "detail")
+
+register_renditions(NewsItem._parler_meta.root_model, "image", NEWS_ITEM_RENDITIONS + (ADMIN_THUMBNAIL[0],))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0009_alter_musicreleasetranslation_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsitemtranslation',
+            index=models.Index(condition=models.Q(('live', True)), fields=['language_code', '-date', '-master'], name='newsitem_live_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourdatetranslation',
+            index=models.Index(condition=models.Q(('live', True)), fields=['language_code', '-date', '-master'], name='tourdate_live_date_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0012_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsitemtranslation',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated'),
+        ),
+        migrations.AddField(
+            model_name='pagetranslation',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated'),
+        ),
+        migrations.AddField(
+            model_name='tourdatetranslation',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:33
+
+import common.fields
+from django.db import migrations
+
+
+# The rendered fields of each translation model
+RENDERED_FIELDS = [
+    ("NewsItemTranslation", ['body_html', 'excerpt']),
+    ("PageTranslation", ['intro_html']),
+    ("TourDateTranslation", ['description_html']),
+]
+
+
+def render_rich_text(apps, schema_editor):
+    """
+    Fills the rendered fields of the existing rows (they are computed when a row is saved).
+    """
+    for model_name, fields in RENDERED_FIELDS:
+        model = apps.get_model("pages", model_name)
+        for translation in model.objects.all():
+            translation.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        # uploaded images in the rich text get rendition jobs
+        ('common', '0002_mediablob'),
+        ('pages', '0013_translation_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsitemtranslation',
+            name='body_html',
+            field=common.fields.RenderedHTMLField(source_field='body', verbose_name='body HTML'),
+        ),
+        migrations.AddField(
+            model_name='newsitemtranslation',
+            name='excerpt',
+            field=common.fields.ExcerptField(source_field='body', verbose_name='excerpt'),
+        ),
+        migrations.AddField(
+            model_name='pagetranslation',
+            name='intro_html',
+            field=common.fields.RenderedHTMLField(source_field='intro', verbose_name='intro HTML'),
+        ),
+        migrations.AddField(
+            model_name='tourdatetranslation',
+            name='description_html',
+            field=common.fields.RenderedHTMLField(source_field='description', verbose_name='description HTML'),
+        ),
+        migrations.RunPython(render_rich_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:43
+
+import common.fields
+import common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0014_rendered_rich_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsitemtranslation',
+            name='image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='image color'),
+        ),
+        migrations.AddField(
+            model_name='newsitemtranslation',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='image placeholder'),
+        ),
+        migrations.AlterField(
+            model_name='newsitemtranslation',
+            name='image',
+            field=common.fields.ImageMetadataField(blank=True, color_field='image_color', height_field='image_height', mime_type_field='image_mime_type', placeholder_field='image_placeholder', size_field='image_size', storage=common.storage.get_content_storage, upload_to='news', verbose_name='image', width_field='image_width'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.8 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0015_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageTypeLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_type', models.CharField(choices=[('home', 'Home'), ('band', 'Band'), ('music', 'Music'), ('tour', 'Tour'), ('news', 'News'), ('shop', 'Shop')], max_length=5, unique=True, verbose_name='page type')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:02
+
+from django.db import migrations
+
+
+# The rendered fields of each translation model
+RENDERED_FIELDS = [
+    ("NewsItemTranslation", ['body_html']),
+    ("PageTranslation", ['intro_html']),
+    ("TourDateTranslation", ['description_html']),
+]
+
+
+def render_rich_text(apps, schema_editor):
+    """
+    Renders the rich text again, keeping the inline styles and video iframes now allowed.
+    """
+    for model_name, fields in RENDERED_FIELDS:
+        model = apps.get_model("pages", model_name)
+        for translation in model.objects.all():
+            translation.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0016_page_type_lock'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_rich_text, migrations.RunPython.noop),
+    ]
@@ -3,11 +3,13 @@ Models for the pages app.
 """
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.db import models
-from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from parler.models import TranslatableModel, TranslatedFields
 
-from common.utils import UrlSwitcher
+from common.fields import ExcerptField, ImageMetadataField, RenderedHTMLField
+from common.managers import LiveManager, live_date_index
+from common.storage import get_content_storage
+from common.utils import UrlSwitcher, cached_reverse
 
 
 class Page(TranslatableModel, UrlSwitcher):
@@ -34,41 +36,78 @@ class Page(TranslatableModel, UrlSwitcher):
     translations = TranslatedFields(
         title=models.CharField(_('title'), max_length=200),
         intro=RichTextUploadingField(_('intro'), blank=True),
+        intro_html=RenderedHTMLField(_('intro HTML'), source_field='intro'),
         page_type=models.CharField(
             _("page type"),
             max_length=5,
             choices=PageType.choices,
             default=PageType.HOME,
         ),
+        updated=models.DateTimeField(_('updated'), auto_now=True),
     )
 
-    def get_absolute_url(self):
+    def get_absolute_url(self, language_code=None):
         """
-        Returns the URL for this page.
+        Returns the URL for this page in the language (default: the active one).
         """
-        return reverse(self.page_type)
+        return cached_reverse(self.page_type, language_code)
 
     def __str__(self):
         return self.title
 
 
+class PageTypeLock(models.Model):
+    """
+    A row per page type, locked while the default page of the type is
+    created (see `pages.singletons`), so concurrent workers don't create
+    duplicate pages.
+    """
+    page_type = models.CharField(_("page type"), max_length=5, choices=Page.PageType.choices, unique=True)
+
+    def __str__(self):
+        return self.page_type
+
+
 class NewsItem(TranslatableModel, UrlSwitcher):
     """
     Represents a news item.
     """
     translations = TranslatedFields(
+        meta={'indexes': [live_date_index('newsitem_live_date_idx')]},
         title=models.CharField(_('title'), max_length=300),
         body=RichTextUploadingField(_('body'), blank=True),
+        body_html=RenderedHTMLField(_('body HTML'), source_field='body'),
+        excerpt=ExcerptField(_('excerpt'), source_field='body'),
         live=models.BooleanField(_('live'), default=False),
-        image=models.ImageField(_('image'), upload_to="news", blank=True),
+        image=ImageMetadataField(
+            _('image'),
+            upload_to="news",
+            storage=get_content_storage,
+            blank=True,
+            width_field='image_width',
+            height_field='image_height',
+            size_field='image_size',
+            mime_type_field='image_mime_type',
+            placeholder_field='image_placeholder',
+            color_field='image_color',
+        ),
+        image_width=models.PositiveIntegerField(_('image width'), null=True, blank=True, editable=False),
+        image_height=models.PositiveIntegerField(_('image height'), null=True, blank=True, editable=False),
+        image_size=models.PositiveBigIntegerField(_('image size'), null=True, blank=True, editable=False),
+        image_mime_type=models.CharField(_('image MIME type'), max_length=50, blank=True, editable=False),
+        image_placeholder=models.TextField(_('image placeholder'), blank=True, editable=False),
+        image_color=models.CharField(_('image color'), max_length=7, blank=True, editable=False),
         date=models.DateTimeField(_('date'), auto_now_add=True),
+        updated=models.DateTimeField(_('updated'), auto_now=True),
     )
 
-    def get_absolute_url(self):
+    objects = LiveManager()
+
+    def get_absolute_url(self, language_code=None):
         """
-        Returns the URL for this page.
+        Returns the URL for this page in the language (default: the active one).
         """
-        return reverse("news-detail", kwargs={"pk": self.pk})
+        return cached_reverse("news-detail", language_code, pk=self.pk)
 
     def __str__(self):
         return self.title
@@ -79,18 +118,23 @@ class TourDate(TranslatableModel, UrlSwitcher):
     Represents a tour date.
     """
     translations = TranslatedFields(
+        meta={'indexes': [live_date_index('tourdate_live_date_idx')]},
         title=models.CharField(_('title'), max_length=300),
         venue=models.CharField(_('venue'), max_length=300, blank=True),
         description=RichTextUploadingField(_('description'), blank=True),
+        description_html=RenderedHTMLField(_('description HTML'), source_field='description'),
         date=models.DateField(_('date')),
         live=models.BooleanField(_('live'), default=False),
+        updated=models.DateTimeField(_('updated'), auto_now=True),
     )
 
-    def get_absolute_url(self):
+    objects = LiveManager()
+
+    def get_absolute_url(self, language_code=None):
         """
-        Returns the URL for this page.
+        Returns the URL for this page in the language (default: the active one).
         """
-        return reverse("tour-detail", kwargs={"pk": self.pk})
+        return cached_reverse("tour-detail", language_code, pk=self.pk)
 
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Signal handlers for the pages app.
+
+Saving or deleting content (or one of its translations), or generating the
+renditions of its image, invalidates the cached pages that display it, and
+purges them from the front cache, once the transaction is committed.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.cache import get_master_pk, invalidate_on_commit
+from common.frontcache import object_key, purge, view_key
+from common.renditions import renditions_generated
+from . import singletons
+from .models import Page, NewsItem, TourDate
+
+# The views that display each page type
+PAGE_TYPE_VIEWS = {
+    Page.PageType.HOME: ("home",),
+    Page.PageType.BAND: ("band",),
+    Page.PageType.MUSIC: ("music",),
+    Page.PageType.TOUR: ("tour", "tour-detail"),
+    Page.PageType.NEWS: ("news", "news-detail"),
+    Page.PageType.SHOP: ("shop",),
+}
+
+PageTranslation = Page._parler_meta.root_model
+NewsItemTranslation = NewsItem._parler_meta.root_model
+TourDateTranslation = TourDate._parler_meta.root_model
+
+
+@receiver([post_save, post_delete], sender=Page)
+@receiver([post_save, post_delete], sender=PageTranslation)
+def page_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached page singletons, and the views showing the page,
+    once committed. If the page type isn't known (e.g. the master object
+    changed), invalidates all of them.
+    """
+    transaction.on_commit(singletons.invalidate)
+    page_type = getattr(instance, "page_type", None) if sender is PageTranslation else None
+    if page_type in PAGE_TYPE_VIEWS:
+        views = PAGE_TYPE_VIEWS[page_type]
+    else:
+        views = [view for views in PAGE_TYPE_VIEWS.values() for view in views]
+    invalidate_on_commit(views)
+    purge(*map(view_key, views))
+
+
+@receiver([post_save, post_delete], sender=NewsItem)
+@receiver([post_save, post_delete], sender=NewsItemTranslation)
+@receiver(renditions_generated, sender=NewsItemTranslation)
+def news_item_changed(sender, instance, **kwargs):
+    """
+    Invalidates the news listings and the news item's detail page.
+    """
+    pk = get_master_pk(instance)
+    invalidate_on_commit(("home", "news"), "news-detail", pk)
+    purge(view_key("home"), view_key("news"), object_key(NewsItem, pk))
+
+
+@receiver([post_save, post_delete], sender=TourDate)
+@receiver([post_save, post_delete], sender=TourDateTranslation)
+def tour_date_changed(sender, instance, **kwargs):
+    """
+    Invalidates the tour listings and the tour date's detail page.
+    """
+    pk = get_master_pk(instance)
+    invalidate_on_commit(("home", "tour"), "tour-detail", pk)
+    purge(view_key("home"), view_key("tour"), object_key(TourDate, pk))
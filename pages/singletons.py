@@ -0,0 +1,179 @@
+"""
+Cached lookup of the Page singletons (one per `Page.PageType`).
+
+Pages are kept in two layers:
+- a process-wide dict, so most requests don't touch the database or the cache backend
+- the shared cache, so a worker only queries the database once per change
+
+Both layers are tagged with a generation counter stored in the shared cache.
+Saving a page bumps the counter (see `pages.signals`), which makes every worker
+reload its copy on the next request.
+
+`aget_page` is the same lookup for the async views.
+"""
+import copy
+import logging
+import random
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.utils import translation
+
+from common.metrics import incr_counter
+from .models import Page, PageTypeLock
+
+logger = logging.getLogger(__name__)
+
+SINGLETON_CACHE_PREFIX = "pages:singleton"
+GENERATION_KEY = f"{SINGLETON_CACHE_PREFIX}:gen"
+
+_local_pages = {}
+_local_lock = threading.Lock()
+
+
+def _current_generation():
+    """
+    Returns the generation counter, starting it at a random value
+    if it's missing, so pages cached in-process before a cache flush
+    are never mistaken for current ones.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, random.getrandbits(32), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+async def _acurrent_generation():
+    """
+    Async version of `_current_generation`.
+    """
+    generation = await cache.aget(GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(GENERATION_KEY, random.getrandbits(32), None)
+        generation = await cache.aget(GENERATION_KEY)
+    return generation
+
+
+def _page_key(page_type, generation):
+    return f"{SINGLETON_CACHE_PREFIX}:{page_type}:{generation}"
+
+
+def _pages(page_type):
+    """
+    Returns the pages of the page type with the translations for all languages.
+    If duplicates exist, the oldest page always comes first, so all workers agree.
+    """
+    return (
+        Page.objects
+        .filter(translations__page_type=page_type)
+        .prefetch_related("translations")
+        .order_by("pk")
+    )
+
+
+def _load_page(page_type):
+    """
+    Loads the page from the database.
+    """
+    return _pages(page_type).first()
+
+
+def _create_default_page(page_type):
+    """
+    Creates the default page for the page type, unless another worker did.
+
+    The `PageTypeLock` row of the page type is locked while checking for the
+    page and creating it, so concurrent first requests wait for the worker
+    creating the page instead of creating duplicates.
+    """
+    with transaction.atomic():
+        lock, _created = PageTypeLock.objects.get_or_create(page_type=page_type)
+        PageTypeLock.objects.select_for_update().get(pk=lock.pk)
+        # Queried after the lock, so it sees a page committed by its previous holder
+        if _load_page(page_type) is None:
+            name = Page.PageType(page_type).label
+            page = Page()
+            for language_code in ("en", "ja"):
+                with translation.override(language_code):
+                    page.set_current_language(language_code)
+                    page.title = str(name)
+                    page.page_type = page_type
+            page.save()
+    return _load_page(page_type)
+
+
+def get_page(page_type: str, language_code: str = "en"):
+    """
+    Returns the page for the page type in the specified language,
+    creating a default page if needed.
+
+    Each call returns a shallow copy, so setting the language
+    doesn't affect other threads sharing the cached page.
+    """
+    generation = _current_generation()
+    entry = _local_pages.get(page_type)
+    if entry is None or entry[0] != generation:
+        key = _page_key(page_type, generation)
+        page = cache.get(key)
+        if page is None:
+            page = _load_page(page_type) or _create_default_page(page_type)
+            cache.set(key, page, None)
+        entry = (generation, page)
+        with _local_lock:
+            _local_pages[page_type] = entry
+
+    page = copy.copy(entry[1])
+    page.set_current_language(language_code)
+    return page
+
+
+async def aget_page(page_type: str, language_code: str = "en"):
+    """
+    Async version of `get_page`.
+    """
+    generation = await _acurrent_generation()
+    entry = _local_pages.get(page_type)
+    if entry is None or entry[0] != generation:
+        key = _page_key(page_type, generation)
+        page = await cache.aget(key)
+        if page is None:
+            page = await _pages(page_type).afirst()
+            if page is None:
+                page = await sync_to_async(_create_default_page)(page_type)
+            await cache.aset(key, page, None)
+        entry = (generation, page)
+        with _local_lock:
+            _local_pages[page_type] = entry
+
+    page = copy.copy(entry[1])
+    page.set_current_language(language_code)
+    return page
+
+
+def invalidate():
+    """
+    Expires the cached pages in all workers.
+    """
+    incr_counter(cache, GENERATION_KEY)
+    with _local_lock:
+        _local_pages.clear()
+
+
+def warm():
+    """
+    Loads all the pages into the caches.
+    Called at startup, so the first requests don't hit the database.
+    """
+    try:
+        # Create the missing pages first, since each creation invalidates the cache
+        for page_type in Page.PageType.values:
+            if _load_page(page_type) is None:
+                _create_default_page(page_type)
+        for page_type in Page.PageType.values:
+            get_page(page_type)
+    except DatabaseError:
+        # e.g. the database isn't migrated yet; pages will be loaded on demand
+        logger.warning("Could not warm the page cache", exc_info=True)
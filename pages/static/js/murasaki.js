@@ -0,0 +1,15 @@
+// Replaces a clicked video facade with the provider's player
+document.addEventListener("click", function (event) {
+    var facade = event.target.closest(".video-facade");
+    if (!facade || !facade.dataset.playerUrl) {
+        return;
+    }
+    event.preventDefault();
+    var player = document.createElement("iframe");
+    player.src = facade.dataset.playerUrl;
+    player.title = facade.dataset.title;
+    player.className = "video-facade-player";
+    player.allow = "accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture";
+    player.allowFullscreen = true;
+    facade.replaceWith(player);
+});
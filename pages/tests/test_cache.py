@@ -0,0 +1,493 @@
+"""
+Unit tests for the full-page cache of the public views
+"""
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, transaction
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.utils.http import parse_http_date
+
+from common.cache import (
+    _release_lock,
+    _view_state,
+    check_atomic_caches,
+    get_page_cache,
+    invalidate_pages,
+    page_cache_key,
+)
+from common.fallback import _fallback_path, database_breaker, load_fallback, prune_fallbacks, save_fallback
+from common.frontcache import LocalPurgeBackend
+from common.metrics import get_metrics, reset_metrics
+from pages.models import Page, NewsItem, TourDate
+
+
+class PageCacheTests(TestCase):
+    """
+    Test that pages are served from the cache, and invalidated on save/delete.
+    """
+    def setUp(self) -> None:
+        self.page = Page.objects.language("en").create(
+            title="Home Test",
+            page_type=Page.PageType.HOME,
+            intro="Welcome",
+        )
+        Page.objects.language("en").create(title="News", page_type=Page.PageType.NEWS)
+        self.news_item = NewsItem.objects.language("en").create(
+            title="Cached News",
+            body="Body",
+            live=True,
+            image="news/default.jpg",
+        )
+
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+        NewsItem.objects.all().delete()
+        TourDate.objects.all().delete()
+
+    def test_second_request_is_cached(self):
+        """
+        Test that a repeated request doesn't hit the database
+        """
+        self.client.get("/en/news/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/en/news/")
+        self.assertEqual(response.status_code, 200)
+        assert "Cached News" in response.content.decode()
+
+    def test_languages_cached_separately(self):
+        """
+        Test that each language gets its own cache entry
+        """
+        self.client.get("/en/news/")
+        response = self.client.get("/ja/news/")
+        self.assertTemplateUsed(response, "pages/news.html")
+
+    def test_page_numbers_cached_separately(self):
+        """
+        Test that each page number gets its own cache entry
+        """
+        self.client.get("/en/news/")
+        response = self.client.get("/en/news/", {"page": 1})
+        self.assertTemplateUsed(response, "pages/news.html")
+
+    def test_unknown_query_params_bypass_cache(self):
+        """
+        Test that arbitrary query strings are not cached
+        """
+        self.client.get("/en/news/", {"utm_source": "x"})
+        response = self.client.get("/en/news/", {"utm_source": "x"})
+        self.assertTemplateUsed(response, "pages/news.html")
+
+    def test_invalid_pages_not_cached(self):
+        """
+        Test that non-canonical cursors and page numbers are a 404, and aren't cached
+        """
+        for query in ({"after": "not-a-cursor"}, {"page": "01"}, {"page": 2}, {"page": 1, "after": "x"}):
+            self.assertEqual(self.client.get("/en/news/", query).status_code, 404)
+            self.assertEqual(self.client.get("/en/news/", query).status_code, 404)
+        self.assertEqual(get_page_cache().get(page_cache_key("news", "en", [("after", "not-a-cursor")])), None)
+
+    def test_news_item_save_invalidates(self):
+        """
+        Test that saving a news item invalidates the news listing and the home page
+        """
+        self.client.get("/en/")
+        self.client.get("/en/news/")
+        self.news_item.title = "Updated News"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news_item.save()
+        assert "Updated News" in self.client.get("/en/").content.decode()
+        assert "Updated News" in self.client.get("/en/news/").content.decode()
+
+    def test_invalidated_after_commit(self):
+        """
+        Test that a request before the commit of a save doesn't cache the
+        page under the new generation, and the page is fresh after the commit
+        """
+        self.client.get("/en/news/")
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.news_item.title = "Committed News"
+                self.news_item.save()
+                # Other connections don't see the change yet: the cached page is still current
+                with self.assertNumQueries(0):
+                    self.client.get("/en/news/")
+        self.assertContains(self.client.get("/en/news/"), "Committed News")
+
+    def test_news_item_delete_invalidates(self):
+        """
+        Test that deleting a news item invalidates the news listing
+        """
+        self.client.get("/en/news/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news_item.delete()
+        assert "Cached News" not in self.client.get("/en/news/").content.decode()
+
+    def test_translation_save_invalidates_detail(self):
+        """
+        Test that saving a translation invalidates the detail page of its object only
+        """
+        other = NewsItem.objects.language("en").create(
+            title="Other News",
+            live=True,
+            image="news/default.jpg",
+        )
+        self.client.get(self.news_item.get_absolute_url())
+        self.client.get(other.get_absolute_url())
+        translation = self.news_item.get_translation("en")
+        translation.title = "Translated Update"
+        with self.captureOnCommitCallbacks(execute=True):
+            translation.save()
+        response = self.client.get(self.news_item.get_absolute_url())
+        assert "Translated Update" in response.content.decode()
+        with self.assertNumQueries(0):
+            self.client.get(other.get_absolute_url())
+
+    def test_unrelated_save_keeps_cache(self):
+        """
+        Test that saving a tour date leaves the news listing cached
+        """
+        self.client.get("/en/news/")
+        TourDate.objects.create(title="Tour", date="2020-01-01", live=True)
+        with self.assertNumQueries(0):
+            self.client.get("/en/news/")
+
+    def test_page_save_invalidates(self):
+        """
+        Test that saving a page invalidates the views showing it
+        """
+        self.client.get("/en/")
+        self.page.title = "New Home Title"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.save()
+        assert "New Home Title" in self.client.get("/en/").content.decode()
+
+    def test_invalidate_pages(self):
+        """
+        Test that invalidate_pages() expires all entries of a view
+        """
+        self.client.get("/en/news/")
+        invalidate_pages("news")
+        response = self.client.get("/en/news/")
+        self.assertTemplateUsed(response, "pages/news.html")
+
+    def test_evicted_counter_starts_over(self):
+        """
+        Test that a generation counter evicted after an invalidation
+        doesn't come back to the generation of the older entry
+        """
+        self.client.get("/en/news/")
+        generation = _view_state("news")[0]
+        invalidate_pages("news")
+        get_page_cache().delete("pagecache:gen:news")
+        self.assertNotEqual(_view_state("news")[0], generation)
+        response = self.client.get("/en/news/")
+        self.assertTemplateUsed(response, "pages/news.html")
+
+    def test_authenticated_users_bypass_cache(self):
+        """
+        Test that logged-in users always get a fresh render
+        """
+        user = User.objects.create_user("editor", password="password")
+        self.client.force_login(user)
+        self.client.get("/en/news/")
+        response = self.client.get("/en/news/")
+        self.assertTemplateUsed(response, "pages/news.html")
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Test the ETag and Last-Modified validators of the public views
+    """
+    def setUp(self) -> None:
+        Page.objects.language("en").create(title="News", page_type=Page.PageType.NEWS)
+        self.news_item = NewsItem.objects.language("en").create(
+            title="News Item",
+            live=True,
+            image="news/default.jpg",
+        )
+
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+        NewsItem.objects.all().delete()
+
+    def test_validators(self):
+        """
+        Test that the responses have an ETag, and a Last-Modified from the content's updated time
+        """
+        response = self.client.get("/en/news/")
+        self.assertIn("ETag", response)
+        translation = self.news_item.get_translation("en")
+        self.assertGreaterEqual(
+            parse_http_date(response["Last-Modified"]),
+            int(translation.updated.timestamp()),
+        )
+
+    def test_not_modified(self):
+        """
+        Test that a conditional request for an unchanged page gets a 304 without querying the database
+        """
+        response = self.client.get("/en/news/")
+        with self.assertNumQueries(0):
+            etag_response = self.client.get("/en/news/", HTTP_IF_NONE_MATCH=response["ETag"])
+            date_response = self.client.get("/en/news/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(etag_response.status_code, 304)
+        self.assertEqual(date_response.status_code, 304)
+
+    def test_etag_varies(self):
+        """
+        Test that the ETag depends on the language, the page and the object
+        """
+        etags = {
+            self.client.get(url)["ETag"]
+            for url in ("/en/news/", "/ja/news/", "/en/news/?page=1", self.news_item.get_absolute_url())
+        }
+        self.assertEqual(len(etags), 4)
+
+    def test_changes_modify(self):
+        """
+        Test that saving or deleting content changes the ETag
+        """
+        etag = self.client.get("/en/news/")["ETag"]
+        self.news_item.title = "Updated"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news_item.save()
+        response = self.client.get("/en/news/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news_item.delete()
+        response = self.client.get("/en/news/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(PURGE_BACKEND="common.frontcache.LocalPurgeBackend")
+class FrontCacheTests(TestCase):
+    """
+    Test the headers for a front cache, and purging it.
+    """
+    def setUp(self) -> None:
+        self.news_item = NewsItem.objects.language("en").create(
+            title="Front Cache News",
+            body="Body",
+            live=True,
+            image="news/default.jpg",
+        )
+        LocalPurgeBackend.purged.clear()
+
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+        NewsItem.objects.all().delete()
+
+    def test_public_headers(self):
+        for _ in range(2):
+            # the cached response has the same headers
+            response = self.client.get("/ja/news/")
+            self.assertEqual(response["Surrogate-Key"], "page:news lang:ja")
+            self.assertIn("s-maxage=86400", response["Cache-Control"])
+            self.assertIn("public", response["Cache-Control"])
+            self.assertNotIn("Cookie", response.get("Vary", ""))
+
+        response = self.client.get("/en/news/")
+        self.assertEqual(response["Surrogate-Key"], f"page:news lang:en newsitem:{self.news_item.pk}")
+        response = self.client.get(self.news_item.get_absolute_url())
+        self.assertIn(f"newsitem:{self.news_item.pk}", response["Surrogate-Key"])
+
+    def test_private_headers(self):
+        response = self.client.get("/en/news/?utm_source=test")
+        self.assertNotIn("Surrogate-Key", response)
+        self.assertIn("private", response["Cache-Control"])
+
+        user = User.objects.create_user("editor", password="password")
+        self.client.force_login(user)
+        response = self.client.get("/en/news/")
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+
+    def test_save_purges(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news_item.title = "Updated"
+            self.news_item.save()
+        self.assertIn(f"newsitem:{self.news_item.pk}", LocalPurgeBackend.purged)
+        self.assertIn("page:news", LocalPurgeBackend.purged)
+        self.assertIn("page:home", LocalPurgeBackend.purged)
+
+        LocalPurgeBackend.purged.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Page.objects.language("en").create(title="Band", page_type=Page.PageType.BAND)
+        self.assertIn("page:band", LocalPurgeBackend.purged)
+
+
+class StaleWhileRevalidateTests(TestCase):
+    """
+    Test serving stale pages while another request renders them
+    """
+    def setUp(self) -> None:
+        self.news_item = NewsItem.objects.language("en").create(
+            title="Stale News",
+            body="Body",
+            live=True,
+            image="news/default.jpg",
+        )
+        self.key = page_cache_key("news", "en")
+        reset_metrics()
+
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+        NewsItem.objects.all().delete()
+
+    def lock(self):
+        get_page_cache().add(f"{self.key}:lock", "render", 30)
+
+    def test_stale_served_while_rendering(self):
+        """
+        Test that a stale page is served without rendering while the lock is held
+        """
+        self.client.get("/en/news/")
+        with self.captureOnCommitCallbacks(execute=True):
+            NewsItem.objects.language("en").create(title="Newer News", live=True, image="news/default.jpg")
+        self.lock()
+        with self.assertTemplateNotUsed("pages/news.html"):
+            response = self.client.get("/en/news/")
+        self.assertNotContains(response, "Newer News")
+        self.assertEqual(response["Cache-Control"], "no-store")
+        self.assertEqual(get_metrics()["page_stale_serves"], 1)
+
+        get_page_cache().delete(f"{self.key}:lock")
+        self.assertContains(self.client.get("/en/news/"), "Newer News")
+
+    def test_expired_is_stale(self):
+        self.client.get("/en/news/")
+        cache = get_page_cache()
+        entry = cache.get(self.key)
+        entry["fresh_until"] = 0
+        cache.set(self.key, entry)
+        self.lock()
+        self.client.get("/en/news/")
+        self.assertEqual(get_metrics()["page_stale_serves"], 1)
+
+    def test_coalesced_wait(self):
+        """
+        Test that a request without a stale page waits for the lock holder's render
+        """
+        self.lock()
+        generation = _view_state("news")[0]
+
+        def render_elsewhere(seconds):
+            entry = {"generation": generation, "fresh_until": time.time() + 60, "response": HttpResponse("rendered")}
+            get_page_cache().set(self.key, entry)
+
+        with mock.patch("common.cache.asyncio.sleep", side_effect=render_elsewhere):
+            response = self.client.get("/en/news/")
+        self.assertEqual(response.content, b"rendered")
+        self.assertEqual(get_metrics()["page_coalesced_waits"], 1)
+        self.assertEqual(get_metrics()["page_renders"], 0)
+
+    @override_settings(PAGE_CACHE_LOCK_WAIT=0.2)
+    def test_wait_without_stale_page(self):
+        """
+        Test that a request without a stale page renders it when the lock holder is too slow
+        """
+        self.lock()
+        response = self.client.get("/en/news/")
+        self.assertContains(response, "Stale News")
+        self.assertEqual(get_metrics()["page_renders"], 1)
+        self.assertEqual(get_metrics()["page_coalesced_waits"], 0)
+
+    def test_lock_released_by_holder_only(self):
+        """
+        Test that a render outlasting its lock leaves the lock of the next request
+        """
+        self.lock()
+        _release_lock(get_page_cache(), f"{self.key}:lock", "expired render")
+        self.assertEqual(get_page_cache().get(f"{self.key}:lock"), "render")
+
+    def test_atomic_caches(self):
+        """
+        Test that caches without an atomic add() and incr() are refused
+        """
+        check_atomic_caches()
+        file_cache = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp/cache"}
+        with override_settings(CACHES={"default": file_cache}):
+            with self.assertRaises(ImproperlyConfigured):
+                check_atomic_caches()
+
+
+class DatabaseFallbackTests(TestCase):
+    """
+    Test serving the last good pages when the database fails
+    """
+    def setUp(self) -> None:
+        self.fallback_root = tempfile.mkdtemp()
+        self.override = override_settings(FALLBACK_PAGE_ROOT=self.fallback_root)
+        self.override.enable()
+        NewsItem.objects.language("en").create(title="Saved News", live=True, image="news/default.jpg")
+        database_breaker.reset()
+        reset_metrics()
+
+    def tearDown(self) -> None:
+        database_breaker.reset()
+        self.override.disable()
+        shutil.rmtree(self.fallback_root)
+        Page.objects.all().delete()
+        NewsItem.objects.all().delete()
+
+    def fail_database(self):
+        return mock.patch("pages.views.paginate", side_effect=OperationalError("server closed the connection"))
+
+    def test_serve_saved_page(self):
+        self.client.get("/en/news/")
+        get_page_cache().clear()
+        with self.fail_database():
+            response = self.client.get("/en/news/")
+            self.assertContains(response, "Saved News")
+            self.assertEqual(response["Cache-Control"], "no-store")
+            # Without a saved page
+            response = self.client.get("/ja/news/")
+            self.assertEqual(response.status_code, 503)
+        self.assertEqual(get_metrics()["page_fallback_serves"], 1)
+
+    def test_serve_stale_page(self):
+        self.client.get("/en/news/")
+        invalidate_pages("news")
+        with self.fail_database():
+            self.assertContains(self.client.get("/en/news/"), "Saved News")
+
+    def test_circuit_breaker(self):
+        """
+        Test that the views aren't run while the breaker is open
+        """
+        self.client.get("/en/news/")
+        get_page_cache().clear()
+        with self.fail_database() as paginate:
+            for _ in range(settings.CIRCUIT_BREAKER_THRESHOLD + 2):
+                self.assertEqual(self.client.get("/en/news/").status_code, 200)
+        self.assertEqual(paginate.call_count, settings.CIRCUIT_BREAKER_THRESHOLD)
+        self.assertTrue(database_breaker.is_open)
+
+    def test_prune_saved_pages(self):
+        """
+        Test that the least recently saved pages are removed beyond the maximum
+        """
+        for number, view_name in enumerate(("news", "tour", "music")):
+            save_fallback(view_name, HttpResponse(view_name))
+            os.utime(_fallback_path(view_name), (number, number))
+        with override_settings(FALLBACK_PAGE_MAX_FILES=2):
+            prune_fallbacks()
+        self.assertIsNone(load_fallback("news"))
+        self.assertEqual(load_fallback("music").content, b"music")
+
+    def test_authenticated_fail_fast(self):
+        user = User.objects.create_user("editor", password="password")
+        self.client.force_login(user)
+        with self.fail_database(), self.assertRaises(OperationalError):
+            self.client.get("/en/news/")
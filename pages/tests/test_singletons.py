@@ -0,0 +1,119 @@
+"""
+Unit tests for the cached Page singletons
+"""
+from django.db import transaction
+from django.test import TestCase
+
+from pages import singletons
+from pages.models import Page, PageTypeLock
+
+
+class SingletonTests(TestCase):
+    """
+    Test the process-wide and shared-cache lookup of the pages
+    """
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+
+    def test_default_page_created(self):
+        """
+        Test that a default page is created with both translations
+        """
+        page = singletons.get_page(Page.PageType.BAND, "ja")
+        self.assertEqual(Page.objects.count(), 1)
+        self.assertEqual(page.get_current_language(), "ja")
+        self.assertEqual(sorted(page.get_available_languages()), ["en", "ja"])
+        self.assertEqual(page.page_type, "band")
+
+    def test_existing_page(self):
+        """
+        Test that an existing page is found, whatever its translation language
+        """
+        Page.objects.language("en").create(title="Shop Test", page_type=Page.PageType.SHOP)
+        page = singletons.get_page(Page.PageType.SHOP, "ja")
+        self.assertEqual(page.title, "Shop Test")
+        self.assertEqual(Page.objects.count(), 1)
+
+    def test_cached_lookup(self):
+        """
+        Test that repeated lookups don't query the database,
+        including the translations of both languages
+        """
+        Page.objects.language("en").create(title="Home Test", page_type=Page.PageType.HOME)
+        singletons.get_page(Page.PageType.HOME, "en")
+        with self.assertNumQueries(0):
+            page = singletons.get_page(Page.PageType.HOME, "ja")
+            self.assertEqual(page.title, "Home Test")
+            page = singletons.get_page(Page.PageType.HOME, "en")
+            self.assertEqual(page.title, "Home Test")
+
+    def test_shared_cache_lookup(self):
+        """
+        Test that another worker (with an empty process cache) uses the shared cache
+        """
+        Page.objects.language("en").create(title="Home Test", page_type=Page.PageType.HOME)
+        singletons.get_page(Page.PageType.HOME, "en")
+        singletons._local_pages.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(singletons.get_page(Page.PageType.HOME, "en").title, "Home Test")
+
+    def test_copies_are_independent(self):
+        """
+        Test that setting the language of a returned page doesn't affect other callers
+        """
+        english = singletons.get_page(Page.PageType.MUSIC, "en")
+        singletons.get_page(Page.PageType.MUSIC, "ja")
+        self.assertEqual(english.get_current_language(), "en")
+
+    def test_invalidated_on_save(self):
+        """
+        Test that saving a page reloads it
+        """
+        page = Page.objects.language("en").create(title="Home Test", page_type=Page.PageType.HOME)
+        singletons.get_page(Page.PageType.HOME, "en")
+        page.title = "New Title"
+        with self.captureOnCommitCallbacks(execute=True):
+            page.save()
+        self.assertEqual(singletons.get_page(Page.PageType.HOME, "en").title, "New Title")
+
+    def test_invalidated_after_commit(self):
+        """
+        Test that the pages are reloaded once the save is committed, not before
+        """
+        page = Page.objects.language("en").create(title="Home Test", page_type=Page.PageType.HOME)
+        singletons.get_page(Page.PageType.HOME, "en")
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                page.title = "New Title"
+                page.save()
+                self.assertEqual(singletons.get_page(Page.PageType.HOME, "en").title, "Home Test")
+        self.assertEqual(singletons.get_page(Page.PageType.HOME, "en").title, "New Title")
+
+    def test_no_duplicate_after_concurrent_creation(self):
+        """
+        Test that a worker getting the lock after another worker created
+        the page doesn't create a duplicate
+        """
+        Page.objects.language("en").create(title="Created Elsewhere", page_type=Page.PageType.TOUR)
+        page = singletons._create_default_page(Page.PageType.TOUR)
+        self.assertEqual(page.title, "Created Elsewhere")
+        self.assertEqual(Page.objects.count(), 1)
+        self.assertTrue(PageTypeLock.objects.filter(page_type=Page.PageType.TOUR).exists())
+
+    def test_oldest_duplicate_wins(self):
+        """
+        Test that all workers agree on the same page if duplicates exist
+        """
+        first = Page.objects.language("en").create(title="First", page_type=Page.PageType.NEWS)
+        Page.objects.language("en").create(title="Second", page_type=Page.PageType.NEWS)
+        self.assertEqual(singletons.get_page(Page.PageType.NEWS).pk, first.pk)
+
+    def test_warm(self):
+        """
+        Test that warming loads every page type
+        """
+        singletons.warm()
+        self.assertEqual(Page.objects.count(), len(Page.PageType.values))
+        with self.assertNumQueries(0):
+            for page_type in Page.PageType.values:
+                singletons.get_page(page_type)
@@ -2,10 +2,16 @@
 Unit tests for pages views
 """
 
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from django.utils import translation
 
+from common.tests.queries import QueryCountMixin
 from pages import views
 from pages.models import Page, NewsItem, TourDate
 
@@ -228,4 +234,147 @@ class TourDateViewTests(TestCase):
         Test that a 404 error is raised when the tour date object does not exist
         """
         with self.assertRaises(TourDate.DoesNotExist):
-            self.client.get("/en/tour/{}/".format(self.tour_date.id + 1))
\ No newline at end of file
+            self.client.get("/en/tour/{}/".format(self.tour_date.id + 1))
+
+
+class ListQueryCountTests(QueryCountMixin, TestCase):
+    """
+    Test that the list pages cost a constant number of queries, whatever the number of items
+    """
+    def setUp(self) -> None:
+        Page.objects.language("en").create(title="Home", page_type=Page.PageType.HOME)
+        Page.objects.language("en").create(title="News", page_type=Page.PageType.NEWS)
+        Page.objects.language("en").create(title="Tour", page_type=Page.PageType.TOUR)
+
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+        NewsItem.objects.all().delete()
+        TourDate.objects.all().delete()
+
+    def create_items(self, count):
+        for i in range(count):
+            news_item = NewsItem.objects.language("en").create(
+                title=f"News {i}",
+                live=True,
+                image="news/default.jpg",
+            )
+            news_item.create_translation("ja", title=f"ニュース {i}", live=True, image="news/default.jpg")
+            TourDate.objects.language("en").create(
+                title=f"Tour {i}",
+                venue=f"Venue {i}",
+                date="2020-01-01",
+                live=True,
+            )
+
+    def test_home(self):
+        self.assertConstantQueries("/en/")
+
+    def test_news(self):
+        self.assertConstantQueries("/en/news/")
+
+    def test_news_japanese(self):
+        self.assertConstantQueries("/ja/news/")
+
+    def test_tour(self):
+        self.assertConstantQueries("/en/tour/")
+
+    def test_fallback_prefetched(self):
+        """
+        Test that the fallback translation is loaded by the same prefetch
+        """
+        news_item = NewsItem.objects.language("en").create(title="English Only", image="news/default.jpg")
+        cache.clear()
+        with self.assertNumQueries(2):
+            news_item = NewsItem.objects.with_translations("ja").get(pk=news_item.pk)
+            self.assertEqual(news_item.title, "English Only")
+
+
+class NewsPaginationViewTests(TestCase):
+    """
+    Test the pagination links of the news page
+    """
+    def setUp(self) -> None:
+        for i in range(12):
+            NewsItem.objects.language("en").create(title=f"News {i}", live=True, image="news/default.jpg")
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+        Page.objects.all().delete()
+
+    def test_keyset_links(self):
+        """
+        Test that the first page links to the next one with a cursor
+        """
+        response = self.client.get("/en/news/")
+        page = response.context["news_items"]
+        self.assertEqual(len(page), 10)
+        self.assertContains(response, f"?after={page.next_cursor}")
+        response = self.client.get("/en/news/", {"after": page.next_cursor})
+        self.assertEqual(len(response.context["news_items"]), 2)
+        self.assertContains(response, "?before=")
+
+    def test_page_number_links(self):
+        """
+        Test that the page-number mode is still available
+        """
+        response = self.client.get("/en/news/", {"page": 2})
+        self.assertEqual(response.context["news_items"].number, 2)
+        self.assertContains(response, "?page=1")
+
+
+class AsyncViewTests(TestCase):
+    """
+    Test the views served through the ASGI handler
+    """
+    def setUp(self) -> None:
+        self.news_item = NewsItem.objects.language("en").create(
+            title="Async News",
+            body="Body",
+            live=True,
+            image="news/default.jpg",
+        )
+        Page.objects.language("en").create(title="News", page_type=Page.PageType.NEWS)
+        cache.clear()
+
+    def tearDown(self) -> None:
+        NewsItem.objects.all().delete()
+        Page.objects.all().delete()
+
+    async def test_views(self):
+        for path in ("/en/", "/en/news/", "/en/news/?page=1", f"/en/news/{self.news_item.pk}/", "/ja/band/"):
+            response = await self.async_client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+        self.assertContains(response, 'lang="ja"')
+
+    async def test_cached(self):
+        response = await self.async_client.get("/en/news/")
+        self.assertContains(response, "Async News")
+        self.assertIn(f"newsitem:{self.news_item.pk}", response["Surrogate-Key"])
+
+        # Served from the page cache, and validated without the view
+        with mock.patch("pages.views.paginate") as paginate:
+            response = await self.async_client.get("/en/news/")
+            self.assertContains(response, "Async News")
+            response = await self.async_client.get("/en/news/", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        paginate.assert_not_called()
+
+
+class BenchmarkAsgiTests(TransactionTestCase):
+    """
+    Test the benchmark of the ASGI views
+    """
+    def setUp(self) -> None:
+        Page.objects.language("en").create(title="Band", page_type=Page.PageType.BAND)
+        cache.clear()
+
+    def tearDown(self) -> None:
+        Page.objects.all().delete()
+
+    def test_benchmark_asgi(self):
+        stdout = StringIO()
+        call_command(
+            "benchmark_asgi", path="/en/band/", host="testserver",
+            requests=4, concurrency=2, db_latency=0, stdout=stdout,
+        )
+        self.assertIn("2 at a time: 4 requests", stdout.getvalue())
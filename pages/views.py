@@ -1,46 +1,38 @@
 """
 Site views
+
+The views are async: the page singletons and the objects are loaded with the
+async ORM, and the templates are rendered in a thread, since rendering can
+still touch the database (e.g. the session of the request).
 """
-from django.core.paginator import Paginator
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 
-from .models import Page, NewsItem, TourDate
+from . import singletons
+from .models import NewsItem, Page, TourDate
+
+from common.cache import cache_public_page, conditional_page
+from common.frontcache import add_surrogate_keys
+from common.pagination import paginate, redirect_moved_cursors
+from common.utils import get_switch_language_url, last_updated
 
-from common.utils import get_switch_language_url
+NEWS_PER_PAGE = 10
+TOUR_PER_PAGE = 10
 
 
-def get_page_or_default(page_type: str, language_code: str = 'en'):
+async def get_page_or_default(page_type: str, language_code: str = 'en'):
     """
     Gets the Page object with the specified page type,
     or creates a default object
     """
-    page = Page.objects.translated(page_type=page_type).first()
-    if page:
-        return page
-
-    # Create a default page
-    page = Page()
-    page.set_current_language('en')
-    for label, name in Page.PageType.choices:
-        if label == page_type:
-            page.title = name
-            page.page_type = label
-            page.save()
-            page.create_translation(
-                'ja',
-                title=name,
-                page_type=label,
-                live=True,
-            )
-            page.set_current_language(language_code)
-            return page
-
-
-def get_page_context(page_type, language_code):
+    return await singletons.aget_page(page_type, language_code)
+
+
+async def get_page_context(page_type, language_code):
     """
     Creates the page context dict from the page type and language code.
     """
-    page = get_page_or_default(page_type, language_code=language_code)
+    page = await get_page_or_default(page_type, language_code=language_code)
     url_getter = page.get_absolute_url_for
     return {
         'page': page,
@@ -52,93 +44,144 @@ def live_objects(model, language_code: str = 'en'):
     """
     Returns the live objects for the specified model
     """
-    return model.objects.translated(language_code, live=True).order_by("-translations__date")
+    return model.objects.live(language_code).with_translations(language_code)
+
+
+def page_updated(page_type):
+    """
+    Returns a function giving the updated time of the page, for `conditional_page`.
+    """
+    def modified_times(request, **kwargs):
+        return [last_updated(Page, page_type=page_type, language_code=request.LANGUAGE_CODE)]
+    return modified_times
+
+
+def listing_updated(page_type, *models):
+    """
+    Returns a function giving the updated times of the page and of the models'
+    translations in the language, for `conditional_page`.
+    """
+    def modified_times(request, **kwargs):
+        return page_updated(page_type)(request) + [
+            last_updated(model, language_code=request.LANGUAGE_CODE) for model in models
+        ]
+    return modified_times
 
 
-def home(request):
+def detail_updated(page_type, model):
+    """
+    Returns a function giving the updated times of the page and of the object's
+    translations (in all languages, since one can be a fallback), for `conditional_page`.
+    """
+    def modified_times(request, pk, **kwargs):
+        return page_updated(page_type)(request) + [last_updated(model, master_id=pk)]
+    return modified_times
+
+
+@conditional_page("home", listing_updated("home", NewsItem, TourDate))
+@cache_public_page("home")
+async def home(request):
     """
     Serves the site homepage
     """
     language = request.LANGUAGE_CODE
-    context = get_page_context("home", language_code=language)
+    context = await get_page_context("home", language_code=language)
     # Add 4 latest news items to the context
     news_items = live_objects(NewsItem, language)
-    context['news_items'] = news_items[:4]
+    context['news_items'] = [news_item async for news_item in news_items[:4]]
     # Add 4 latest tour dates to the context
     tour_dates = live_objects(TourDate, language)
-    context['tour_dates'] = tour_dates[:4]
-    return render(request, "pages/home.html", context)
+    context['tour_dates'] = [tour_date async for tour_date in tour_dates[:4]]
+    add_surrogate_keys(request, context['news_items'])
+    add_surrogate_keys(request, context['tour_dates'])
+    return await sync_to_async(render)(request, "pages/home.html", context)
 
 
-def news(request):
+@conditional_page("news", listing_updated("news", NewsItem))
+@cache_public_page("news")
+@redirect_moved_cursors
+async def news(request):
     """
     Serves the site news page
     """
     language = request.LANGUAGE_CODE
-    context = get_page_context("news", language_code=language)
-    page = request.GET.get("page", 1)
-    news_items = live_objects(NewsItem, language)
-    context['news_items'] = Paginator(news_items, 10).get_page(page)
-    return render(request, "pages/news.html", context)
+    context = await get_page_context("news", language_code=language)
+    context['news_items'] = await sync_to_async(paginate)(request, NewsItem, NEWS_PER_PAGE, "news")
+    add_surrogate_keys(request, context['news_items'])
+    return await sync_to_async(render)(request, "pages/news.html", context)
 
 
-def news_detail(request, pk):
+@conditional_page("news-detail", detail_updated("news", NewsItem))
+@cache_public_page("news-detail")
+async def news_detail(request, pk):
     """
     Serves the site news detail page
     """
     language = request.LANGUAGE_CODE
-    context = get_page_context("news", language_code=language)
-    news_item = NewsItem.objects.get(pk=pk)
+    context = await get_page_context("news", language_code=language)
+    news_item = await NewsItem.objects.with_translations(language).aget(pk=pk)
     context['news_item'] = news_item
+    add_surrogate_keys(request, [news_item])
     url_getter = news_item.get_absolute_url_for
     context['switch_language'] = get_switch_language_url(url_getter, language_code=language)
-    return render(request, "pages/news_detail.html", context)
+    return await sync_to_async(render)(request, "pages/news_detail.html", context)
 
 
-def tour(request):
+@conditional_page("tour", listing_updated("tour", TourDate))
+@cache_public_page("tour")
+@redirect_moved_cursors
+async def tour(request):
     """
     Serves the site tour page
     """
     language = request.LANGUAGE_CODE
-    context = get_page_context("tour", language_code=language)
-    page = request.GET.get("page", 1)
-    tour_dates = live_objects(TourDate, language)
-    context['tour_dates'] = Paginator(tour_dates, 10).get_page(page)
-    return render(request, "pages/tour.html", context)
+    context = await get_page_context("tour", language_code=language)
+    context['tour_dates'] = await sync_to_async(paginate)(request, TourDate, TOUR_PER_PAGE, "tour")
+    add_surrogate_keys(request, context['tour_dates'])
+    return await sync_to_async(render)(request, "pages/tour.html", context)
 
 
-def tour_detail(request, pk):
+@conditional_page("tour-detail", detail_updated("tour", TourDate))
+@cache_public_page("tour-detail")
+async def tour_detail(request, pk):
     """
     Serves the site tour detail page
     """
     language = request.LANGUAGE_CODE
-    context = get_page_context("tour", language_code=language)
-    tour_date = TourDate.objects.get(pk=pk)
+    context = await get_page_context("tour", language_code=language)
+    tour_date = await TourDate.objects.with_translations(language).aget(pk=pk)
     context['tour_date'] = tour_date
+    add_surrogate_keys(request, [tour_date])
     url_getter = tour_date.get_absolute_url_for
     context['switch_language'] = get_switch_language_url(url_getter, language_code=language)
-    return render(request, "pages/tour_detail.html", context)
+    return await sync_to_async(render)(request, "pages/tour_detail.html", context)
 
 
-def music(request):
+@conditional_page("music", page_updated("music"))
+@cache_public_page("music")
+async def music(request):
     """
     Serves the site music page
     """
-    context = get_page_context("music", language_code=request.LANGUAGE_CODE)
-    return render(request, "pages/music.html", context)
+    context = await get_page_context("music", language_code=request.LANGUAGE_CODE)
+    return await sync_to_async(render)(request, "pages/music.html", context)
 
 
-def band(request):
+@conditional_page("band", page_updated("band"))
+@cache_public_page("band")
+async def band(request):
     """
     Serves the site band page
     """
-    context = get_page_context("band", language_code=request.LANGUAGE_CODE)
-    return render(request, "pages/band.html", context)
+    context = await get_page_context("band", language_code=request.LANGUAGE_CODE)
+    return await sync_to_async(render)(request, "pages/band.html", context)
 
 
-def shop(request):
+@conditional_page("shop", page_updated("shop"))
+@cache_public_page("shop")
+async def shop(request):
     """
     Serves the site shop page
     """
-    context = get_page_context("shop", language_code=request.LANGUAGE_CODE)
-    return render(request, "pages/shop.html", context)
+    context = await get_page_context("shop", language_code=request.LANGUAGE_CODE)
+    return await sync_to_async(render)(request, "pages/shop.html", context)